@@ -0,0 +1,202 @@
+"""
+main.py をヘッドレス（streamlit.testing の AppTest）で操作し、1操作あたりのスクリプト実行時間を測るベンチマーク。
+
+主な機能：
+1. 「1ステップ進む」（AI and AI）や矢印ボタン（Player and AI）を数百ステップ分クリックする。
+2. 制御モード Simple / Lv0 (Q) の組み合わせごとに、クリック1回の所要時間を記録する。
+   （Player and AI ではクリック1回で Player ターン → AI ターンの2回分の実行が含まれる）
+3. レイテンシのパーセンタイルと、ステップ数に対する伸び（100ステップあたりの増加量）を表示する。
+   ステップ数は session_state.step_count と、サイドバーのログ（history）の件数から取る。
+4. グリッドの描画で送ったバイト数（1フレームあたり・1クリックあたり）を表示する。
+   draw_grid_html が session_state.payload_stats に記録した値を使う。
+
+計測値は上限
+- ブラウザではボタン操作でフラグメント（render_simulation）だけが再実行されるが、AppTest はフラグメントだけの
+  再実行をせず、毎回スクリプト全体（サイドバーを含む）を実行する。
+  そのため rerun_simulation は全体の st.rerun() になり、1クリックが「ボタンの実行 + 再描画」の全体の実行2回
+  （Player and AI は3回）として測られる。
+- レイテンシと1クリックあたりの送信量は、実際のフラグメントの再実行に対する上限として読む
+  （1フレームあたりの送信量はフラグメントの再実行でも同じ）。
+
+使い方（プロジェクトのルートで実行）
+- python -m benchmarks.apptest_latency --steps 300
+- python -m benchmarks.apptest_latency --steps 500 --modes "AI and AI" --controls "Lv0 (Q)" --json result.json
+- Lv0 (Q) は q_table.pkl / q_table.pkl2 がルートに無い場合、Simple と同じ動作になる。
+"""
+
+import argparse
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+from src.config import (
+    GAME_MODE_AI_AND_AI,
+    GAME_MODE_PLAYER_AND_AI,
+    CONTROL_MODE_SIMPLE,
+    CONTROL_MODE_LV0_Q
+)
+
+APP_PATH = "main.py"
+STEP_BUTTON_LABEL = "1ステップ進む"
+# Player and AI で順番に押すボタン（待機を含めて一通り）
+PLAYER_BUTTON_LABELS = ("→", "↓", "←", "↑", "・")
+PERCENTILES = (50, 90, 95, 99)
+# 出力に添える注意（load_test と共通）
+UPPER_BOUND_NOTE = (
+    "注意: AppTest はフラグメントだけの再実行をしないため、1クリックをスクリプト全体の実行2〜3回として測っています。"
+    "レイテンシ・1クリックあたりの送信量・CPU 時間は、ブラウザでのフラグメントの再実行に対する上限です。"
+)
+
+
+def _click(at: AppTest, label: str) -> None:
+    for button in at.button:
+        if button.label == label:
+            button.click().run()
+            return
+    raise RuntimeError(f"ボタン '{label}' が見つかりません")
+
+
+def _setup(game_mode: str, control: str, timeout: float) -> AppTest:
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.run()
+    for radio in at.sidebar.radio:
+        if radio.label == "ゲームモード":
+            radio.set_value(game_mode).run()
+    for selectbox in at.sidebar.selectbox:
+        if selectbox.key in ("ctrl_h0", "ctrl_h1"):
+            selectbox.set_value(control).run()
+    return at
+
+
+def run_scenario(game_mode: str, control: str, steps: int, timeout: float = 60.0) -> Dict[str, object]:
+    """
+    1つの組み合わせについて steps 回クリックし、クリックごとの所要時間を返す。
+    """
+    at = _setup(game_mode, control, timeout)
+
+    latencies: List[float] = []
+    step_counts: List[int] = []
+    grid_bytes: List[int] = []
+    grid_frames: List[int] = []
+    for i in range(steps):
+        label = STEP_BUTTON_LABEL if game_mode == GAME_MODE_AI_AND_AI else PLAYER_BUTTON_LABELS[i % len(PLAYER_BUTTON_LABELS)]
+        before = dict(payload_stats(at))
+        start = time.perf_counter()
+        _click(at, label)
+        latencies.append(time.perf_counter() - start)
+        step_counts.append(int(at.session_state.step_count))
+        after = payload_stats(at)
+        grid_bytes.append(after["grid_bytes_total"] - before["grid_bytes_total"])
+        grid_frames.append(after["grid_frames"] - before["grid_frames"])
+
+    if len(at.exception):
+        raise RuntimeError(f"{game_mode}/{control}: アプリで例外が発生しました: {at.exception[0].message}")
+
+    return {
+        "game_mode": game_mode,
+        "control": control,
+        "latencies": latencies,
+        "step_counts": step_counts,
+        "history_len": len(at.session_state.history),
+        "grid_bytes": grid_bytes,
+        "grid_frames": grid_frames,
+        "grid_css_bytes": payload_stats(at).get("grid_css_bytes", 0),
+    }
+
+
+def payload_stats(at: AppTest) -> Dict[str, int]:
+    """draw_grid_html が記録した送信バイト数（まだ描画していなければ 0）"""
+    if "payload_stats" not in at.session_state:
+        return {"grid_frames": 0, "grid_bytes_total": 0}
+    return at.session_state.payload_stats
+
+
+def summarize(result: Dict[str, object], bucket: int) -> Dict[str, object]:
+    """パーセンタイルとステップ数に対する伸びを計算する"""
+    lat_ms = np.asarray(result["latencies"]) * 1000.0
+    steps = np.asarray(result["step_counts"], dtype=np.float64)
+
+    summary: Dict[str, object] = {
+        "game_mode": result["game_mode"],
+        "control": result["control"],
+        # AppTest では全体の実行として測るので、フラグメントの再実行に対する上限
+        "measurement": "full_script_run_upper_bound",
+        "clicks": len(lat_ms),
+        "history_len": result["history_len"],
+        "mean_ms": float(lat_ms.mean()),
+        "max_ms": float(lat_ms.max()),
+    }
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = float(np.percentile(lat_ms, p))
+
+    # グリッドの送信量（1クリックで複数回描画されることがあるので、フレームあたりとクリックあたりの両方）
+    grid_bytes = np.asarray(result["grid_bytes"], dtype=np.float64)
+    frames = int(np.sum(result["grid_frames"]))
+    summary["grid_bytes_per_frame"] = float(grid_bytes.sum() / frames) if frames else None
+    summary["grid_bytes_per_click"] = float(grid_bytes.mean())
+    summary["grid_css_bytes"] = result["grid_css_bytes"]
+
+    # 最小二乗の傾き（ms / step）→ 100ステップあたり
+    if len(steps) >= 2 and steps.std() > 0:
+        slope = np.polyfit(steps, lat_ms, 1)[0]
+        summary["growth_ms_per_100_steps"] = float(slope * 100)
+    else:
+        summary["growth_ms_per_100_steps"] = None
+
+    # ステップ帯ごとの中央値（伸び方の目視用）
+    buckets = []
+    for lo in range(0, len(lat_ms), bucket):
+        seg = lat_ms[lo:lo + bucket]
+        buckets.append({
+            "steps": f"{int(steps[lo])}-{int(steps[min(lo + bucket, len(steps)) - 1])}",
+            "p50_ms": float(np.median(seg)),
+        })
+    summary["buckets"] = buckets
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="AppTest で main.py の1操作あたりの実行時間を測る")
+    parser.add_argument("--steps", type=int, default=300, help="1組み合わせあたりのクリック回数")
+    parser.add_argument("--modes", nargs="+", default=[GAME_MODE_AI_AND_AI, GAME_MODE_PLAYER_AND_AI])
+    parser.add_argument("--controls", nargs="+", default=[CONTROL_MODE_SIMPLE, CONTROL_MODE_LV0_Q])
+    parser.add_argument("--bucket", type=int, default=100, help="伸びを見るときのステップ帯の幅")
+    parser.add_argument("--timeout", type=float, default=60.0, help="1回のスクリプト実行のタイムアウト（秒）")
+    parser.add_argument("--json", default=None, help="結果を JSON で保存するパス")
+    args = parser.parse_args(argv)
+
+    # bare mode の警告を抑える
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    print(UPPER_BOUND_NOTE)
+    summaries = []
+    for game_mode in args.modes:
+        for control in args.controls:
+            result = run_scenario(game_mode, control, args.steps, args.timeout)
+            summary = summarize(result, args.bucket)
+            summaries.append(summary)
+
+            growth = summary["growth_ms_per_100_steps"]
+            print(f"\n[{game_mode} / {control}] clicks={summary['clicks']} history={summary['history_len']}")
+            print("  latency (全体の実行・上限): " + " ".join(f"p{p}={summary[f'p{p}_ms']:.1f}ms" for p in PERCENTILES)
+                  + f" max={summary['max_ms']:.1f}ms")
+            if summary["grid_bytes_per_frame"] is not None:
+                print(f"  grid payload: {summary['grid_bytes_per_frame']:.0f} B/frame"
+                      f" {summary['grid_bytes_per_click']:.0f} B/click（全体の実行・上限）"
+                      f" (stylesheet {summary['grid_css_bytes']} B, 全体の実行時のみ)")
+            if growth is not None:
+                print(f"  growth: {growth:+.2f} ms / 100 steps")
+            for b in summary["buckets"]:
+                print(f"    steps {b['steps']}: p50={b['p50_ms']:.1f}ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
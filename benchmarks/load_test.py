@@ -0,0 +1,331 @@
+"""
+同時接続ユーザーを模擬して、1つのサーバープロセスあたりの収容数を見積もる負荷試験。
+
+主な機能：
+1. ユーザーごとに AppTest のセッションを作り、Player and AI / AI and AI を混ぜて同時にプレイさせる。
+2. スクリプト実行は1本の「サーバー」スレッドで順番に処理する。
+   （AppTest は実行中にグローバルな状態を差し替えるため並列実行できない。
+    また実際のサーバーでも Python のスクリプト実行は GIL でほぼ直列になる）
+   各ユーザーはスレッドとして思考時間を挟みながらクリックを投げ、待ち時間込みのレイテンシを記録する。
+3. 計測項目
+   - セッションごとのメモリ（st.session_state の q_tables / q_agents / history とセッション全体）
+   - 1回のスクリプト実行あたりの CPU 時間
+   - クリックのレイテンシ（待ち時間込み）のパーセンタイル
+   - グリッドの描画で送ったバイト数（1フレームあたり・1クリックあたり。リモートのユーザーの通信量の目安）
+4. 上記からメモリ予算・コア数・ユーザーの操作頻度に対する収容数を見積もり、レポートを出力する。
+   AppTest はフラグメントだけの再実行をせず、1クリックをスクリプト全体の実行2〜3回として処理する
+   （apptest_latency の「計測値は上限」）。CPU 時間・レイテンシは上限、CPU による収容数は下限として読む。
+
+使い方（プロジェクトのルートで実行）
+- python -m benchmarks.load_test --users 50 100 200 --clicks 30
+- python -m benchmarks.load_test --users 100 --memory-budget-mb 4096 --cores 4 --json capacity.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.apptest_latency import APP_PATH, STEP_BUTTON_LABEL, PLAYER_BUTTON_LABELS, UPPER_BOUND_NOTE, payload_stats
+from src.config import (
+    GAME_MODE_AI_AND_AI,
+    GAME_MODE_PLAYER_AND_AI,
+    CONTROL_MODE_LV0_Q
+)
+
+# セッションのうちメモリの大半を占めるキー
+HEAVY_KEYS = ("q_tables", "q_agents", "history")
+PERCENTILES = (50, 90, 95, 99)
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """
+    オブジェクトから辿れるものの合計バイト数（同じオブジェクトは seen で1回だけ数える）。
+    """
+    if seen is None:
+        seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+
+        if isinstance(o, np.ndarray):
+            total += sys.getsizeof(o) + (o.nbytes if o.base is None else 0)
+            continue
+        total += sys.getsizeof(o)
+
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)) or type(o).__name__ == "deque":
+            stack.extend(o)
+        elif isinstance(o, (str, bytes, int, float, bool, type(None))):
+            pass
+        else:
+            if hasattr(o, "__dict__"):
+                stack.append(vars(o))
+            for slot in getattr(type(o), "__slots__", ()):
+                if hasattr(o, slot):
+                    stack.append(getattr(o, slot))
+    return total
+
+
+def _rss_bytes() -> int:
+    """現在の常駐メモリ（Linux は /proc、それ以外は最大常駐メモリで代用）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+
+class SimulatedUser:
+    """1ユーザー分の AppTest セッション"""
+
+    def __init__(self, user_id: int, game_mode: str, control: str, timeout: float) -> None:
+        self.user_id = user_id
+        self.game_mode = game_mode
+        self.control = control
+        self.timeout = timeout
+        self.at: Optional[AppTest] = None
+        self.clicks = 0
+
+    def setup(self) -> int:
+        """セッションを開き、モードを設定する。戻り値はスクリプト実行回数"""
+        at = AppTest.from_file(APP_PATH, default_timeout=self.timeout)
+        at.run()
+        runs = 1
+        for radio in at.sidebar.radio:
+            if radio.label == "ゲームモード":
+                radio.set_value(self.game_mode).run()
+                runs += 1
+        for selectbox in at.sidebar.selectbox:
+            if selectbox.key in ("ctrl_h0", "ctrl_h1"):
+                selectbox.set_value(self.control).run()
+                runs += 1
+        self.at = at
+        return runs
+
+    def click(self) -> int:
+        """1ステップ分クリックする。戻り値はスクリプト実行回数"""
+        # ステップ実行の最後に st.rerun() するため、描画し直しの1回が加わる
+        # （AppTest ではどれもスクリプト全体の実行。ブラウザではフラグメントだけの実行になる）
+        if self.game_mode == GAME_MODE_AI_AND_AI:
+            label = STEP_BUTTON_LABEL
+            runs = 2  # ステップ実行 → 再描画
+        else:
+            label = PLAYER_BUTTON_LABELS[self.clicks % len(PLAYER_BUTTON_LABELS)]
+            runs = 3  # Player ターン → AI ターン → 再描画
+        for button in self.at.button:
+            if button.label == label:
+                button.click().run()
+                self.clicks += 1
+                return runs
+        raise RuntimeError(f"user {self.user_id}: ボタン '{label}' が見つかりません")
+
+    def memory(self) -> Dict[str, int]:
+        """セッション内の主要キーとセッション全体のサイズ"""
+        state = self.at.session_state.filtered_state
+        seen: set = set()
+        sizes = {key: deep_sizeof(state.get(key), seen) for key in HEAVY_KEYS}
+        sizes["session_total"] = sum(sizes.values()) + deep_sizeof(
+            {k: v for k, v in state.items() if k not in HEAVY_KEYS}, seen
+        )
+        return sizes
+
+
+class Server:
+    """スクリプト実行を1本のスレッドで順番に処理する"""
+
+    def __init__(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="server")
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.cpu_seconds = 0.0
+        self.busy_seconds = 0.0
+
+    def _measured(self, fn):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        runs = fn()
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+        with self._lock:
+            self.runs += runs
+            self.cpu_seconds += cpu
+            self.busy_seconds += wall
+        return runs
+
+    def call(self, fn) -> int:
+        return self._executor.submit(self._measured, fn).result()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown()
+
+
+def run_load(num_users: int, clicks: int, think_time: float, control: str, timeout: float, seed: int) -> Dict[str, object]:
+    """
+    num_users 人が同時に clicks 回ずつクリックする負荷をかけ、計測結果を返す。
+    ユーザーの半分は Player and AI、残りは AI and AI でプレイする。
+    """
+    rng = random.Random(seed)
+    users = [
+        SimulatedUser(i, GAME_MODE_PLAYER_AND_AI if i % 2 == 0 else GAME_MODE_AI_AND_AI, control, timeout)
+        for i in range(num_users)
+    ]
+    server = Server()
+    rss_before = _rss_bytes()
+
+    for user in users:
+        server.call(user.setup)
+    # セットアップ分は CPU・送信量の集計から除く
+    payload_before = [dict(payload_stats(user.at)) for user in users]
+    server.runs = 0
+    server.cpu_seconds = 0.0
+    server.busy_seconds = 0.0
+
+    latencies: List[float] = []
+    lat_lock = threading.Lock()
+    think = [rng.expovariate(1.0 / think_time) if think_time > 0 else 0.0 for _ in range(num_users * clicks)]
+
+    def play(user: SimulatedUser) -> None:
+        for k in range(clicks):
+            time.sleep(think[user.user_id * clicks + k])
+            start = time.perf_counter()
+            server.call(user.click)
+            elapsed = time.perf_counter() - start
+            with lat_lock:
+                latencies.append(elapsed)
+
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_users, thread_name_prefix="user") as pool:
+        list(pool.map(play, users))
+    wall = time.perf_counter() - wall
+    server.shutdown()
+
+    rss_after = _rss_bytes()
+    memories = [user.memory() for user in users]
+    grid_bytes = sum(payload_stats(user.at)["grid_bytes_total"] - before["grid_bytes_total"]
+                     for user, before in zip(users, payload_before))
+    grid_frames = sum(payload_stats(user.at)["grid_frames"] - before["grid_frames"]
+                      for user, before in zip(users, payload_before))
+
+    # セッション間で共有されているオブジェクトは1回だけ数える
+    shared_seen: set = set()
+    unique_total = sum(
+        deep_sizeof(user.at.session_state.filtered_state.get(key), shared_seen)
+        for user in users for key in HEAVY_KEYS
+    )
+
+    lat_ms = np.asarray(latencies) * 1000.0
+    result: Dict[str, object] = {
+        "users": num_users,
+        "clicks_per_user": clicks,
+        "control": control,
+        "wall_seconds": wall,
+        "script_runs": server.runs,
+        "cpu_ms_per_run": server.cpu_seconds / server.runs * 1000.0 if server.runs else None,
+        "server_utilization": server.busy_seconds / wall if wall > 0 else None,
+        "rss_delta_mb": (rss_after - rss_before) / 2**20,
+        "rss_per_session_kb": (rss_after - rss_before) / num_users / 1024,
+        "heavy_keys_unique_mb": unique_total / 2**20,
+        "grid_bytes_per_frame": grid_bytes / grid_frames if grid_frames else None,
+        "grid_bytes_per_click": grid_bytes / (num_users * clicks),
+    }
+    for key in HEAVY_KEYS + ("session_total",):
+        values = np.asarray([m[key] for m in memories], dtype=np.float64) / 1024
+        result[f"{key}_kb_mean"] = float(values.mean())
+        result[f"{key}_kb_max"] = float(values.max())
+    for p in PERCENTILES:
+        result[f"latency_p{p}_ms"] = float(np.percentile(lat_ms, p))
+    result["latency_max_ms"] = float(lat_ms.max())
+    return result
+
+
+def capacity_estimate(result: Dict[str, object], memory_budget_mb: float, cores: int, clicks_per_sec: float) -> Dict[str, object]:
+    """
+    計測値から1プロセス・指定リソースでの収容ユーザー数を見積もる。
+    - メモリ: 予算 / セッションあたりサイズ（st.session_state 基準と RSS 基準の大きい方）
+    - CPU: Streamlit のスクリプト実行は1プロセスでほぼ1コア分しか使えないため、
+      コア数分のプロセスを立てる前提で cores / (1ユーザーが1秒に使う CPU 秒)
+      CPU 秒は全体の実行として測った上限なので、CPU による収容数は下限（安全側）になる。
+    """
+    per_session_kb = max(result["session_total_kb_mean"], result["rss_per_session_kb"])
+    runs_per_click = result["script_runs"] / (result["users"] * result["clicks_per_user"])
+    cpu_per_user_sec = (result["cpu_ms_per_run"] or 0.0) / 1000.0 * runs_per_click * clicks_per_sec
+
+    by_memory = int(memory_budget_mb * 1024 / per_session_kb) if per_session_kb > 0 else None
+    by_cpu = int(cores / cpu_per_user_sec) if cpu_per_user_sec > 0 else None
+    limits = [v for v in (by_memory, by_cpu) if v is not None]
+    return {
+        "memory_budget_mb": memory_budget_mb,
+        "cores": cores,
+        "clicks_per_sec_per_user": clicks_per_sec,
+        "per_session_kb": per_session_kb,
+        "cpu_sec_per_user_sec": cpu_per_user_sec,
+        "max_users_by_memory": by_memory,
+        "max_users_by_cpu": by_cpu,
+        "max_users": min(limits) if limits else None,
+        "bottleneck": ("memory" if by_memory is not None and (by_cpu is None or by_memory <= by_cpu) else "cpu"),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="同時接続ユーザーを模擬して収容数を見積もる")
+    parser.add_argument("--users", type=int, nargs="+", default=[50, 100, 200], help="同時ユーザー数（複数指定で順に実行）")
+    parser.add_argument("--clicks", type=int, default=30, help="ユーザーあたりのクリック回数")
+    parser.add_argument("--think-time", type=float, default=0.5, help="クリック間の平均思考時間（秒、指数分布）")
+    parser.add_argument("--control", default=CONTROL_MODE_LV0_Q, help="AI ハンターの制御モード")
+    parser.add_argument("--memory-budget-mb", type=float, default=2048.0, help="見積もりに使うメモリ予算")
+    parser.add_argument("--cores", type=int, default=2, help="見積もりに使うコア数")
+    parser.add_argument("--clicks-per-sec", type=float, default=1.0, help="見積もりに使う1ユーザーの操作頻度")
+    parser.add_argument("--timeout", type=float, default=120.0, help="1回のスクリプト実行のタイムアウト（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="レポートを JSON で保存するパス")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    print(UPPER_BOUND_NOTE)
+    report = []
+    for n in args.users:
+        result = run_load(n, args.clicks, args.think_time, args.control, args.timeout, args.seed)
+        estimate = capacity_estimate(result, args.memory_budget_mb, args.cores, args.clicks_per_sec)
+        report.append({"measured": result, "capacity": estimate})
+
+        print(f"\n=== users={n} clicks/user={args.clicks} control={args.control} ===")
+        print(f"  script runs (全体の実行): {result['script_runs']}  CPU/run: {result['cpu_ms_per_run']:.2f}ms"
+              f"  server utilization: {result['server_utilization']:.0%}")
+        print("  latency (上限): " + " ".join(f"p{p}={result[f'latency_p{p}_ms']:.0f}ms" for p in PERCENTILES)
+              + f" max={result['latency_max_ms']:.0f}ms")
+        print(f"  memory/session: total={result['session_total_kb_mean']:.0f}KB"
+              + "".join(f" {key}={result[f'{key}_kb_mean']:.0f}KB" for key in HEAVY_KEYS)
+              + f"  RSS/session={result['rss_per_session_kb']:.0f}KB")
+        print(f"  heavy keys (共有分を除く合計): {result['heavy_keys_unique_mb']:.1f}MB")
+        if result["grid_bytes_per_frame"] is not None:
+            print(f"  grid payload: {result['grid_bytes_per_frame']:.0f} B/frame {result['grid_bytes_per_click']:.0f} B/click（上限）")
+        print(f"  capacity ({args.memory_budget_mb:.0f}MB, {args.cores} cores, {args.clicks_per_sec}/s):"
+              f" memory={estimate['max_users_by_memory']} cpu={estimate['max_users_by_cpu']}"
+              f" -> {estimate['max_users']} users (bottleneck: {estimate['bottleneck']}, CPU は下限)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+ハンターと獲物の割り当て（どのハンターがどの獲物を狙うか）を決めるモジュール。
+
+主な機能：
+1. 全ハンター × 全獲物のトーラス距離行列を numpy で一括計算する。
+2. 距離の合計が最小になる割り当て（ハンガリアン法）または貪欲法で、ハンターに獲物を割り当てる。
+3. 捕獲済みの獲物は候補から外し、毎ステップ割り当て直す。
+   獲物よりハンターが多いときは、余ったハンターを最寄りの未捕獲の獲物に向かわせる。
+4. ハンター・獲物が2体以下（このゲームの大きさ）のときは numpy を使わず、Python の比較だけで同じ割り当てを求める
+   （毎ステップ呼ばれるので、小さな行列で numpy の呼び出しコストを払わない）。
+
+使い方
+- targets = assign_targets(state, captured)  # {'hunter_0': 'prey_1', 'hunter_1': 'prey_0'}
+- cost = torus_distance_matrix(hunter_xy, prey_xy)
+- rows = solve_assignment(cost) / greedy_assignment(cost)
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.env.game_env import GRID_SIZE
+
+ASSIGNMENT_HUNGARIAN = "hungarian"
+ASSIGNMENT_GREEDY = "greedy"
+
+# 距離が同じときは hunter_i → prey_i を優先する（距離は整数なので合計で 1 未満に収まる小さな値）
+_TIE_BREAK = 1e-4
+
+# ハンター数・獲物数がともにこれ以下なら Python だけで解く
+_SMALL_SIZE = 2
+
+
+def torus_distance_matrix(hunter_xy: np.ndarray, prey_xy: np.ndarray, grid_size: int = GRID_SIZE) -> np.ndarray:
+    """
+    (H, 2) と (P, 2) の座標から、(H, P) のトーラス上のマンハッタン距離を返す。
+    Lv0 は上下左右に1マスずつ動くので、マンハッタン距離が到達ステップ数になる。
+    """
+    d = np.abs(hunter_xy[:, None, :] - prey_xy[None, :, :]) % grid_size
+    d = np.minimum(d, grid_size - d)
+    return d.sum(axis=-1)
+
+
+def _hungarian(cost: np.ndarray) -> np.ndarray:
+    """
+    行数 <= 列数 のコスト行列に対する最小コスト割り当て（O(n^2 m)）。
+    戻り値: 各行に割り当てた列番号
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)    # p[j] = 列 j に割り当てた行（1始まり、0 は未割り当て）
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (cur < minv[1:])
+            minv[1:][better] = cur[better]
+            way[1:][better] = j0
+
+            masked = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(masked)) + 1
+            delta = masked[j1 - 1]
+
+            used_cols = np.flatnonzero(used)
+            u[p[used_cols]] += delta
+            v[used_cols] -= delta
+            minv[1:][free] -= delta
+
+            j0 = j1
+            if p[j0] == 0:
+                break
+
+        # 増加路に沿って割り当てを入れ替える
+        while True:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+
+    rows = np.full(n, -1, dtype=np.int64)
+    for j in range(1, m + 1):
+        if p[j] != 0:
+            rows[p[j] - 1] = j - 1
+    return rows
+
+
+def solve_assignment(cost: np.ndarray) -> np.ndarray:
+    """
+    最小コストの割り当てを返す。戻り値は各行（ハンター）に割り当てた列（獲物）番号。
+    行が列より多いときは、割り当てられなかった行が -1 になる。
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    h, p = cost.shape
+    if h == 0 or p == 0:
+        return np.full(h, -1, dtype=np.int64)
+    if h <= p:
+        return _hungarian(cost)
+
+    cols = _hungarian(cost.T)
+    rows = np.full(h, -1, dtype=np.int64)
+    rows[cols] = np.arange(p)
+    return rows
+
+
+def greedy_assignment(cost: np.ndarray) -> np.ndarray:
+    """
+    距離の短い組から順に確定していく貪欲な割り当て（最適とは限らないが O(HP log HP)）。
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    h, p = cost.shape
+    rows = np.full(h, -1, dtype=np.int64)
+    if h == 0 or p == 0:
+        return rows
+
+    col_used = np.zeros(p, dtype=bool)
+    remaining = min(h, p)
+    for flat in np.argsort(cost, axis=None, kind="stable"):
+        r, c = divmod(int(flat), p)
+        if rows[r] >= 0 or col_used[c]:
+            continue
+        rows[r] = c
+        col_used[c] = True
+        remaining -= 1
+        if remaining == 0:
+            break
+    return rows
+
+
+def _torus_distance(a: Tuple[int, int], b: Tuple[int, int]) -> int:
+    dx = abs(a[0] - b[0]) % GRID_SIZE
+    dy = abs(a[1] - b[1]) % GRID_SIZE
+    return min(dx, GRID_SIZE - dx) + min(dy, GRID_SIZE - dy)
+
+
+def _argmin(values: List[float]) -> int:
+    """最初に見つかった最小値の位置（np.argmin と同じ）"""
+    best = 0
+    for i in range(1, len(values)):
+        if values[i] < values[best]:
+            best = i
+    return best
+
+
+def _small_assignment(cost: List[List[float]], method: str) -> List[int]:
+    """
+    行数・列数が _SMALL_SIZE 以下のコスト行列について、solve_assignment / greedy_assignment と同じ割り当てを返す
+    （余った行の最寄りへの割り当ても含む）。
+    """
+    h, p = len(cost), len(cost[0])
+    if method == ASSIGNMENT_GREEDY:
+        # np.argsort(kind="stable") と同じ順（コストが同じなら行優先の順）
+        rows = [-1] * h
+        col_used = [False] * p
+        for flat in sorted(range(h * p), key=lambda f: cost[f // p][f % p]):
+            r, c = divmod(flat, p)
+            if rows[r] < 0 and not col_used[c]:
+                rows[r] = c
+                col_used[c] = True
+    elif h == 2 and p == 2:
+        # 2 x 2 は2通りの合計を比べるだけ（同じなら hunter_0 → 列 0 の組）
+        keep = cost[0][0] + cost[1][1] <= cost[0][1] + cost[1][0]
+        rows = [0, 1] if keep else [1, 0]
+    elif h <= p:
+        # 1 行: 最小の列
+        rows = [_argmin(cost[0])] if h == 1 else []
+    else:
+        # 1 列: 最小の行だけが割り当てられる（残りは下で最寄りへ）
+        rows = [-1] * h
+        rows[_argmin([row[0] for row in cost])] = 0
+
+    return [c if c >= 0 else _argmin(cost[r]) for r, c in enumerate(rows)]
+
+
+def _ids_with_prefix(state: Dict[str, Tuple[int, int]], prefix: str) -> List[str]:
+    ids = [key for key in state if key.startswith(prefix)]
+    return sorted(ids, key=lambda key: int(key.split("_")[1]))
+
+
+@lru_cache(maxsize=16)
+def _agent_ids(keys: Tuple[str, ...]) -> Tuple[Tuple[str, ...], Tuple[int, ...], Tuple[str, ...], Tuple[int, ...]]:
+    """state のキーの並びから (ハンターID, その番号, 獲物ID, その番号) を作る（キーの並びは毎ステップ同じなので使い回す）"""
+    state = dict.fromkeys(keys)
+    hunter_ids = tuple(_ids_with_prefix(state, "hunter_"))
+    prey_ids = tuple(_ids_with_prefix(state, "prey_"))
+    return (
+        hunter_ids,
+        tuple(int(h.split("_")[1]) for h in hunter_ids),
+        prey_ids,
+        tuple(int(p.split("_")[1]) for p in prey_ids),
+    )
+
+
+def assign_targets(
+    state: Dict[str, Tuple[int, int]],
+    captured: Dict[str, bool],
+    method: str = ASSIGNMENT_HUNGARIAN,
+) -> Dict[str, Optional[str]]:
+    """
+    state 内の全ハンターに、未捕獲の獲物を割り当てる。
+
+    戻り値: {hunter_id: prey_id}。未捕獲の獲物が無いハンターは None。
+    """
+    hunter_ids, hunter_num, all_prey_ids, all_prey_num = _agent_ids(tuple(state))
+    free = [not captured.get(prey_id, False) for prey_id in all_prey_ids]
+    prey_ids = [prey_id for prey_id, f in zip(all_prey_ids, free) if f]
+    if len(prey_ids) == 0:
+        return {hunter_id: None for hunter_id in hunter_ids}
+
+    # 同点時は「番号が同じ獲物」を優先（hunter_0 → prey_0, hunter_1 → prey_1）
+    prey_num = [num for num, f in zip(all_prey_num, free) if f]
+
+    if len(hunter_ids) <= _SMALL_SIZE and len(prey_ids) <= _SMALL_SIZE:
+        cost = [
+            [_torus_distance(state[hunter_id], state[prey_id]) + (_TIE_BREAK if hn != pn else 0.0)
+             for prey_id, pn in zip(prey_ids, prey_num)]
+            for hunter_id, hn in zip(hunter_ids, hunter_num)
+        ]
+        rows = _small_assignment(cost, method)
+        return {hunter_id: prey_ids[col] for hunter_id, col in zip(hunter_ids, rows)}
+
+    hunter_xy = np.array([state[hunter_id] for hunter_id in hunter_ids], dtype=np.int64)
+    prey_xy = np.array([state[prey_id] for prey_id in prey_ids], dtype=np.int64)
+    dist = torus_distance_matrix(hunter_xy, prey_xy)
+
+    cost = dist + _TIE_BREAK * (np.array(hunter_num)[:, None] != np.array(prey_num)[None, :])
+
+    if method == ASSIGNMENT_GREEDY:
+        rows = greedy_assignment(cost)
+    else:
+        rows = solve_assignment(cost)
+
+    # 獲物が足りずに余ったハンターは最寄りの獲物へ
+    unassigned = rows < 0
+    if unassigned.any():
+        rows[unassigned] = np.argmin(cost[unassigned], axis=1)
+
+    return {hunter_id: prey_ids[int(col)] for hunter_id, col in zip(hunter_ids, rows)}
@@ -0,0 +1,127 @@
+"""
+パートナーの意図を推定して行動するエージェント（Lv.1）を定義する。
+
+主な機能：
+1. パートナー（もう一方のハンター）の意図G（prey_0 / prey_1）についての信念を対数オッズで保持する。
+2. パートナーの行動を観測するたびに、Lv.0 の行動モデル P(A|S,G)
+   （Lv0 ルール、またはパートナーのQテーブルの貪欲行動 + ε ノイズ）の尤度でベイズ更新する。
+   1回の更新は定数時間（履歴を走査しない）。
+3. パートナーが狙っていると推定した獲物とは反対の獲物を自分の意図Gとし、Lv0 と同じ規則で移動する。
+   推定が五分五分に近いときは距離による割り当て（assign_targets）に従う。
+"""
+
+import math
+from typing import Any, Dict, Optional, Tuple
+
+from src.agents.lv0 import Lv0Agent
+from src.agents.assignment import assign_targets
+from src.agents.q_utils import ACTION_LABEL_TO_ID, q_choose_best_action_for_target
+from src.config import (
+    AGENT_ID_HUNTER_0,
+    AGENT_ID_HUNTER_1,
+    AGENT_ID_PREY_0,
+    AGENT_ID_PREY_1,
+    TARGET_ASSIGNMENT_METHOD
+)
+
+# 行動モデルのノイズ（予測と違う行動をとる確率）
+DEFAULT_EPSILON = 0.1
+# 1ステップごとに信念を事前分布へ戻す割合（パートナーが目標を切り替えたときに追従するため）
+DEFAULT_BELIEF_DECAY = 0.9
+# この確率より確信が弱いときは距離による割り当てに従う
+DEFAULT_DECISION_MARGIN = 0.1
+
+_NUM_ACTIONS = 5
+_MAX_LOG_ODDS = 20.0
+
+
+class Lv1Agent:
+
+    def __init__(
+        self,
+        agent_id: str,
+        epsilon: float = DEFAULT_EPSILON,
+        belief_decay: float = DEFAULT_BELIEF_DECAY,
+        decision_margin: float = DEFAULT_DECISION_MARGIN,
+    ) -> None:
+        """
+        エージェントの初期化（パートナーはもう一方のハンター）
+        """
+        self.agent_id = agent_id
+        self.partner_id = AGENT_ID_HUNTER_1 if agent_id == AGENT_ID_HUNTER_0 else AGENT_ID_HUNTER_0
+        self.epsilon = epsilon
+        self.belief_decay = belief_decay
+        self.decision_margin = decision_margin
+        self.mover = Lv0Agent(agent_id=agent_id)
+        self.partner_model = Lv0Agent(agent_id=self.partner_id)
+        self.reset()
+
+    def reset(self) -> None:
+        """信念を五分五分に戻す"""
+        # log P(G=prey_0) - log P(G=prey_1)
+        self.log_odds = 0.0
+
+    @property
+    def belief(self) -> Dict[str, float]:
+        """パートナーの意図についての信念 {prey_id: 確率}"""
+        p0 = 1.0 / (1.0 + math.exp(-self.log_odds))
+        return {AGENT_ID_PREY_0: p0, AGENT_ID_PREY_1: 1.0 - p0}
+
+    def _predict_partner(self, state: Dict[str, Tuple[int, int]], prey_id: str, partner_q_table: Any) -> Optional[int]:
+        """意図G=prey_id のときにパートナーがとる行動（Qテーブルに状態が無ければ None）"""
+        if isinstance(partner_q_table, dict):
+            hx, hy = state[self.partner_id]
+            px, py = state[prey_id]
+            label, _ = q_choose_best_action_for_target(partner_q_table, hx, hy, px, py)
+            return ACTION_LABEL_TO_ID.get(label) if label is not None else None
+        return self.partner_model.choose_action(state, prey_id)
+
+    def _likelihood(self, predicted: Optional[int], action: int) -> float:
+        if predicted is None:
+            return 1.0 / _NUM_ACTIONS
+        noise = self.epsilon / _NUM_ACTIONS
+        return 1.0 - self.epsilon + noise if action == predicted else noise
+
+    def observe(
+        self,
+        state: Dict[str, Tuple[int, int]],
+        partner_action: int,
+        captured: Dict[str, bool],
+        partner_q_table: Any = None,
+    ) -> None:
+        """
+        パートナーが状態 state で partner_action をとったことを観測し、信念を更新する。
+        partner_q_table が dict ならQテーブルの貪欲行動、そうでなければ Lv0 ルールを行動モデルに使う。
+        state はパートナーが移動する前の状態であること。
+        """
+        if captured.get(AGENT_ID_PREY_0, False) or captured.get(AGENT_ID_PREY_1, False):
+            # 残りの獲物が1つなら意図は推定するまでもない
+            return
+
+        l0 = self._likelihood(self._predict_partner(state, AGENT_ID_PREY_0, partner_q_table), partner_action)
+        l1 = self._likelihood(self._predict_partner(state, AGENT_ID_PREY_1, partner_q_table), partner_action)
+        log_odds = self.belief_decay * self.log_odds + math.log(l0) - math.log(l1)
+        self.log_odds = max(-_MAX_LOG_ODDS, min(_MAX_LOG_ODDS, log_odds))
+
+    def select_target(self, state: Dict[str, Tuple[int, int]], captured: Dict[str, bool]) -> str:
+        """パートナーが狙っていない方の獲物を自分の意図Gとして返す"""
+        free = [prey_id for prey_id in (AGENT_ID_PREY_0, AGENT_ID_PREY_1) if not captured.get(prey_id, False)]
+        if len(free) == 1:
+            return free[0]
+
+        p0 = self.belief[AGENT_ID_PREY_0]
+        if abs(p0 - 0.5) >= self.decision_margin:
+            return AGENT_ID_PREY_1 if p0 > 0.5 else AGENT_ID_PREY_0
+
+        target = assign_targets(state, captured, TARGET_ASSIGNMENT_METHOD).get(self.agent_id)
+        if target is not None:
+            return target
+        return AGENT_ID_PREY_0 if self.agent_id == AGENT_ID_HUNTER_0 else AGENT_ID_PREY_1
+
+    def choose_action(self, state: Dict[str, Tuple[int, int]], captured: Dict[str, bool]) -> Tuple[int, str]:
+        """
+        戻り値：
+        (action_id, 自分の意図G)
+        """
+        target = self.select_target(state, captured)
+        return self.mover.choose_action(state, target), target
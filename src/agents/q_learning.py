@@ -6,26 +6,85 @@
 - 生成: agent = QLearningAgent(q_table, agent_id)
 - 実行: action_id, prey_id, action_label = agent.choose_action(state)
   - state は {'hunter_0': (x,y), 'prey_0': (x,y), ...} の形
+  - captured を渡すとその捕獲状況を使う（省略時は st.session_state.env の状態コードの捕獲フラグ）
   - 戻り値の action_id は環境の行動ID（1=上,2=下,3=左,4=右,0=停止）
+- 変換済みの配列から生成: agent = QLearningAgent(None, agent_id, compiled=compiled)
+  - compiled は q_compile_table と同じ形式の dict（q_utils.compiled_arrays で作れる）
+  - 状態コード・バッチの判定だけに使える（dict の q_table を使う choose_action は使えない）
+- テーブルの差し替え: agent.set_q_table(q_table, compiled)（compiled は省略すると初回の判定時に変換する）
+- 状態コードで実行: action_id, prey_index = agent.choose_action_code(code)
+  - code は src.env.state_code の整数（捕獲フラグを含む）。prey_index は 0 / 1（候補なしは -1）
+- バッチ実行: action_ids, prey_indices = agent.choose_actions_batch(positions, captured)
+  - positions は (N, 6) の [hx, hy, p0x, p0y, p1x, p1y]、captured は (N, 2) の bool
+  - prey_indices は 0 / 1（候補なしは -1）
 """
 
 from typing import Any, Dict, Tuple, Optional
-from src.agents.q_utils import q_choose_action
+import numpy as np
+from src.agents.q_utils import q_choose_action, q_compile_table, q_choose_action_code, q_choose_actions_batch
+from src.env import state_code
 
 
 class QLearningAgent:
-    def __init__(self, q_table: Any, agent_id: str) -> None:
+    def __init__(self, q_table: Any, agent_id: str, compiled: Optional[Dict[str, Any]] = None) -> None:
         """
         q_table: 学習済みQテーブル（dict を想定）
         agent_id: 'hunter_0' / 'hunter_1' など
+        compiled: q_table を変換済みの配列（ファイルから読み込んだものなど）。q_table が None でもよい
         """
-        self.q_table = q_table
         self.agent_id = agent_id
+        self.slot = state_code.SLOT[agent_id]
+        # (テーブル, 変換済みの配列) を1つの属性で持つ（差し替えが代入1回で済み、別スレッドから見ても組がずれない）
+        self._tables: Tuple[Any, Optional[Dict[str, Any]]] = (q_table, compiled)
 
-    def choose_action(self, state: Dict[str, Tuple[int, int]]) -> Tuple[Optional[int], Optional[str], Optional[str]]:
+    @property
+    def q_table(self) -> Any:
+        return self._tables[0]
+
+    @q_table.setter
+    def q_table(self, q_table: Any) -> None:
+        self.set_q_table(q_table)
+
+    def set_q_table(self, q_table: Any, compiled: Optional[Dict[str, Any]] = None) -> None:
+        """テーブルを差し替える。変換済みの配列はエージェントが持ち、テーブルと一緒に解放される。"""
+        self._tables = (q_table, compiled)
+
+    def choose_action(
+        self,
+        state: Dict[str, Tuple[int, int]],
+        captured: Optional[Dict[str, bool]] = None,
+    ) -> Tuple[Optional[int], Optional[str], Optional[str]]:
         """
         state を見て、(action_id, 選んだ獲物ID, 行動ラベル) を返す。
         捕獲済みの獲物は q_utils 側で除外されます。
         """
-        action_id, prey_id, label = q_choose_action(state, self.agent_id, self.q_table)
+        action_id, prey_id, label = q_choose_action(state, self.agent_id, self.q_table, captured)
         return action_id, prey_id, label
+
+    def compiled_table(self) -> Optional[Dict[str, np.ndarray]]:
+        """
+        判定用の密な配列。テーブルごとに初回だけ変換して持っておく
+        （q_table が差し替わったら新しいテーブルの分を使う）。
+        """
+        q_table, compiled = self._tables
+        if compiled is None:
+            compiled = q_compile_table(q_table)
+            # 変換中に差し替えられていたら、新しいテーブルの組を上書きしない
+            if self._tables[0] is q_table:
+                self._tables = (q_table, compiled)
+        return compiled
+
+    def choose_action_code(self, code: int) -> Tuple[int, int]:
+        """
+        状態コード1つから (action_id, 選んだ獲物番号) を返す。
+        判定規則は choose_action と同じ（Qテーブルが dict でないときは (-1, -1)）。
+        """
+        return q_choose_action_code(code, self.slot, self.compiled_table())
+
+    def choose_actions_batch(self, positions: np.ndarray, captured: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        N 個の状態をまとめて判定し、(行動IDの配列, 選んだ獲物番号の配列) を返す。
+        positions は (N, 6) の [hx, hy, p0x, p0y, p1x, p1y]、captured は (N, 2)。
+        判定規則は choose_action と同じ。
+        """
+        return q_choose_actions_batch(positions, captured, self.compiled_table())
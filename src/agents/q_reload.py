@@ -0,0 +1,192 @@
+"""
+Qテーブルファイルを監視し、バックグラウンドで読み込んで QLearningAgent に差し替えるモジュール。
+
+主な機能：
+1. プロセスで1つのストア（get_q_table_store）が、使われているQテーブルのパスを監視する。
+   監視は1本のデーモンスレッドで、POLL_INTERVAL 秒ごとにファイルの更新時刻・サイズを確認する。
+2. 変更があれば、そのスレッドで pickle を読み込み、形式を検証する
+   （dict であること、キーが (hx, hy, px, py) の整数4つ組、値が行動ラベル → 数値の dict）。
+   判定用の密な配列（q_utils.q_compile_table）もこのスレッドで作り、テーブルと一緒にエントリに持つ。
+3. 検証に通ったテーブルだけを、そのパスを使う全ての QLearningAgent に差し替える（set_q_table の代入1回なので原子的）。
+   変換済みの配列は全エージェントで共有し、古いテーブルの分は差し替え後に参照が無くなれば解放される。
+   検証に失敗したときは古いテーブルを使い続け、エラーを記録する。
+4. スクリプトの実行（rerun）側は get() で「いまのテーブル（まだ無ければ None）」を見るだけで、
+   pickle の読み込みを待たない。
+5. テーブルはセッション間で共有する（QLearningAgent はテーブルを書き換えない）。
+"""
+
+import os
+import pickle
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.env.game_env import GRID_SIZE
+from src.agents.q_utils import ACTION_LABEL_TO_ID, q_compile_table
+
+POLL_INTERVAL = 1.0
+
+
+def validate_q_table(q: Any) -> Optional[str]:
+    """Qテーブルとして使えるか検証する。問題があればその内容、無ければ None を返す。"""
+    if not isinstance(q, dict):
+        return f"dict ではありません（type={type(q).__name__}）"
+    if not q:
+        return "空のテーブルです"
+
+    labels = set(ACTION_LABEL_TO_ID)
+    for key, values in q.items():
+        if not (isinstance(key, tuple) and len(key) == 4
+                and all(isinstance(v, (int, np.integer)) and 0 <= v < GRID_SIZE for v in key)):
+            return f"状態キーの形式が不正です: {key!r}"
+        if not isinstance(values, dict) or not values:
+            return f"{key} の値が行動ラベルの dict ではありません"
+        unknown = set(values) - labels
+        if unknown:
+            return f"{key} に未知の行動ラベルがあります: {sorted(map(str, unknown))}"
+        if not all(isinstance(v, (int, float, np.number)) for v in values.values()):
+            return f"{key} に数値でないQ値があります"
+    return None
+
+
+class _Entry:
+    """1つのパスの状態"""
+
+    def __init__(self) -> None:
+        self.table: Optional[Dict] = None
+        self.compiled: Optional[Dict[str, Any]] = None  # table を q_compile_table で変換したもの
+        self.signature: Optional[Tuple[float, int]] = None  # 最後に読み込みを試みたファイルの (mtime, size)
+        self.version = 0
+        self.error: Optional[str] = None
+        self.loading = True
+        self.agents: "weakref.WeakSet" = weakref.WeakSet()
+
+
+class QTableStore:
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL) -> None:
+        self.poll_interval = poll_interval
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- 実行側（ブロックしない） ---
+
+    def _entry(self, path: str) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                entry = _Entry()
+                self._entries[path] = entry
+                self._wake.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._watch, name="q-table-watcher", daemon=True)
+                self._thread.start()
+        return entry
+
+    def get(self, path: str) -> Optional[Dict]:
+        """いま使えるテーブルを返す（初回はまだ読み込み中なので None）"""
+        return self._entry(path).table
+
+    def status(self, path: str) -> Dict[str, Any]:
+        """サイドバー表示用の状態"""
+        entry = self._entry(path)
+        return {
+            "loaded": entry.table is not None,
+            "loading": entry.loading,
+            "states": len(entry.table) if entry.table is not None else 0,
+            "version": entry.version,
+            "error": entry.error,
+        }
+
+    def register(self, path: str, agent: Any) -> None:
+        """agent（QLearningAgent）を、path のテーブルが更新されたら差し替える対象にする"""
+        entry = self._entry(path)
+        with self._lock:
+            entry.agents.add(agent)
+            if entry.table is not None:
+                agent.set_q_table(entry.table, entry.compiled)
+
+    # --- 監視スレッド ---
+
+    def _watch(self) -> None:
+        while True:
+            with self._lock:
+                paths = list(self._entries.items())
+            for path, entry in paths:
+                try:
+                    self._check(path, entry)
+                except Exception as e:
+                    # 検証・変換中の例外（MemoryError など）で監視スレッドを止めない。
+                    # signature は更新済みなので、ファイルが更新されるまで同じ内容を読み直さない
+                    entry.error = f"{path} の読み込みに失敗: {type(e).__name__}: {e}"
+                    entry.loading = False
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _check(self, path: str, entry: _Entry) -> None:
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            entry.error = f"{path} を開けません: {e.strerror}"
+            entry.loading = False
+            # ファイルが戻されたら（同じ mtime・サイズでも）読み直す
+            entry.signature = None
+            return
+
+        signature = (stat.st_mtime, stat.st_size)
+        if signature == entry.signature:
+            return
+        entry.signature = signature
+
+        try:
+            with open(path, "rb") as f:
+                table = pickle.load(f)
+        except Exception as e:
+            # 書き込み途中などで読めないときは、次に更新されたときに読み直す
+            entry.error = f"{path} の読み込みに失敗: {e}"
+            entry.loading = False
+            return
+
+        error = validate_q_table(table)
+        if error is not None:
+            entry.error = f"{path}: {error}"
+            entry.loading = False
+            return
+
+        # 判定用の密な配列もここで作っておく（差し替え後の最初のステップで変換を待たない）
+        compiled = q_compile_table(table)
+
+        with self._lock:
+            entry.table = table
+            entry.compiled = compiled
+            entry.version += 1
+            entry.error = None
+            entry.loading = False
+            for agent in list(entry.agents):
+                agent.set_q_table(table, compiled)
+
+    def wait_loaded(self, path: str, timeout: float) -> Optional[Dict]:
+        """読み込みが終わるまで待つ（UI 以外のテスト・ツール用）"""
+        entry = self._entry(path)
+        deadline = time.monotonic() + timeout
+        while entry.loading and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return entry.table
+
+
+_store: Optional[QTableStore] = None
+_store_lock = threading.Lock()
+
+
+def get_q_table_store() -> QTableStore:
+    """プロセスで共有するストアを返す"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = QTableStore()
+        return _store
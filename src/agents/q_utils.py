@@ -6,13 +6,27 @@
 - ACTION_LABEL_TO_ID: 行動ラベルを action_id に変換する。
 - q_choose_best_action_for_target(q, hx, hy, px, py):
   行動ラベルとそのスコアを返す。見つからないときは (None, None)。
-- q_choose_action(state, hunter_id, q):
+- q_choose_action(state, hunter_id, q, captured=None):
   (action_id, prey_id, action_label) を返す。候補が無いときは (0, None, "STAY")。
+  captured を省略すると st.session_state.env の状態コードの捕獲フラグを使う（Streamlit 外では明示的に渡す）。
+- q_compile_table(q):
+  Qテーブルを「状態ごとの最良行動ID・スコア」の密な配列に変換する（バッチ判定用）。
+- compiled_arrays(action, score):
+  action / score の配列（メモリマップしたファイルなど）を q_compile_table と同じ形式の dict にする。
+- q_choose_actions_batch(positions, captured, compiled):
+  (N, 6) の位置配列と (N, 2) の捕獲マスクから、行動ID と獲物番号の配列を返す。
+  q_choose_action と同じ規則（捕獲済みの除外、同点は prey_0、候補なしは STAY）。
+- q_choose_action_code(code, hunter_slot, compiled):
+  state_code の整数1つから (action_id, 獲物番号) を返す。規則は q_choose_action と同じ。
 """
 
 from typing import Any, Dict, Optional, Tuple
+import numpy as np
 import streamlit as st
 
+from src.env.game_env import GRID_SIZE
+from src.env import state_code
+
 # 行動ラベル → 環境の行動ID（上=1, 下=2, 左=3, 右=4, 停止=0）
 ACTION_LABEL_TO_ID: Dict[str, int] = {
     "UP": 1,
@@ -21,6 +35,7 @@ ACTION_LABEL_TO_ID: Dict[str, int] = {
     "RIGHT": 4,
     "STAY": 0,
 }
+ACTION_ID_TO_LABEL: Dict[int, str] = {action_id: label for label, action_id in ACTION_LABEL_TO_ID.items()}
 
 
 def q_choose_best_action_for_target(
@@ -65,6 +80,7 @@ def q_choose_action(
     state: Dict[str, Tuple[int, int]],
     hunter_id: str,
     q_table: Any,
+    captured: Optional[Dict[str, bool]] = None,
 ) -> Tuple[Optional[int], Optional[str], Optional[str]]:
     """
     prey_0 と prey_1 を評価して、より良い方の行動を選ぶ。
@@ -81,10 +97,12 @@ def q_choose_action(
     hx = hunter_pos[0]
     hy = hunter_pos[1]
 
-    if "captured" in st.session_state:
-        captured = st.session_state.captured
-    else:
-        captured = {"prey_0": False, "prey_1": False}
+    if captured is None:
+        if "env" in st.session_state:
+            flag_0, flag_1 = state_code.captured_flags(st.session_state.env.code)
+            captured = {"prey_0": flag_0, "prey_1": flag_1}
+        else:
+            captured = {"prey_0": False, "prey_1": False}
 
     candidates: list[tuple[str, str, float]] = []
 
@@ -135,3 +153,137 @@ def q_choose_action(
         action_id = ACTION_LABEL_TO_ID["STAY"]
 
     return action_id, best_prey_id, best_label
+
+
+def q_state_index(hx, hy, px, py):
+    """
+    (hx, hy, px, py) を q_compile_table の配列の添字に変換する（numpy 配列も可）。
+    """
+    return ((hx * GRID_SIZE + hy) * GRID_SIZE + px) * GRID_SIZE + py
+
+
+def q_compile_table(q_table: Any) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Qテーブルを密な配列に変換する。dict 以外は None。
+
+    戻り値:
+    - "action": (GRID_SIZE**4,) int8。状態ごとの最良行動ID。候補なしは -1。
+      （ACTION_LABEL_TO_ID に無いラベルは q_choose_action と同じく STAY=0 として扱う）
+    - "score": (GRID_SIZE**4,) float64。最良スコア。None は -inf。
+    - "action_view" / "score_view": 上の配列の memoryview（1状態ずつ引く用。コピーしない）
+    最良行動の選び方は q_choose_best_action_for_target と同じなので、同点時の規則も同じになる。
+    """
+    if isinstance(q_table, dict) is False:
+        return None
+
+    size = GRID_SIZE ** 4
+    action = np.full(size, -1, dtype=np.int8)
+    score = np.full(size, -np.inf, dtype=np.float64)
+
+    stay = ACTION_LABEL_TO_ID["STAY"]
+    for state_key, q_dict in q_table.items():
+        if isinstance(state_key, tuple) is False or len(state_key) != 4:
+            continue
+        if not all(isinstance(c, (int, np.integer)) and 0 <= c < GRID_SIZE for c in state_key):
+            continue
+        if isinstance(q_dict, dict) is False or len(q_dict) == 0:
+            continue
+
+        # q_choose_best_action_for_target と同じ規則（最初に見つかった最大値）
+        best_label, best_value = None, None
+        for label, value in q_dict.items():
+            if best_value is None or value > best_value:
+                best_label, best_value = label, value
+
+        hx, hy, px, py = state_key
+        idx = q_state_index(int(hx), int(hy), int(px), int(py))
+        action[idx] = ACTION_LABEL_TO_ID.get(best_label, stay)
+        score[idx] = -np.inf if best_value is None else float(best_value)
+
+    return compiled_arrays(action, score)
+
+
+def compiled_arrays(action: np.ndarray, score: np.ndarray) -> Dict[str, Any]:
+    """
+    action / score の配列（ファイルからメモリマップしたものでもよい）を q_compile_table の形式にする。
+    1状態ずつ引くとき（q_choose_action_code）は numpy のスカラーより memoryview の方が速く、
+    list と違って配列をコピーしない。
+    """
+    return {"action": action, "score": score, "action_view": memoryview(action), "score_view": memoryview(score)}
+
+
+def q_choose_action_code(code: int, hunter_slot: int, compiled: Optional[Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    state_code の整数1つについて、q_choose_actions_batch と同じ判定をする。
+    hunter_slot: 0 = hunter_0, 1 = hunter_1
+    戻り値: (action_id, 獲物番号 0 / 1)。候補が無いときは (STAY, -1)、compiled が None なら (-1, -1)。
+    """
+    if compiled is None:
+        return -1, -1
+
+    actions = compiled["action_view"]
+    scores = compiled["score_view"]
+    best_prey = -1
+    best_action = ACTION_LABEL_TO_ID["STAY"]
+    best_score = 0.0
+    for k, prey_slot in enumerate(state_code.PREY_SLOTS):
+        if code & state_code.CAPTURE_BITS[k]:
+            continue
+        idx = state_code.q_index(code, hunter_slot, prey_slot)
+        a = actions[idx]
+        if a < 0:
+            continue
+        # prey_0, prey_1 の順に見て、厳密に大きいときだけ替える
+        if best_prey < 0 or scores[idx] > best_score:
+            best_prey, best_action, best_score = k, a, scores[idx]
+    return best_action, best_prey
+
+
+def q_choose_actions_batch(
+    positions: np.ndarray,
+    captured: np.ndarray,
+    compiled: Optional[Dict[str, np.ndarray]],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    N 個の状態について q_choose_action と同じ判定をまとめて行う。
+
+    引数：
+    positions: (N, 6) int。[hx, hy, p0x, p0y, p1x, p1y]
+    captured: (N, 2) bool。[prey_0 捕獲済み, prey_1 捕獲済み]
+    compiled: q_compile_table の戻り値
+
+    戻り値：
+    (action_ids, prey_indices) いずれも (N,) int64。
+    prey_indices は 0 / 1、候補が無いときは -1（action_ids は STAY）。
+    compiled が None（Qテーブルが dict でない）のときは両方 -1。
+    """
+    positions = np.asarray(positions)
+    captured = np.asarray(captured, dtype=bool)
+    n = len(positions)
+
+    if compiled is None:
+        return np.full(n, -1, dtype=np.int64), np.full(n, -1, dtype=np.int64)
+
+    hx, hy = positions[:, 0], positions[:, 1]
+    actions = []
+    scores = []
+    valids = []
+    for k in range(2):
+        px, py = positions[:, 2 + 2 * k], positions[:, 3 + 2 * k]
+        in_grid = (
+            (hx >= 0) & (hx < GRID_SIZE) & (hy >= 0) & (hy < GRID_SIZE)
+            & (px >= 0) & (px < GRID_SIZE) & (py >= 0) & (py < GRID_SIZE)
+        )
+        idx = np.where(in_grid, q_state_index(hx, hy, px, py), 0)
+        a = compiled["action"][idx].astype(np.int64)
+        valids.append(in_grid & ~captured[:, k] & (a >= 0))
+        actions.append(a)
+        scores.append(compiled["score"][idx])
+
+    # 候補は prey_0, prey_1 の順に見て、厳密に大きいときだけ prey_1 に替える
+    take_1 = valids[1] & (~valids[0] | (scores[1] > scores[0]))
+    take_0 = valids[0] & ~take_1
+
+    prey_indices = np.where(take_1, 1, np.where(take_0, 0, -1)).astype(np.int64)
+    action_ids = np.where(take_1, actions[1], np.where(take_0, actions[0], ACTION_LABEL_TO_ID["STAY"])).astype(np.int64)
+    return action_ids, prey_indices
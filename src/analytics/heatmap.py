@@ -0,0 +1,268 @@
+"""
+多数のエピソードにわたって、マスごとの訪問回数と捕獲位置を集計するヒートマップ。
+
+主な機能：
+1. ハンター・獲物ごとの訪問回数を np.bincount で、捕獲位置を np.add.at で一括加算する。
+2. 入力は次のどれでもよく、届いたバッチを順に足していく（最初から数え直さない）。
+   - ロールアウトのレコード（src.experiments.rollout の TRANSITION_DTYPE、--output のファイル）
+   - ログCSV（log_stream.parse_chunk の結果、または log_step 形式のレコードのリスト）
+3. 集計結果は .npz に保存・読み込みでき、新しいファイルの分だけ追加で集計できる。
+4. grid() で UI のグリッドと同じ並び（[y, x]）の配列を返す。
+
+訪問回数の数え方
+- ロールアウト: 各遷移の next_state（獲物の移動後）を1回と数える。
+- ログ: 各行の位置（ハンター移動後・獲物移動前、log_step と同じ）を1回と数える。
+
+捕獲位置の数え方（捕獲済みの獲物は動かないので、捕獲後の位置が捕獲位置）
+- ロールアウト: captured → next_captured で新たに立ったフラグの、next_state の獲物の位置。
+- ログ（next_state 列あり）: ロールアウトと同じく、前の行の next_state → その行の next_state で
+  新たに立ったフラグの、next_state の獲物の位置（エピソードの先頭では「未捕獲」から）。
+  獲物の移動で起きたエピソード最後の捕獲や、Player vs AI のプレイヤーの手番での捕獲も数えられる。
+- ログ（next_state の無い古いログ）: フラグは捕獲判定の前に記録されるため、
+  「未捕獲の獲物がハンターと重なっている行」（ハンターの移動で捕獲）と、
+  「フラグが新たに立った行で、前の行では重なっていなかった」（獲物の移動で捕獲）を捕獲とみなす。
+  エピソード最後の行の後に獲物の移動で起きた捕獲はログに残らないため数えられない。
+
+使い方
+- python -m src.analytics.heatmap --rollouts transitions.bin --output heatmap.npz
+- python -m src.analytics.heatmap logs/*.csv --state heatmap.npz --output heatmap.npz   # 既存の集計に追加
+"""
+
+import argparse
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from src.env.game_env import GRID_SIZE
+from src.env.state_code import decode_states
+from src.analytics.log_stream import (
+    CAPTURE_COLUMNS,
+    DEFAULT_CHUNKSIZE,
+    NEXT_STATE_COLUMN,
+    POSITION_COLUMNS,
+    iter_log_chunks,
+    parse_chunk,
+    parse_records
+)
+
+AGENT_LABELS = ("hunter_0", "hunter_1", "prey_0", "prey_1")
+PREY_LABELS = ("prey_0", "prey_1")
+
+_CELLS = GRID_SIZE * GRID_SIZE
+_ROLLOUT_CHUNK = 1 << 20
+
+
+def _cells(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """座標をマス番号（y * GRID_SIZE + x）にする"""
+    return (np.asarray(y, dtype=np.int64) % GRID_SIZE) * GRID_SIZE + (np.asarray(x, dtype=np.int64) % GRID_SIZE)
+
+
+class VisitHeatmap:
+
+    def __init__(self) -> None:
+        self.visits = np.zeros((len(AGENT_LABELS), _CELLS), dtype=np.int64)
+        self.captures = np.zeros((len(PREY_LABELS), _CELLS), dtype=np.int64)
+        self.steps = 0
+        # ログを続けて読むときの、直前の行の情報（step, 捕獲フラグ, 重なり, next_state の有無, その捕獲フラグ）
+        self._log_prev: Optional[tuple] = None
+
+    # --- 加算 ---
+
+    def add_positions(self, coords: np.ndarray) -> None:
+        """
+        (N, 8) の座標（h0x, h0y, h1x, h1y, p0x, p0y, p1x, p1y）を訪問として加算する。
+        4体分をまとめて1回の np.bincount で数える。
+        """
+        coords = np.asarray(coords)
+        n = len(coords)
+        if n == 0:
+            return
+        cells = _cells(coords[:, 0::2], coords[:, 1::2])  # (N, 4)
+        flat = (cells + np.arange(len(AGENT_LABELS)) * _CELLS).ravel()
+        self.visits += np.bincount(flat, minlength=self.visits.size).reshape(self.visits.shape)
+        self.steps += n
+
+    def add_captures(self, prey_index: np.ndarray, x: np.ndarray, y: np.ndarray) -> None:
+        """捕獲イベント（獲物番号と位置）を加算する"""
+        if len(prey_index) == 0:
+            return
+        np.add.at(self.captures, (np.asarray(prey_index, dtype=np.int64), _cells(x, y)), 1)
+
+    def add_transitions(self, records: np.ndarray) -> None:
+        """ロールアウトのレコード（TRANSITION_DTYPE）のバッチを加算する"""
+        if len(records) == 0:
+            return
+        next_state = records["next_state"]
+        self.add_positions(next_state)
+        newly = (records["next_captured"] != 0) & (records["captured"] == 0)  # (N, 2)
+        rows, prey = np.nonzero(newly)
+        self.add_captures(prey, next_state[rows, 4 + 2 * prey], next_state[rows, 5 + 2 * prey])
+
+    def add_log_chunk(self, parsed: Dict[str, np.ndarray], new_source: bool = False) -> None:
+        """
+        parse_chunk の結果を加算する。
+        同じログを続けて渡すときは、チャンクの境目をまたいで捕獲を判定する。
+        捕獲は next_state のある行はその捕獲フラグから、無い行は位置の重なりから判定する（モジュールの説明を参照）。
+        new_source: 別のファイルの先頭なら True（エピソードの区切りとして扱う）
+        """
+        steps = parsed["step"]
+        n = len(steps)
+        if n == 0:
+            return
+        if new_source:
+            self._log_prev = None
+
+        pos = {col: parsed[col] for col in POSITION_COLUMNS}
+        coords = np.concatenate([pos[col] for col in POSITION_COLUMNS], axis=1)
+        self.add_positions(coords)
+
+        h0, h1 = pos["h0_pos"], pos["h1_pos"]
+        preys = (pos["p0_pos"], pos["p1_pos"])
+        flags = np.stack([parsed[col] for col in CAPTURE_COLUMNS], axis=1).astype(bool)
+        overlap = np.stack([np.all(p == h0, axis=1) | np.all(p == h1, axis=1) for p in preys], axis=1)
+
+        next_codes = parsed.get(NEXT_STATE_COLUMN)
+        if next_codes is None:
+            next_codes = np.full(n, -1, dtype=np.int64)
+        has_next = next_codes >= 0
+        next_coords, next_flags = decode_states(np.where(has_next, next_codes, 0))
+        next_flags = next_flags.astype(bool) & has_next[:, None]
+
+        # 1行前の値（エピソードの先頭では「未捕獲・重なりなし」）
+        prev_step = np.empty(n, dtype=np.int64)
+        prev_flags = np.zeros((n, 2), dtype=bool)
+        prev_overlap = np.zeros((n, 2), dtype=bool)
+        prev_has_next = np.zeros(n, dtype=bool)
+        prev_next_flags = np.zeros((n, 2), dtype=bool)
+        prev_step[1:] = steps[:-1]
+        prev_flags[1:] = flags[:-1]
+        prev_overlap[1:] = overlap[:-1]
+        prev_has_next[1:] = has_next[:-1]
+        prev_next_flags[1:] = next_flags[:-1]
+        if self._log_prev is not None:
+            prev_step[0], prev_flags[0], prev_overlap[0], prev_has_next[0], prev_next_flags[0] = self._log_prev
+        else:
+            prev_step[0] = steps[0]  # 先頭行はエピソードの開始とみなす
+        episode_start = steps <= prev_step
+        for prev in (prev_flags, prev_overlap, prev_has_next, prev_next_flags):
+            prev[episode_start] = False
+
+        # next_state のある行: 前のステップ終了時から新たに立ったフラグ。
+        # 前の行に next_state が無ければ（古いログからの続き）、この行の判定前のフラグを基準にする
+        base = np.where(prev_has_next[:, None] | episode_start[:, None], prev_next_flags, flags)
+        by_next = next_flags & ~base
+        rows, prey = np.nonzero(by_next)
+        self.add_captures(prey, next_coords[rows, 4 + 2 * prey], next_coords[rows, 5 + 2 * prey])
+
+        # next_state の無い行: 位置の重なりから推定する（前の行で数えた分は除く）
+        legacy = ~has_next[:, None]
+        by_hunter = legacy & overlap & ~flags
+        by_prey = legacy & flags & ~prev_flags & ~prev_overlap & ~prev_has_next[:, None]
+        rows, prey = np.nonzero(by_hunter | by_prey)
+        xy = np.stack(preys, axis=1)  # (N, 2, 2)
+        self.add_captures(prey, xy[rows, prey, 0], xy[rows, prey, 1])
+
+        self._log_prev = (int(steps[-1]), flags[-1].copy(), overlap[-1].copy(), bool(has_next[-1]), next_flags[-1].copy())
+
+    def add_records(self, records: Sequence[Dict], new_source: bool = False) -> None:
+        """log_step 形式のレコード（SessionHistory の中身）のリストを加算する"""
+        if not records:
+            return
+        self.add_log_chunk(parse_records(records), new_source)
+
+    def merge(self, other: "VisitHeatmap") -> None:
+        """別の集計（別プロセスの結果など）を足し込む"""
+        self.visits += other.visits
+        self.captures += other.captures
+        self.steps += other.steps
+
+    # --- 取り出し ---
+
+    def grid(self, layer: str) -> np.ndarray:
+        """
+        (GRID_SIZE, GRID_SIZE) の配列を [y, x] の並びで返す。
+        layer: AGENT_LABELS のどれか / "hunters" / "prey" / "captures"
+        """
+        if layer in AGENT_LABELS:
+            counts = self.visits[AGENT_LABELS.index(layer)]
+        elif layer == "hunters":
+            counts = self.visits[:2].sum(axis=0)
+        elif layer == "prey":
+            counts = self.visits[2:].sum(axis=0)
+        elif layer == "captures":
+            counts = self.captures.sum(axis=0)
+        else:
+            raise ValueError(f"不明なレイヤー {layer} です。")
+        return counts.reshape(GRID_SIZE, GRID_SIZE)
+
+    # --- 保存 ---
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(tmp, visits=self.visits, captures=self.captures, steps=np.int64(self.steps))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "VisitHeatmap":
+        heatmap = cls()
+        with np.load(path) as data:
+            heatmap.visits = data["visits"].astype(np.int64)
+            heatmap.captures = data["captures"].astype(np.int64)
+            heatmap.steps = int(data["steps"])
+        return heatmap
+
+
+def add_rollout_file(heatmap: VisitHeatmap, path: str, chunk: int = _ROLLOUT_CHUNK) -> int:
+    """rollout --output のファイルを、メモリに載せきらずに順に加算する。戻り値はレコード数。"""
+    from src.experiments.rollout import TRANSITION_DTYPE
+
+    records = np.memmap(path, dtype=TRANSITION_DTYPE, mode="r")
+    for start in range(0, len(records), chunk):
+        heatmap.add_transitions(np.asarray(records[start:start + chunk]))
+    return len(records)
+
+
+def add_log_files(heatmap: VisitHeatmap, paths: Iterable[str], chunksize: int = DEFAULT_CHUNKSIZE) -> int:
+    """ログCSVをチャンク単位で加算する。戻り値は行数。"""
+    rows = 0
+    last_source = None
+    for source, chunk in iter_log_chunks(paths, chunksize):
+        heatmap.add_log_chunk(parse_chunk(chunk), new_source=source != last_source)
+        last_source = source
+        rows += len(chunk)
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="訪問回数・捕獲位置のヒートマップを集計する")
+    parser.add_argument("logs", nargs="*", help="ログCSV（hunter_task_log.csv）")
+    parser.add_argument("--rollouts", nargs="*", default=[], help="rollout --output のファイル")
+    parser.add_argument("--state", default=None, help="既存の集計（.npz）。指定するとそこに追加する")
+    parser.add_argument("--output", default="heatmap.npz", help="集計結果の保存先（.npz）")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args(argv)
+
+    heatmap = VisitHeatmap.load(args.state) if args.state and os.path.exists(args.state) else VisitHeatmap()
+    before = heatmap.steps
+
+    start = time.perf_counter()
+    for path in args.rollouts:
+        n = add_rollout_file(heatmap, path)
+        print(f"{path}: {n} 遷移")
+    if args.logs:
+        n = add_log_files(heatmap, args.logs, args.chunksize)
+        print(f"ログ {len(args.logs)} ファイル: {n} 行")
+    elapsed = time.perf_counter() - start
+
+    heatmap.save(args.output)
+    added = heatmap.steps - before
+    print(f"\n追加 {added} ステップ ({elapsed:.2f}s, {added / elapsed if elapsed > 0 else 0:.0f} steps/sec)"
+          f" / 合計 {heatmap.steps} ステップ -> {args.output}")
+    for label, count in zip(PREY_LABELS, heatmap.captures.sum(axis=1)):
+        print(f"{label} の捕獲: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+"""
+エクスポートされた実行ログ（hunter_task_log.csv）をチャンク単位でストリーミング集計する。
+
+主な機能：
+1. 複数のCSVを pandas のチャンク読み込みで順に流す（全件をメモリに載せない）。
+2. 1パスで以下を計算する。
+   - エピソードごとの捕獲時間（prey_0 / prey_1 / 全捕獲）
+   - ハンターごとの行動頻度
+   - 2体のハンターが同じ獲物を狙った割合（移動から推定）
+   - 直近 window エピソードのローリング集計
+3. 保持するのは「集計カウンタ」「未完了の1エピソード」「ローリング窓」だけなので、
+   ログ全体が数GBでもメモリ使用量は一定。
+
+使い方
+- python -m src.analytics.log_stream logs/*.csv --chunksize 200000 --window 100
+- コードから: summary = analyze_logs(paths)
+
+エピソードの区切り
+- ファイルが変わったとき、または step が直前の行以下になったとき（リセット）。
+
+捕獲時間
+- next_state 列（ステップ終了時の状態コード）があれば、その捕獲フラグが最初に立った行の step。
+- 無い古いログでは captured_p0/1（捕獲判定の前の値）が最初に立った行の step なので、1ステップ遅く、
+  獲物の移動で起きたエピソード最後の捕獲は数えられない。
+
+狙っている獲物の推定
+- ログには選んだ獲物が残らないため、行動によってトーラス距離が縮んだ獲物を「狙い」とみなす。
+  未捕獲の獲物のうち、ちょうど1体だけ距離が縮んだ場合のみ判定し、それ以外は判定不能として数えない。
+"""
+
+import argparse
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.env.game_env import ACTIONS, GRID_SIZE
+from src.env.state_code import decode_states
+
+# ログの列（expand_log_record の列と同じ）。state は状態コード、next_state はステップ終了時の状態コード（古いログには無い）
+STATE_COLUMN = "state"
+NEXT_STATE_COLUMN = "next_state"
+POSITION_COLUMNS = ("h0_pos", "h1_pos", "p0_pos", "p1_pos")
+ACTION_COLUMNS = ("h0_action", "h1_action")
+CAPTURE_COLUMNS = ("captured_p0", "captured_p1")
+
+DEFAULT_CHUNKSIZE = 200_000
+DEFAULT_WINDOW = 100
+
+# "(3, 4)" 形式の文字列から x, y を取り出す
+_POS_PATTERN = r"(-?\d+)\D+(-?\d+)"
+
+
+class EpisodeSummary(NamedTuple):
+    """1エピソード分の集計結果（捕獲されなかった獲物は None）"""
+    index: int
+    source: int
+    length: int
+    capture_step_p0: Optional[int]
+    capture_step_p1: Optional[int]
+
+    @property
+    def capture_step_all(self) -> Optional[int]:
+        if self.capture_step_p0 is None or self.capture_step_p1 is None:
+            return None
+        return max(self.capture_step_p0, self.capture_step_p1)
+
+
+class RollingSummary(NamedTuple):
+    """直近 window エピソードの集計"""
+    episode_index: int
+    window: int
+    mean_length: float
+    capture_rate_all: float
+    mean_capture_step_all: Optional[float]
+
+
+def iter_log_chunks(paths: Iterable[str], chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """
+    ログファイルを順にチャンク読み込みし、(ファイル番号, DataFrame) を返すジェネレータ。
+    """
+    for source, path in enumerate(paths):
+        reader = pd.read_csv(path, chunksize=chunksize)
+        for chunk in reader:
+            yield source, chunk
+
+
+def _parse_positions(column: pd.Series) -> np.ndarray:
+    """"(x, y)" 形式の列を (N, 2) の int 配列に変換する"""
+    xy = column.astype(str).str.extract(_POS_PATTERN)
+    return xy.to_numpy(dtype=np.int64)
+
+
+def _parse_bool(column: pd.Series) -> np.ndarray:
+    if column.dtype == bool:
+        return column.to_numpy()
+    return column.astype(str).str.lower().isin(("true", "1")).to_numpy()
+
+
+def parse_chunk(chunk: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    DataFrame のチャンクを numpy 配列の辞書に変換する。
+    状態コードの列 state があれば、位置と捕獲フラグはそこから展開する（"(x, y)" の文字列を解析しない）。
+
+    戻り値のキー: step, h0_pos, h1_pos, p0_pos, p1_pos (N,2), h0_action, h1_action, captured_p0, captured_p1,
+    next_state（ステップ終了時の状態コード。列が無い・空の行は -1）
+    """
+    parsed: Dict[str, np.ndarray] = {"step": chunk["step"].to_numpy(dtype=np.int64)}
+    if STATE_COLUMN in chunk.columns:
+        parsed.update(_expand_state_codes(chunk[STATE_COLUMN].to_numpy(dtype=np.int64)))
+    else:
+        for col in POSITION_COLUMNS:
+            parsed[col] = _parse_positions(chunk[col])
+        for col in CAPTURE_COLUMNS:
+            parsed[col] = _parse_bool(chunk[col])
+    for col in ACTION_COLUMNS:
+        parsed[col] = chunk[col].to_numpy(dtype=np.int64)
+    if NEXT_STATE_COLUMN in chunk.columns:
+        # 空欄は NaN（float）になる。状態コードは 42bit なので float64 でも正確に戻る
+        next_state = pd.to_numeric(chunk[NEXT_STATE_COLUMN], errors="coerce").to_numpy(dtype=np.float64)
+        parsed[NEXT_STATE_COLUMN] = np.where(np.isnan(next_state), -1, next_state).astype(np.int64)
+    else:
+        parsed[NEXT_STATE_COLUMN] = np.full(len(chunk), -1, dtype=np.int64)
+    return parsed
+
+
+def _expand_state_codes(codes: np.ndarray) -> Dict[str, np.ndarray]:
+    """状態コードの配列を、parse_chunk と同じ位置・捕獲フラグの配列にする"""
+    coords, captured = decode_states(codes)
+    parsed: Dict[str, np.ndarray] = {}
+    for i, col in enumerate(POSITION_COLUMNS):
+        parsed[col] = coords[:, 2 * i:2 * i + 2]
+    for k, col in enumerate(CAPTURE_COLUMNS):
+        parsed[col] = captured[:, k]
+    return parsed
+
+
+def parse_records(records: Sequence[Dict]) -> Dict[str, np.ndarray]:
+    """log_step 形式のレコード（SessionHistory のメモリ上の分）を parse_chunk と同じ形にする"""
+    parsed: Dict[str, np.ndarray] = {"step": np.array([r["step"] for r in records], dtype=np.int64)}
+    parsed.update(_expand_state_codes(np.array([r[STATE_COLUMN] for r in records], dtype=np.int64)))
+    for col in ACTION_COLUMNS:
+        parsed[col] = np.array([r[col] for r in records], dtype=np.int64)
+    next_state = [r.get(NEXT_STATE_COLUMN) for r in records]
+    parsed[NEXT_STATE_COLUMN] = np.array([-1 if c is None else c for c in next_state], dtype=np.int64)
+    return parsed
+
+
+def _torus_manhattan(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(N,2) 同士のトーラス上のマンハッタン距離"""
+    d = np.abs(a - b) % GRID_SIZE
+    d = np.minimum(d, GRID_SIZE - d)
+    return d.sum(axis=-1)
+
+
+def _infer_targets(prev_h: np.ndarray, cur_h: np.ndarray, p0: np.ndarray, p1: np.ndarray,
+                   free0: np.ndarray, free1: np.ndarray) -> np.ndarray:
+    """
+    直前位置→現在位置の移動で距離が縮んだ獲物を狙いとみなす。
+    戻り値: 0 / 1 = 獲物番号, -1 = 判定不能
+    """
+    closer0 = free0 & (_torus_manhattan(cur_h, p0) < _torus_manhattan(prev_h, p0))
+    closer1 = free1 & (_torus_manhattan(cur_h, p1) < _torus_manhattan(prev_h, p1))
+    target = np.full(len(prev_h), -1, dtype=np.int64)
+    target[closer0 & ~closer1] = 0
+    target[closer1 & ~closer0] = 1
+    return target
+
+
+class LogStreamStats:
+    """
+    チャンクを順に受け取り、集計を更新していくアキュムレータ。
+    feed() は完了したエピソードの EpisodeSummary を返すジェネレータ。
+    """
+
+    def __init__(self) -> None:
+        self.num_rows = 0
+        self.action_counts = {
+            "hunter_0": np.zeros(len(ACTIONS), dtype=np.int64),
+            "hunter_1": np.zeros(len(ACTIONS), dtype=np.int64),
+        }
+        self.target_judged = 0
+        self.target_same = 0
+        self.target_same_by_prey = np.zeros(2, dtype=np.int64)
+
+        self._episode_index = 0
+        self._source: Optional[int] = None
+        # 未完了エピソードの状態
+        self._ep_length = 0
+        self._ep_cap0: Optional[int] = None
+        self._ep_cap1: Optional[int] = None
+        # チャンクをまたいで前の行を参照するための1行分
+        self._last_row: Optional[Dict[str, np.ndarray]] = None
+
+    def _close_episode(self) -> Optional[EpisodeSummary]:
+        if self._ep_length == 0:
+            return None
+        summary = EpisodeSummary(
+            index=self._episode_index,
+            source=self._source if self._source is not None else 0,
+            length=self._ep_length,
+            capture_step_p0=self._ep_cap0,
+            capture_step_p1=self._ep_cap1,
+        )
+        self._episode_index += 1
+        self._ep_length = 0
+        self._ep_cap0 = None
+        self._ep_cap1 = None
+        return summary
+
+    def feed(self, source: int, parsed: Dict[str, np.ndarray]) -> Iterator[EpisodeSummary]:
+        """
+        1チャンク分を集計し、このチャンク内で完了したエピソードを順に返す。
+        """
+        n = len(parsed["step"])
+        if n == 0:
+            return
+
+        if self._source is not None and source != self._source:
+            # ファイルが変わったら前のエピソードを閉じる
+            done = self._close_episode()
+            if done is not None:
+                yield done
+            self._last_row = None
+        self._source = source
+
+        self.num_rows += n
+        self.action_counts["hunter_0"] += np.bincount(parsed["h0_action"], minlength=len(ACTIONS))[:len(ACTIONS)]
+        self.action_counts["hunter_1"] += np.bincount(parsed["h1_action"], minlength=len(ACTIONS))[:len(ACTIONS)]
+
+        # 前の行をつなげて「前→今」の組を作る
+        if self._last_row is not None:
+            joined = {k: np.concatenate([self._last_row[k], v]) for k, v in parsed.items()}
+        else:
+            joined = parsed
+        offset = len(joined["step"]) - n
+
+        step = joined["step"]
+        # new_episode[i] = i 行目（チャンク内）がエピソードの先頭か
+        new_episode = np.ones(n, dtype=bool)
+        if offset:
+            new_episode[:] = step[1:] <= step[:-1]
+        else:
+            new_episode[1:] = step[1:] <= step[:-1]
+
+        # --- 狙いの推定（同じエピソード内の連続する行のみ） ---
+        if offset:
+            prev = slice(0, len(step) - 1)
+            cur = slice(1, len(step))
+            pair_valid = ~new_episode
+        else:
+            prev = slice(0, n - 1)
+            cur = slice(1, n)
+            pair_valid = ~new_episode[1:]
+
+        if pair_valid.any():
+            free0 = ~joined["captured_p0"][prev]
+            free1 = ~joined["captured_p1"][prev]
+            p0 = joined["p0_pos"][cur]
+            p1 = joined["p1_pos"][cur]
+            t0 = _infer_targets(joined["h0_pos"][prev], joined["h0_pos"][cur], p0, p1, free0, free1)
+            t1 = _infer_targets(joined["h1_pos"][prev], joined["h1_pos"][cur], p0, p1, free0, free1)
+            judged = pair_valid & (t0 >= 0) & (t1 >= 0)
+            same = judged & (t0 == t1)
+            self.target_judged += int(judged.sum())
+            self.target_same += int(same.sum())
+            self.target_same_by_prey += np.bincount(t0[same], minlength=2)[:2]
+
+        # --- エピソード単位の捕獲時間 ---
+        starts = np.flatnonzero(new_episode)
+        bounds = np.append(starts, n)
+        if len(starts) == 0 or starts[0] != 0:
+            bounds = np.insert(bounds, 0, 0)
+
+        # 捕獲フラグは、next_state のある行はステップ終了時の値を使う（最後の捕獲も拾える）
+        chunk_step = parsed["step"]
+        cap0, cap1 = parsed["captured_p0"], parsed["captured_p1"]
+        has_next = parsed[NEXT_STATE_COLUMN] >= 0
+        if has_next.any():
+            _, next_captured = decode_states(np.where(has_next, parsed[NEXT_STATE_COLUMN], 0))
+            cap0 = np.where(has_next, next_captured[:, 0], cap0)
+            cap1 = np.where(has_next, next_captured[:, 1], cap1)
+        for i in range(len(bounds) - 1):
+            lo, hi = int(bounds[i]), int(bounds[i + 1])
+            if lo == hi:
+                continue
+            if new_episode[lo]:
+                done = self._close_episode()
+                if done is not None:
+                    yield done
+            if self._ep_cap0 is None:
+                hit = np.flatnonzero(cap0[lo:hi])
+                if len(hit):
+                    self._ep_cap0 = int(chunk_step[lo + hit[0]])
+            if self._ep_cap1 is None:
+                hit = np.flatnonzero(cap1[lo:hi])
+                if len(hit):
+                    self._ep_cap1 = int(chunk_step[lo + hit[0]])
+            self._ep_length += hi - lo
+
+        self._last_row = {k: v[-1:].copy() for k, v in parsed.items()}
+
+    def finish(self) -> Iterator[EpisodeSummary]:
+        """最後の未完了エピソードを閉じる"""
+        done = self._close_episode()
+        if done is not None:
+            yield done
+        self._last_row = None
+
+    def action_frequencies(self) -> Dict[str, List[float]]:
+        """ハンターごとの行動頻度（行動ID 0..4 の割合）"""
+        freqs = {}
+        for hunter_id, counts in self.action_counts.items():
+            total = counts.sum()
+            freqs[hunter_id] = (counts / total).tolist() if total else [0.0] * len(counts)
+        return freqs
+
+    def same_target_rate(self) -> Optional[float]:
+        if self.target_judged == 0:
+            return None
+        return self.target_same / self.target_judged
+
+
+def iter_episodes(chunks: Iterable[Tuple[int, pd.DataFrame]], stats: LogStreamStats) -> Iterator[EpisodeSummary]:
+    """
+    (ファイル番号, チャンク) の列を受け取り、完了したエピソードを順に返すジェネレータ。
+    行動頻度などのエピソード以外の集計は stats に蓄積される。
+    """
+    for source, chunk in chunks:
+        yield from stats.feed(source, parse_chunk(chunk))
+    yield from stats.finish()
+
+
+def iter_rolling(episodes: Iterable[EpisodeSummary], window: int = DEFAULT_WINDOW) -> Iterator[Tuple[EpisodeSummary, RollingSummary]]:
+    """
+    エピソードごとに、直近 window エピソードのローリング集計を付けて返すジェネレータ。
+    """
+    recent: Deque[EpisodeSummary] = deque(maxlen=window)
+    sum_length = 0
+    for ep in episodes:
+        if len(recent) == recent.maxlen:
+            sum_length -= recent[0].length
+        recent.append(ep)
+        sum_length += ep.length
+
+        all_steps = [e.capture_step_all for e in recent if e.capture_step_all is not None]
+        rolling = RollingSummary(
+            episode_index=ep.index,
+            window=len(recent),
+            mean_length=sum_length / len(recent),
+            capture_rate_all=len(all_steps) / len(recent),
+            mean_capture_step_all=(sum(all_steps) / len(all_steps)) if all_steps else None,
+        )
+        yield ep, rolling
+
+
+class _RunningMean:
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: Optional[float]) -> None:
+        if value is None:
+            return
+        self.count += 1
+        self.total += value
+
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+
+def analyze_logs(paths: Iterable[str], chunksize: int = DEFAULT_CHUNKSIZE, window: int = DEFAULT_WINDOW,
+                 on_episode=None) -> Dict[str, object]:
+    """
+    ログ群を1パスで集計して結果の辞書を返す。
+    on_episode(episode, rolling) を渡すとエピソードごとに呼ばれる（進捗表示など）。
+    """
+    stats = LogStreamStats()
+    cap0 = _RunningMean()
+    cap1 = _RunningMean()
+    cap_all = _RunningMean()
+    num_episodes = 0
+    last_rolling: Optional[RollingSummary] = None
+
+    episodes = iter_episodes(iter_log_chunks(paths, chunksize), stats)
+    for ep, rolling in iter_rolling(episodes, window):
+        num_episodes += 1
+        cap0.add(ep.capture_step_p0)
+        cap1.add(ep.capture_step_p1)
+        cap_all.add(ep.capture_step_all)
+        last_rolling = rolling
+        if on_episode is not None:
+            on_episode(ep, rolling)
+
+    return {
+        "rows": stats.num_rows,
+        "episodes": num_episodes,
+        "mean_capture_step_p0": cap0.mean(),
+        "mean_capture_step_p1": cap1.mean(),
+        "mean_capture_step_all": cap_all.mean(),
+        "capture_rate_all": (cap_all.count / num_episodes) if num_episodes else None,
+        "action_frequencies": stats.action_frequencies(),
+        "same_target_rate": stats.same_target_rate(),
+        "same_target_judged_steps": stats.target_judged,
+        "same_target_by_prey": stats.target_same_by_prey.tolist(),
+        "rolling": last_rolling._asdict() if last_rolling is not None else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="hunter_task_log.csv をストリーミング集計する")
+    parser.add_argument("paths", nargs="+", help="ログCSVのパス（複数可）")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="1チャンクの行数")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="ローリング集計のエピソード数")
+    parser.add_argument("--progress-every", type=int, default=0, help="N エピソードごとにローリング集計を表示（0で無効）")
+    args = parser.parse_args(argv)
+
+    def _progress(ep: EpisodeSummary, rolling: RollingSummary) -> None:
+        if args.progress_every and (ep.index + 1) % args.progress_every == 0:
+            print(f"[episode {ep.index + 1}] rolling(len={rolling.window}) "
+                  f"mean_length={rolling.mean_length:.2f} capture_rate={rolling.capture_rate_all:.3f}")
+
+    summary = analyze_logs(args.paths, args.chunksize, args.window, on_episode=_progress)
+
+    print("\n--- 集計結果 ---")
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
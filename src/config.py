@@ -9,6 +9,7 @@ GAME_MODE_PLAYER_AND_AI = "Player and AI"
 # エージェント制御モード
 CONTROL_MODE_SIMPLE = "Simple"
 CONTROL_MODE_LV0_Q = "Lv0 (Q)"
+CONTROL_MODE_LV1 = "Lv1"
 CONTROL_MODE_MANUAL = "Manual"
 
 # デフォルトファイルパス
@@ -22,3 +23,18 @@ AGENT_ID_HUNTER_0 = 'hunter_0'
 AGENT_ID_HUNTER_1 = 'hunter_1'
 AGENT_ID_PREY_0 = 'prey_0'
 AGENT_ID_PREY_1 = 'prey_1'
+
+# 獲物の移動（行動ID と 重み%）: 停止(40%), 上(20%), 右(40%)
+PREY_MOVE_ACTIONS = [0, 1, 4]
+PREY_MOVE_WEIGHTS = [40, 20, 40]
+
+# セッション履歴（ログ）をメモリに保持する件数（超えた分は一時ファイルへ）
+HISTORY_MAX_RECORDS = 1000
+
+# ライブ再生（AI and AI のバックグラウンド実行）
+LIVE_QUEUE_SIZE = 100      # 表示より先に計算しておくフレーム数の上限
+LIVE_BUFFER_FRAMES = 1000  # 巻き戻し・シーク用に保持する表示済みフレーム数
+LIVE_MAX_STEPS = 500       # 1エピソードのステップ数の上限（超えたら次のエピソードへ）
+
+# Simple (Lv0) エージェントの目標割り当て方法（"hungarian": 距離合計が最小 / "greedy": 近い組から順に）
+TARGET_ASSIGNMENT_METHOD = "hungarian"
@@ -3,7 +3,7 @@
 
 主な機能：
 1. グリッドサイズ（トーラス状）の定義。
-2. ハンターおよび獲物の位置情報の保持・管理。
+2. ハンターおよび獲物の位置情報・捕獲状況の保持・管理（state_code の整数1つで持つ）。
 3. エージェントからの行動を受け取り、状態（位置情報）を更新する。
 4. 座標がグリッドの端を超えた場合、反対側にループさせる（トーラス処理）。
 """
@@ -22,6 +22,9 @@ ACTIONS = {
     4: (1, 0)    # 右
 }
 
+# state_code は上の GRID_SIZE / ACTIONS を使うので、定義の後で読み込む
+from src.env import state_code  # noqa: E402
+
 class HunterTaskEnv:
     
     def __init__(self, num_hunters=2, num_prey=2):
@@ -32,8 +35,11 @@ class HunterTaskEnv:
         self.num_hunters = num_hunters
         self.num_prey = num_prey
         
-        # 位置情報を辞書で管理（例：'hunter_0', 'prey_1'）
+        # 状態は1つの整数（state_code の形式: 位置 5bit x 8 + 捕獲フラグ）で持つ
+        self.code = 0
+        # get_state() 用に、最後に展開した状態を覚えておく（code が変わったときだけ作り直す）
         self.positions = {}
+        self._positions_code = None
         self.reset()
 
     def _normalize_pos(self, pos):
@@ -51,37 +57,46 @@ class HunterTaskEnv:
         """
         # (仮実装：ひとまず固定位置やランダム配置)
         # 実際には重複しないように配置するロジックが必要
-        self.positions['hunter_0'] = self._normalize_pos((0, 0))
-        self.positions['hunter_1'] = self._normalize_pos((0, 1))
-        self.positions['prey_0'] = self._normalize_pos((10, 10))
-        self.positions['prey_1'] = self._normalize_pos((15, 15))
+        self.code = state_code.encode_state({
+            'hunter_0': self._normalize_pos((0, 0)),
+            'hunter_1': self._normalize_pos((0, 1)),
+            'prey_0': self._normalize_pos((10, 10)),
+            'prey_1': self._normalize_pos((15, 15)),
+        })
         
         # 現在の状態を返す
         return self.get_state()
 
     def get_state(self):
         """
-        現在の環境の状態（全エージェント・獲物の位置）を返す
+        現在の環境の状態（全エージェント・獲物の位置）を {'hunter_0': (x, y), ...} の形で返す
         """
+        positions_code = self.code & state_code.POSITION_MASK
+        if self._positions_code != positions_code:
+            self.positions = state_code.decode_state(positions_code)
+            self._positions_code = positions_code
         return self.positions
 
     def step(self, agent_id, action_id):
         """
-        指定されたエージェントの行動を実行し、状態を更新する
+        指定されたエージェントの行動を実行し、状態を更新する。
+        戻り値は更新後の状態コード（位置の dict が必要なら get_state()）。
         """
-        if agent_id not in self.positions:
+        slot = state_code.SLOT.get(agent_id)
+        if slot is None:
             raise ValueError(f"エージェントID {agent_id} が見つかりません。")
-            
-        move = ACTIONS.get(action_id)
-        if move is None:
+
+        if action_id not in ACTIONS:
             raise ValueError(f"無効な行動ID {action_id} です。")
 
-        current_pos = self.positions[agent_id]
-        new_pos = (current_pos[0] + move[0], current_pos[1] + move[1])
-        
-        # トーラス処理を適用して位置を更新
-        self.positions[agent_id] = self._normalize_pos(new_pos)
-        
-        # (TODO: 将来的に獲物の捕獲判定などもここに追加)
-        
-        return self.get_state()
+        # トーラス処理を含めて位置を更新
+        self.code = state_code.move(self.code, slot, action_id)
+        return self.code
+
+    def check_capture(self):
+        """
+        ハンターと同じマスにいる獲物を捕獲済みにする。
+        戻り値: (prey_0 捕獲済み, prey_1 捕獲済み)
+        """
+        self.code = state_code.update_captures(self.code)
+        return state_code.captured_flags(self.code)
@@ -0,0 +1,144 @@
+"""
+ゲームの状態（4体の位置と捕獲フラグ）を1つの整数で表す符号化。
+
+レイアウト（下位ビットから）
+- 5bit x 8: h0x, h0y, h1x, h1y, p0x, p0y, p1x, p1y（1体 = 10bit の「マス」、マス = x | y << 5）
+- bit 40: prey_0 捕獲済み、bit 41: prey_1 捕獲済み
+
+主な機能：
+1. encode_state / decode_state: {'hunter_0': (x, y), ...} 形式との相互変換。
+2. move / update_captures / captured_flags: 環境の1手・捕獲判定を整数演算だけで行う（タプルや dict を作らない）。
+3. q_index: Qテーブルの密な配列（q_compile_table）の添字を直接求める。
+4. encode_states / decode_states: numpy 配列でのまとめての変換（ログ・ロールアウト・厳密評価用）。
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.env.game_env import ACTIONS, GRID_SIZE
+
+COORD_BITS = 5
+COORD_MASK = (1 << COORD_BITS) - 1
+CELL_BITS = 2 * COORD_BITS
+CELL_MASK = (1 << CELL_BITS) - 1
+CAPTURE_SHIFT = 8 * COORD_BITS
+POSITION_MASK = (1 << CAPTURE_SHIFT) - 1
+
+# 位置の並び（スロット番号）
+STATE_ORDER = ("hunter_0", "hunter_1", "prey_0", "prey_1")
+SLOT = {agent_id: i for i, agent_id in enumerate(STATE_ORDER)}
+HUNTER_SLOTS = (0, 1)
+PREY_SLOTS = (2, 3)
+
+CAPTURE_BITS = (1 << CAPTURE_SHIFT, 1 << (CAPTURE_SHIFT + 1))
+CAPTURE_MASK = CAPTURE_BITS[0] | CAPTURE_BITS[1]
+
+assert GRID_SIZE <= (1 << COORD_BITS)
+
+
+def _cell(x: int, y: int) -> int:
+    return (x % GRID_SIZE) | (y % GRID_SIZE) << COORD_BITS
+
+
+# マス → (x, y)。decode_state・xy はこのタプルを返すので、新しいタプルを作らない
+_XY = [(c & COORD_MASK, c >> COORD_BITS) for c in range(1 << CELL_BITS)]
+
+# マス → 行動後のマス（トーラス）。_MOVE[action_id][cell]
+_MOVE = [
+    [_cell((c & COORD_MASK) + dx, (c >> COORD_BITS) + dy) for c in range(1 << CELL_BITS)]
+    for dx, dy in (ACTIONS[a] for a in range(len(ACTIONS)))
+]
+
+# Qテーブルの添字 ((hx * G + hy) * G + px) * G + py を、ハンターのマス分と獲物のマス分の和で求める
+_Q_HUNTER = [((c & COORD_MASK) * GRID_SIZE + (c >> COORD_BITS)) * GRID_SIZE * GRID_SIZE for c in range(1 << CELL_BITS)]
+_Q_PREY = [(c & COORD_MASK) * GRID_SIZE + (c >> COORD_BITS) for c in range(1 << CELL_BITS)]
+
+
+# --- 1状態 ---
+
+def encode_state(positions: Dict[str, Tuple[int, int]], captured: Optional[Dict[str, bool]] = None) -> int:
+    """{'hunter_0': (x, y), ...} と捕獲状況を整数にする"""
+    code = 0
+    for slot, agent_id in enumerate(STATE_ORDER):
+        x, y = positions[agent_id]
+        code |= _cell(x, y) << (CELL_BITS * slot)
+    if captured:
+        for k, prey_id in enumerate(STATE_ORDER[2:]):
+            if captured.get(prey_id, False):
+                code |= CAPTURE_BITS[k]
+    return code
+
+
+def decode_state(code: int) -> Dict[str, Tuple[int, int]]:
+    """encode_state の逆変換（位置だけ。捕獲状況は captured_flags）"""
+    return {
+        "hunter_0": _XY[code & CELL_MASK],
+        "hunter_1": _XY[(code >> CELL_BITS) & CELL_MASK],
+        "prey_0": _XY[(code >> (2 * CELL_BITS)) & CELL_MASK],
+        "prey_1": _XY[(code >> (3 * CELL_BITS)) & CELL_MASK],
+    }
+
+
+def cell(code: int, slot: int) -> int:
+    """スロットのマス（x | y << 5）"""
+    return (code >> (CELL_BITS * slot)) & CELL_MASK
+
+
+def xy(code: int, slot: int) -> Tuple[int, int]:
+    return _XY[(code >> (CELL_BITS * slot)) & CELL_MASK]
+
+
+def move(code: int, slot: int, action_id: int) -> int:
+    """スロットの1体を action_id の方向に1マス動かした状態を返す（トーラス）"""
+    shift = CELL_BITS * slot
+    c = (code >> shift) & CELL_MASK
+    return code ^ ((c ^ _MOVE[action_id][c]) << shift)
+
+
+def captured_flags(code: int) -> Tuple[bool, bool]:
+    """(prey_0 捕獲済み, prey_1 捕獲済み)"""
+    return bool(code & CAPTURE_BITS[0]), bool(code & CAPTURE_BITS[1])
+
+
+def update_captures(code: int) -> int:
+    """ハンターと同じマスにいる獲物の捕獲フラグを立てた状態を返す"""
+    h0 = code & CELL_MASK
+    h1 = (code >> CELL_BITS) & CELL_MASK
+    p0 = (code >> (2 * CELL_BITS)) & CELL_MASK
+    p1 = (code >> (3 * CELL_BITS)) & CELL_MASK
+    if p0 == h0 or p0 == h1:
+        code |= CAPTURE_BITS[0]
+    if p1 == h0 or p1 == h1:
+        code |= CAPTURE_BITS[1]
+    return code
+
+
+def q_index(code: int, hunter_slot: int, prey_slot: int) -> int:
+    """q_compile_table の配列で、(ハンター, 獲物) の位置に対応する添字"""
+    return (_Q_HUNTER[(code >> (CELL_BITS * hunter_slot)) & CELL_MASK]
+            + _Q_PREY[(code >> (CELL_BITS * prey_slot)) & CELL_MASK])
+
+
+# --- まとめて変換 ---
+
+def encode_states(coords: np.ndarray, captured: np.ndarray) -> np.ndarray:
+    """(N, 8) の座標（0..GRID_SIZE-1）と (N, 2) の捕獲フラグを int64 の状態コードにする"""
+    codes = np.zeros(len(coords), dtype=np.int64)
+    for i in range(8):
+        codes |= coords[:, i].astype(np.int64) << (COORD_BITS * i)
+    codes |= captured[:, 0].astype(np.int64) << CAPTURE_SHIFT
+    codes |= captured[:, 1].astype(np.int64) << (CAPTURE_SHIFT + 1)
+    return codes
+
+
+def decode_states(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """encode_states の逆変換。(N, 8) の座標と (N, 2) の捕獲フラグを返す。"""
+    codes = np.asarray(codes, dtype=np.int64)
+    coords = np.empty((len(codes), 8), dtype=np.int64)
+    for i in range(8):
+        coords[:, i] = (codes >> (COORD_BITS * i)) & COORD_MASK
+    captured = np.empty((len(codes), 2), dtype=bool)
+    captured[:, 0] = (codes >> CAPTURE_SHIFT) & 1
+    captured[:, 1] = (codes >> (CAPTURE_SHIFT + 1)) & 1
+    return coords, captured
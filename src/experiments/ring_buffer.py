@@ -0,0 +1,119 @@
+"""
+共有メモリ上の固定長レコード・リングバッファ。
+
+主な機能：
+1. multiprocessing.shared_memory 上に numpy の構造化配列としてレコードを並べる。
+2. 書き込み側1プロセス・読み出し側1プロセス（SPSC）を前提に、ロックなしで受け渡す。
+   - ヘッダの head（書き込み済み件数）を進めるのは書き込み側だけ
+   - tail（読み出し済み件数）を進めるのは読み出し側だけ
+3. レコードは pickle せずにバイト列のままコピーされる。
+
+レイアウト
+- [ヘッダ int64 x 4][レコード x capacity]
+- ヘッダ: head, tail, closed（書き込み終了フラグ）, 予備
+"""
+
+import time
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+_HEADER_DTYPE = np.int64
+_HEADER_LEN = 4
+_HEAD, _TAIL, _CLOSED = 0, 1, 2
+_HEADER_BYTES = _HEADER_LEN * np.dtype(_HEADER_DTYPE).itemsize
+
+
+class SharedRingBuffer:
+
+    def __init__(self, dtype: np.dtype, capacity: int, name: Optional[str] = None) -> None:
+        """
+        name を省略すると新しい共有メモリを作成する（作成側が unlink する）。
+        name を渡すと既存の共有メモリに接続する（ワーカープロセス側）。
+        """
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        size = _HEADER_BYTES + self.dtype.itemsize * capacity
+
+        self._owner = name is None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+
+        self._header = np.ndarray((_HEADER_LEN,), dtype=_HEADER_DTYPE, buffer=self._shm.buf)
+        self._records = np.ndarray((capacity,), dtype=self.dtype, buffer=self._shm.buf, offset=_HEADER_BYTES)
+        if self._owner:
+            self._header[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def closed(self) -> bool:
+        return bool(self._header[_CLOSED])
+
+    def __len__(self) -> int:
+        """未読のレコード数"""
+        return int(self._header[_HEAD] - self._header[_TAIL])
+
+    def write(self, records: np.ndarray, poll_interval: float = 0.0005) -> None:
+        """
+        レコードを書き込む。空きが足りない間は読み出し側を待つ。
+        capacity より大きい配列は分割して書き込む。
+        """
+        start = 0
+        total = len(records)
+        while start < total:
+            head = int(self._header[_HEAD])
+            free = self.capacity - (head - int(self._header[_TAIL]))
+            if free <= 0:
+                time.sleep(poll_interval)
+                continue
+
+            n = min(free, total - start)
+            pos = head % self.capacity
+            first = min(n, self.capacity - pos)
+            self._records[pos:pos + first] = records[start:start + first]
+            if n > first:
+                self._records[:n - first] = records[start + first:start + n]
+
+            # レコードを書き終えてから head を進める
+            self._header[_HEAD] = head + n
+            start += n
+
+    def read(self, max_records: Optional[int] = None) -> np.ndarray:
+        """
+        未読レコードをコピーして返す（無ければ空配列）。
+        """
+        tail = int(self._header[_TAIL])
+        n = int(self._header[_HEAD]) - tail
+        if max_records is not None:
+            n = min(n, max_records)
+        if n <= 0:
+            return np.empty(0, dtype=self.dtype)
+
+        pos = tail % self.capacity
+        first = min(n, self.capacity - pos)
+        if n > first:
+            out = np.concatenate([self._records[pos:], self._records[:n - first]])
+        else:
+            out = self._records[pos:pos + n].copy()
+
+        # コピーし終えてから tail を進める
+        self._header[_TAIL] = tail + n
+        return out
+
+    def close_writer(self) -> None:
+        """書き込み終了を読み出し側に伝える"""
+        self._header[_CLOSED] = 1
+
+    def release(self) -> None:
+        """共有メモリを切り離す（作成側は削除も行う）"""
+        del self._header
+        del self._records
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
@@ -0,0 +1,245 @@
+"""
+マルチプロセスでエピソードを回し、遷移データを共有メモリ経由で集めるロールアウト実行器。
+
+主な機能：
+1. ワーカープロセスごとに HeadlessSimulation（Simple / Lv0 (Q)）でエピソードを実行する。
+2. 各遷移を固定長レコード（TRANSITION_DTYPE）にして、ワーカー専用の SharedRingBuffer に書き込む。
+3. メインプロセス（消費側）はリングからレコードをそのまま読み出す（pickle しない）。
+4. ワーカーごとの遷移数/秒を集計して表示する。
+
+使い方
+- python -m src.experiments.rollout --workers 4 --episodes 500 --control-h1 "Lv0 (Q)"
+- --output transitions.bin を付けると、受け取ったレコードをそのまま追記保存する
+  （読み込み: np.fromfile("transitions.bin", dtype=TRANSITION_DTYPE)）
+"""
+
+import argparse
+import multiprocessing as mp
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.config import (
+    AGENT_ID_HUNTER_0,
+    AGENT_ID_HUNTER_1,
+    CONTROL_MODE_SIMPLE,
+    CONTROL_MODE_LV0_Q,
+    CONTROL_MODE_LV1,
+    DEFAULT_Q_TABLE_PATHS
+)
+from src.experiments.ring_buffer import SharedRingBuffer
+from src.env.state_code import decode_states
+
+# 1遷移 = 1レコード（座標は 0..GRID_SIZE-1 なので uint8 で足りる）
+# state / next_state の並び: h0x, h0y, h1x, h1y, p0x, p0y, p1x, p1y
+# actions の並び: hunter_0, hunter_1, prey_0, prey_1
+TRANSITION_DTYPE = np.dtype([
+    ("worker", np.uint16),
+    ("episode", np.uint32),
+    ("step", np.uint16),
+    ("state", np.uint8, (8,)),
+    ("captured", np.uint8, (2,)),
+    ("actions", np.uint8, (4,)),
+    ("next_state", np.uint8, (8,)),
+    ("next_captured", np.uint8, (2,)),
+])
+
+DEFAULT_RING_CAPACITY = 1 << 16
+DEFAULT_MAX_STEPS = 200
+
+
+def _worker_main(worker_id: int, ring_name: str, capacity: int, config: Dict, elapsed) -> None:
+    """
+    ワーカープロセスの本体。config["episodes"] 回エピソードを実行してリングに書き込む。
+    """
+    # 重い import はワーカー側で行う（spawn でも動くように）
+    from src.headless import HeadlessSimulation, load_q_table_file
+
+    ring = SharedRingBuffer(TRANSITION_DTYPE, capacity, name=ring_name)
+    q_tables = {}
+    for hunter_id, path in config["q_table_paths"].items():
+        if path:
+            q_tables[hunter_id] = load_q_table_file(path)
+
+    sim = HeadlessSimulation(
+        config["control_h0"],
+        config["control_h1"],
+        q_tables=q_tables,
+        prey_move_enabled=config["prey_move_enabled"],
+        seed=config["seed"] + worker_id,
+    )
+    max_steps = config["max_steps"]
+    records = np.zeros(max_steps, dtype=TRANSITION_DTYPE)
+    records["worker"] = worker_id
+
+    start = time.perf_counter()
+    for episode in range(config["episodes"]):
+        sim.reset()
+        # 状態は状態コード（位置 + 捕獲フラグ）のまま集め、最後にまとめて展開する
+        codes, actions = [sim.env.code], []
+        while not sim.done and sim.step_count < max_steps:
+            actions.append(sim.step())
+            codes.append(sim.env.code)
+
+        n = len(actions)
+        if n == 0:
+            continue
+        coords, flags = decode_states(np.asarray(codes, dtype=np.int64))
+        s = coords.astype(np.uint8)
+        c = flags.astype(np.uint8)
+        batch = records[:n]
+        batch["episode"] = episode
+        batch["step"] = np.arange(1, n + 1)
+        batch["state"] = s[:-1]
+        batch["captured"] = c[:-1]
+        batch["actions"] = np.asarray(actions, dtype=np.uint8)
+        batch["next_state"] = s[1:]
+        batch["next_captured"] = c[1:]
+        ring.write(batch)
+
+    elapsed[worker_id] = time.perf_counter() - start
+    ring.close_writer()
+    ring.release()
+
+
+def run_rollouts(
+    num_workers: int,
+    config: Dict,
+    capacity: int = DEFAULT_RING_CAPACITY,
+    on_batch: Optional[Callable[[np.ndarray], None]] = None,
+    poll_interval: float = 0.001,
+) -> Dict[str, object]:
+    """
+    ワーカーを起動し、全ワーカーが終わるまでリングを読み続ける。
+    on_batch(records) は読み出したレコード配列ごとに呼ばれる。
+    戻り値はワーカーごとの遷移数・経過時間・遷移数/秒などの集計。
+    """
+    rings = [SharedRingBuffer(TRANSITION_DTYPE, capacity) for _ in range(num_workers)]
+    elapsed = mp.Array("d", num_workers)
+    procs = [
+        mp.Process(target=_worker_main, args=(i, rings[i].name, capacity, config, elapsed), daemon=True)
+        for i in range(num_workers)
+    ]
+
+    counts = np.zeros(num_workers, dtype=np.int64)
+    episodes_done = np.zeros(num_workers, dtype=np.int64)
+    captured_all = 0
+
+    def _consume(i: int, batch: np.ndarray) -> None:
+        nonlocal captured_all
+        counts[i] += len(batch)
+        ends = (batch["next_captured"].all(axis=1)) | (batch["step"] == config["max_steps"])
+        episodes_done[i] += int(ends.sum())
+        captured_all += int(batch["next_captured"].all(axis=1).sum())
+        if on_batch is not None:
+            on_batch(batch)
+
+    start = time.perf_counter()
+    try:
+        for p in procs:
+            p.start()
+
+        active = list(range(num_workers))
+        while active:
+            got_any = False
+            for i in list(active):
+                ring = rings[i]
+                # closed を先に見てから読むことで、最後の書き込みを取りこぼさない
+                closed = ring.closed
+                batch = ring.read()
+                if len(batch):
+                    got_any = True
+                    _consume(i, batch)
+                elif closed:
+                    active.remove(i)
+                elif not procs[i].is_alive():
+                    # closed を見た後に close_writer して終了した場合があるので、もう一度見て読み切る
+                    closed = ring.closed
+                    batch = ring.read()
+                    if len(batch):
+                        got_any = True
+                        _consume(i, batch)
+                    if not closed or procs[i].exitcode != 0:
+                        raise RuntimeError(f"worker {i} が異常終了しました (exitcode={procs[i].exitcode})")
+                    active.remove(i)
+            if not got_any:
+                time.sleep(poll_interval)
+
+        for p in procs:
+            p.join()
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        for ring in rings:
+            ring.release()
+
+    wall = time.perf_counter() - start
+    per_worker: List[Dict[str, float]] = []
+    for i in range(num_workers):
+        sec = elapsed[i]
+        per_worker.append({
+            "worker": i,
+            "transitions": int(counts[i]),
+            "episodes": int(episodes_done[i]),
+            "seconds": sec,
+            "transitions_per_sec": counts[i] / sec if sec > 0 else 0.0,
+        })
+
+    total = int(counts.sum())
+    return {
+        "workers": per_worker,
+        "total_transitions": total,
+        "episodes_captured_all": captured_all,
+        "wall_seconds": wall,
+        "total_transitions_per_sec": total / wall if wall > 0 else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="マルチプロセスでロールアウトを実行する")
+    parser.add_argument("--workers", type=int, default=mp.cpu_count(), help="ワーカープロセス数")
+    parser.add_argument("--episodes", type=int, default=100, help="ワーカーあたりのエピソード数")
+    parser.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS, help="1エピソードの最大ステップ数")
+    parser.add_argument("--control-h0", default=CONTROL_MODE_SIMPLE, choices=[CONTROL_MODE_SIMPLE, CONTROL_MODE_LV0_Q, CONTROL_MODE_LV1])
+    parser.add_argument("--control-h1", default=CONTROL_MODE_SIMPLE, choices=[CONTROL_MODE_SIMPLE, CONTROL_MODE_LV0_Q, CONTROL_MODE_LV1])
+    parser.add_argument("--q-table-h0", default=DEFAULT_Q_TABLE_PATHS[AGENT_ID_HUNTER_0])
+    parser.add_argument("--q-table-h1", default=DEFAULT_Q_TABLE_PATHS[AGENT_ID_HUNTER_1])
+    parser.add_argument("--no-prey-move", action="store_true", help="獲物を動かさない")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--capacity", type=int, default=DEFAULT_RING_CAPACITY, help="リング1本あたりのレコード数")
+    parser.add_argument("--output", default=None, help="受け取ったレコードを追記保存するファイル")
+    args = parser.parse_args(argv)
+
+    config = {
+        "episodes": args.episodes,
+        "max_steps": args.max_steps,
+        "control_h0": args.control_h0,
+        "control_h1": args.control_h1,
+        "q_table_paths": {
+            AGENT_ID_HUNTER_0: args.q_table_h0 if args.control_h0 == CONTROL_MODE_LV0_Q else None,
+            AGENT_ID_HUNTER_1: args.q_table_h1 if args.control_h1 == CONTROL_MODE_LV0_Q else None,
+        },
+        "prey_move_enabled": not args.no_prey_move,
+        "seed": args.seed,
+    }
+
+    out = open(args.output, "ab") if args.output else None
+    try:
+        result = run_rollouts(args.workers, config, args.capacity, on_batch=out.write if out else None)
+    finally:
+        if out is not None:
+            out.close()
+
+    print("\n--- ロールアウト結果 ---")
+    for w in result["workers"]:
+        print(f"worker {w['worker']}: transitions={w['transitions']} episodes={w['episodes']} "
+              f"{w['transitions_per_sec']:.0f} transitions/sec ({w['seconds']:.2f}s)")
+    print(f"total: {result['total_transitions']} transitions in {result['wall_seconds']:.2f}s "
+          f"= {result['total_transitions_per_sec']:.0f} transitions/sec")
+    print(f"全捕獲エピソード: {result['episodes_captured_all']}")
+
+
+if __name__ == "__main__":
+    main()
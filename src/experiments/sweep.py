@@ -0,0 +1,251 @@
+"""
+パラメータの組み合わせ（グリッド）ごとにエピソードを回し、結果をディスクにメモ化するスイープ実行器。
+
+主な機能：
+1. グリッド（獲物の移動の重み、獲物を動かすか、制御モード、Qテーブルファイル）を全組み合わせに展開する。
+2. 組み合わせごとに、シード固定のエピソード群を HeadlessSimulation で実行する（プロセスプールで並列）。
+3. 結果は「設定の内容 + 使うQテーブルファイルの中身」のハッシュをキーとして .sweep_cache/ に保存する。
+   再実行時は、設定かQテーブルの中身が変わった組み合わせだけを計算し直す。
+
+使い方
+- python -m src.experiments.sweep grid.json --workers 8 --output sweep_result.csv
+
+グリッドファイル（JSON）の例
+{
+  "prey_move_weights": [[40, 20, 40], [60, 20, 20]],
+  "prey_move_enabled": [true, false],
+  "controls": [["Simple", "Simple"], ["Lv0 (Q)", "Lv0 (Q)"]],
+  "q_tables": [["q_table.pkl", "q_table.pkl2"]],
+  "episodes": 500,
+  "max_steps": 200,
+  "seed": 0
+}
+- prey_move_weights は PREY_MOVE_ACTIONS（停止, 上, 右）に対応する重み。
+- q_tables は [hunter_0 用, hunter_1 用]。Lv0 (Q) でないハンターのファイルは使わない（ハッシュにも含めない）。
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import (
+    AGENT_ID_HUNTER_0,
+    AGENT_ID_HUNTER_1,
+    AGENT_ID_PREY_0,
+    AGENT_ID_PREY_1,
+    CONTROL_MODE_SIMPLE,
+    CONTROL_MODE_LV0_Q,
+    DEFAULT_Q_TABLE_PATHS,
+    PREY_MOVE_WEIGHTS
+)
+
+DEFAULT_CACHE_DIR = ".sweep_cache"
+DEFAULT_EPISODES = 200
+DEFAULT_MAX_STEPS = 200
+
+# 結果の形式を変えたら上げる（古いキャッシュを使わないようにする）
+CACHE_VERSION = 2
+
+GRID_AXES = ("prey_move_weights", "prey_move_enabled", "controls", "q_tables")
+
+
+def expand_grid(grid: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """グリッドを組み合わせごとの設定のリストに展開する"""
+    axes = {
+        "prey_move_weights": grid.get("prey_move_weights", [PREY_MOVE_WEIGHTS]),
+        "prey_move_enabled": grid.get("prey_move_enabled", [True]),
+        "controls": grid.get("controls", [[CONTROL_MODE_SIMPLE, CONTROL_MODE_SIMPLE]]),
+        "q_tables": grid.get("q_tables", [[DEFAULT_Q_TABLE_PATHS[AGENT_ID_HUNTER_0], DEFAULT_Q_TABLE_PATHS[AGENT_ID_HUNTER_1]]]),
+    }
+    configs = []
+    for values in itertools.product(*(axes[name] for name in GRID_AXES)):
+        config = dict(zip(GRID_AXES, values))
+        config["prey_move_weights"] = list(config["prey_move_weights"])
+        config["controls"] = list(config["controls"])
+        # Q モードでないハンターのファイルは使わないので None にそろえる
+        config["q_tables"] = [
+            path if control == CONTROL_MODE_LV0_Q else None
+            for path, control in zip(config["q_tables"], config["controls"])
+        ]
+        config["episodes"] = grid.get("episodes", DEFAULT_EPISODES)
+        config["max_steps"] = grid.get("max_steps", DEFAULT_MAX_STEPS)
+        config["seed"] = grid.get("seed", 0)
+        configs.append(config)
+
+    # Q テーブルの指定だけが違う重複を除く
+    unique = {}
+    for config in configs:
+        unique.setdefault(json.dumps(config, sort_keys=True), config)
+    return list(unique.values())
+
+
+def file_digest(path: str, memo: Dict[Tuple[str, float, int], str]) -> str:
+    """ファイルの中身の sha256（同じ実行内では mtime・サイズが同じなら再計算しない）"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime, stat.st_size)
+    if key not in memo:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        memo[key] = h.hexdigest()
+    return memo[key]
+
+
+def config_key(config: Dict[str, Any], memo: Dict[Tuple[str, float, int], str]) -> str:
+    """設定と、使う Q テーブルファイルの中身から、キャッシュのキーを作る"""
+    payload = {
+        "version": CACHE_VERSION,
+        "config": {k: v for k, v in config.items() if k != "q_tables"},
+        "q_tables": [file_digest(path, memo) if path else None for path in config["q_tables"]],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def run_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    1つの設定について、シード固定のエピソードを実行して集計する（ワーカープロセスで実行）。
+    """
+    from src.headless import HeadlessSimulation, load_q_table_file
+
+    q_tables = {}
+    for hunter_id, path in zip((AGENT_ID_HUNTER_0, AGENT_ID_HUNTER_1), config["q_tables"]):
+        if path:
+            q_tables[hunter_id] = load_q_table_file(path)
+
+    sim = HeadlessSimulation(
+        config["controls"][0],
+        config["controls"][1],
+        q_tables=q_tables,
+        prey_move_enabled=config["prey_move_enabled"],
+        prey_move_weights=config["prey_move_weights"],
+        seed=config["seed"],
+    )
+
+    max_steps = config["max_steps"]
+    lengths = []
+    done_flags = []
+    capture_steps = {AGENT_ID_PREY_0: [], AGENT_ID_PREY_1: []}
+    for _ in range(config["episodes"]):
+        sim.reset()
+        first = {AGENT_ID_PREY_0: None, AGENT_ID_PREY_1: None}
+        while not sim.done and sim.step_count < max_steps:
+            sim.step()
+            for prey_id in first:
+                if first[prey_id] is None and sim.captured[prey_id]:
+                    first[prey_id] = sim.step_count
+        lengths.append(sim.step_count)
+        # max_steps ちょうどで2匹目を捕獲したエピソードも捕獲成功として数える
+        done_flags.append(sim.done)
+        for prey_id, step in first.items():
+            if step is not None:
+                capture_steps[prey_id].append(step)
+
+    n = len(lengths)
+    captured_all = sum(done_flags)
+
+    def _mean(values):
+        return sum(values) / len(values) if values else None
+
+    return {
+        "episodes": n,
+        "mean_steps": _mean(lengths),
+        "capture_rate_all": captured_all / n if n else None,
+        "mean_capture_step_p0": _mean(capture_steps[AGENT_ID_PREY_0]),
+        "mean_capture_step_p1": _mean(capture_steps[AGENT_ID_PREY_1]),
+        "capture_rate_p0": len(capture_steps[AGENT_ID_PREY_0]) / n if n else None,
+        "capture_rate_p1": len(capture_steps[AGENT_ID_PREY_1]) / n if n else None,
+    }
+
+
+def run_sweep(grid: Dict[str, Any], workers: Optional[int] = None, cache_dir: str = DEFAULT_CACHE_DIR) -> List[Dict[str, Any]]:
+    """
+    グリッド全体を実行する。キャッシュにある組み合わせは読み込むだけ。
+    戻り値は組み合わせごとの {"config", "key", "cached", "result"}。
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    memo: Dict[Tuple[str, float, int], str] = {}
+
+    entries = []
+    todo = []
+    for config in expand_grid(grid):
+        key = config_key(config, memo)
+        path = os.path.join(cache_dir, f"{key}.json")
+        entry = {"config": config, "key": key, "cached": False, "result": None}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                entry["result"] = json.load(f)["result"]
+            entry["cached"] = True
+        else:
+            todo.append(entry)
+        entries.append(entry)
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for entry, result in zip(todo, pool.map(run_config, [e["config"] for e in todo])):
+                entry["result"] = result
+                # 書きかけのファイルを残さないよう、一時ファイルから置き換える
+                path = os.path.join(cache_dir, f"{entry['key']}.json")
+                tmp = f"{path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"config": entry["config"], "result": result}, f, ensure_ascii=False)
+                os.replace(tmp, path)
+
+    return entries
+
+
+def _flatten(entry: Dict[str, Any]) -> Dict[str, Any]:
+    config = entry["config"]
+    row = {
+        "prey_move_weights": "/".join(str(w) for w in config["prey_move_weights"]),
+        "prey_move_enabled": config["prey_move_enabled"],
+        "control_h0": config["controls"][0],
+        "control_h1": config["controls"][1],
+        "q_table_h0": config["q_tables"][0] or "",
+        "q_table_h1": config["q_tables"][1] or "",
+        "episodes": config["episodes"],
+        "cached": entry["cached"],
+    }
+    row.update({k: v for k, v in entry["result"].items() if k != "episodes"})
+    return row
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="パラメータのグリッドをスイープする（結果はディスクにメモ化）")
+    parser.add_argument("grid", help="グリッド定義の JSON ファイル")
+    parser.add_argument("--workers", type=int, default=None, help="並列プロセス数（省略時は CPU 数）")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="キャッシュの保存先")
+    parser.add_argument("--output", default=None, help="結果を CSV で保存するパス")
+    args = parser.parse_args(argv)
+
+    with open(args.grid, "r", encoding="utf-8") as f:
+        grid = json.load(f)
+
+    entries = run_sweep(grid, args.workers, args.cache_dir)
+    rows = [_flatten(entry) for entry in entries]
+
+    computed = sum(1 for entry in entries if not entry["cached"])
+    print(f"\n--- スイープ結果: {len(entries)} 組み合わせ（新規計算 {computed} / キャッシュ {len(entries) - computed}） ---")
+    for row in rows:
+        # episodes が 0 の組み合わせは集計値が None
+        mean_steps = "-" if row["mean_steps"] is None else f"{row['mean_steps']:.2f}"
+        rate = "-" if row["capture_rate_all"] is None else f"{row['capture_rate_all']:.3f}"
+        print(f"weights={row['prey_move_weights']} move={row['prey_move_enabled']} "
+              f"h0={row['control_h0']} h1={row['control_h1']} "
+              f"mean_steps={mean_steps} capture_rate={rate}"
+              + (" (cached)" if row["cached"] else ""))
+
+    if args.output and rows:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
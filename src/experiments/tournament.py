@@ -0,0 +1,465 @@
+"""
+ディレクトリ内のQテーブル同士を総当たりで組ませ、順位表を作るトーナメント実行器。
+
+主な機能：
+1. ディレクトリ内のQテーブル（pickle）を検証し、判定用の密な配列（q_compile_table）に変換して
+   .tournament_cache/tables/ に .npy で保存する（キーはファイルの中身の sha256。変換もプロセスプールで並列）。
+2. 異なる2つのテーブルの全ての順序付きの組 (A, B) について、A を hunter_0、B を hunter_1 の
+   QLearningAgent にしてシード固定のエピソードを実行する。
+   1組のエピソードは --shard-episodes 件ずつのシャードに分け、乱数シードは「組のキー + シャード番号」から作る
+   （組ごとに独立な獲物の動きになるので、組をまたいでエピソードを足し合わせても標本が重複しない）。
+   テーブルを --block-tables 個ずつのブロックに分け、(hunter_0 側のブロック, hunter_1 側のブロック, シャード) を
+   1タスクとしてプロセスプールに配る。1タスクで触るテーブルは最大 2 × --block-tables 個。
+3. ワーカーは .npy をメモリマップで開き、コピーせずに（memoryview で）行動を引く。
+   ページは OS のキャッシュでワーカー間に共有され、pickle の読み込み・変換もしない。
+   開いたテーブルはワーカーごとに直近 WORKER_TABLE_CACHE 個だけ持っておく。
+4. 終わった組の結果は「設定 + 2つのテーブルの中身」のハッシュをキーに .tournament_cache/pairs/ に保存する。
+   テーブルを1つ追加して再実行すると、そのテーブルを含む組だけを計算する。
+5. テーブルごとに、出場した全ての組（hunter_0 / hunter_1 の両方）のエピソードをまとめて、
+   平均ステップ数（少ないほど上位）と全捕獲率に 95% 信頼区間を付け、打ち切り率も添えた順位表を出す。
+
+使い方
+- python -m src.experiments.tournament q_tables/ --episodes 400 --workers 8 --output leaderboard.csv
+- --pairs-output pairs.csv を付けると、組ごとの結果も保存する
+
+集計の定義
+- 1エピソードのステップ数は、2匹とも捕獲するまでのステップ数（max_steps で打ち切り）。
+  打ち切られたエピソードの割合を censored_rate に出す。打ち切りがあるとき、平均ステップ数は真の値の下限。
+- 平均ステップ数の信頼区間は正規近似（平均 ± 1.96 × 標準誤差）で、上限は max_steps で切る。
+  テーブルの標準誤差は、組を層とした層別の分散（組ごとの分散をエピソード数で重み付け）から求める。
+- 捕獲率の信頼区間は Wilson の区間。
+"""
+
+import argparse
+import csv
+import fnmatch
+import hashlib
+import json
+import math
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import AGENT_ID_HUNTER_0, AGENT_ID_HUNTER_1, CONTROL_MODE_LV0_Q, PREY_MOVE_WEIGHTS
+from src.experiments.sweep import file_digest
+
+DEFAULT_CACHE_DIR = ".tournament_cache"
+DEFAULT_EPISODES = 200
+DEFAULT_MAX_STEPS = 200
+DEFAULT_SHARD_EPISODES = 50
+DEFAULT_BLOCK_TABLES = 4
+
+# ワーカーが開いたままにしておくテーブル数（既定のブロック2つ分）
+WORKER_TABLE_CACHE = 2 * DEFAULT_BLOCK_TABLES
+
+# 結果の形式を変えたら上げる（古いキャッシュを使わないようにする）
+CACHE_VERSION = 2
+
+# 95% 信頼区間の z 値
+Z_95 = 1.959963984540054
+
+# 組ごと・シャードごとの集計（足し合わせられる量だけを持つ）
+STAT_KEYS = ("episodes", "steps_sum", "steps_sq_sum", "captured_all")
+
+
+# --- テーブルの準備（メインプロセス + プール） ---
+
+def find_q_tables(directory: str, pattern: str = "*") -> List[str]:
+    """directory 直下の、pattern に一致するファイルのパス（名前順）"""
+    paths = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path) and fnmatch.fnmatch(name, pattern):
+            paths.append(path)
+    return paths
+
+
+def _table_prefix(cache_dir: str, digest: str) -> str:
+    return os.path.join(cache_dir, "tables", digest)
+
+
+def _save_npy(path: str, array: np.ndarray) -> None:
+    # 書きかけのファイルを残さないよう、一時ファイルから置き換える
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def compile_q_table_file(path: str, prefix: str) -> Optional[str]:
+    """
+    Qテーブルを読み込んで検証し、prefix.action.npy / prefix.score.npy に保存する（ワーカープロセスで実行）。
+    問題があればその内容、無ければ None を返す。
+    """
+    from src.headless import load_q_table_file
+    from src.agents.q_reload import validate_q_table
+    from src.agents.q_utils import q_compile_table
+
+    try:
+        table = load_q_table_file(path)
+    except Exception as e:
+        return f"読み込みに失敗: {e}"
+    error = validate_q_table(table)
+    if error is not None:
+        return error
+
+    compiled = q_compile_table(table)
+    _save_npy(f"{prefix}.score.npy", compiled["score"])
+    # action を最後に書くので、action があれば変換済み
+    _save_npy(f"{prefix}.action.npy", compiled["action"])
+    return None
+
+
+def prepare_tables(
+    paths: List[str],
+    cache_dir: str,
+    pool: ProcessPoolExecutor,
+) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    テーブルを変換済みにする（キャッシュに無いものだけ変換する）。
+    戻り値: ({パス: 中身の sha256}, {パス: エラー内容})。エラーのテーブルはトーナメントから外す。
+    """
+    os.makedirs(os.path.join(cache_dir, "tables"), exist_ok=True)
+    memo: Dict[Tuple[str, float, int], str] = {}
+    digests = {path: file_digest(path, memo) for path in paths}
+
+    futures = {}
+    submitted = set()
+    for path, digest in digests.items():
+        prefix = _table_prefix(cache_dir, digest)
+        # 中身が同じファイルは1回だけ変換する
+        if not os.path.exists(f"{prefix}.action.npy") and digest not in submitted:
+            submitted.add(digest)
+            futures[pool.submit(compile_q_table_file, path, prefix)] = (digest, path)
+
+    errors_by_digest = {}
+    for future in as_completed(futures):
+        digest, path = futures[future]
+        error = future.result()
+        if error is not None:
+            errors_by_digest[digest] = error
+
+    errors = {path: errors_by_digest[digest] for path, digest in digests.items() if digest in errors_by_digest}
+    return digests, errors
+
+
+# --- ワーカー ---
+
+# ワーカープロセスごとに開いているテーブル（prefix -> compiled）。直近 WORKER_TABLE_CACHE 個だけ持つ
+_WORKER_TABLES: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+def _worker_table(prefix: str) -> Dict[str, Any]:
+    from src.agents.q_utils import compiled_arrays
+
+    compiled = _WORKER_TABLES.get(prefix)
+    if compiled is None:
+        # メモリマップのまま使う（memoryview で引くのでコピーしない）
+        compiled = compiled_arrays(
+            np.load(f"{prefix}.action.npy", mmap_mode="r"),
+            np.load(f"{prefix}.score.npy", mmap_mode="r"),
+        )
+        _WORKER_TABLES[prefix] = compiled
+        while len(_WORKER_TABLES) > WORKER_TABLE_CACHE:
+            _WORKER_TABLES.popitem(last=False)
+    else:
+        _WORKER_TABLES.move_to_end(prefix)
+    return compiled
+
+
+def _pair_seed(key: str, shard: int) -> int:
+    """組とシャードごとの乱数シード（組のキーは設定の seed を含む）"""
+    return int(hashlib.sha256(f"{key}:{shard}".encode("utf-8")).hexdigest()[:16], 16)
+
+
+def _run_pair_shard(settings: Dict[str, Any], prefixes: List[str], seed: int, episodes: int) -> Dict[str, int]:
+    """1組のうち1シャード分のエピソードを実行して集計する"""
+    from src.headless import HeadlessSimulation
+
+    sim = HeadlessSimulation(
+        CONTROL_MODE_LV0_Q,
+        CONTROL_MODE_LV0_Q,
+        prey_move_enabled=settings["prey_move_enabled"],
+        prey_move_weights=settings["prey_move_weights"],
+        seed=seed,
+        compiled_q_tables={
+            AGENT_ID_HUNTER_0: _worker_table(prefixes[0]),
+            AGENT_ID_HUNTER_1: _worker_table(prefixes[1]),
+        },
+    )
+
+    max_steps = settings["max_steps"]
+    stats = dict.fromkeys(STAT_KEYS, 0)
+    for _ in range(episodes):
+        steps = sim.run_episode(max_steps)
+        stats["episodes"] += 1
+        stats["steps_sum"] += steps
+        stats["steps_sq_sum"] += steps * steps
+        if sim.done:
+            stats["captured_all"] += 1
+    return stats
+
+
+def run_block(task: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """
+    ブロックの組み合わせ1つについて、含まれる組の1シャード分を実行する（ワーカープロセスで実行）。
+    task["pairs"] は [(組のキー, [hunter_0 の prefix, hunter_1 の prefix]), ...]。
+    戻り値: {組のキー: 集計}
+    """
+    return {
+        key: _run_pair_shard(task["settings"], prefixes, _pair_seed(key, task["shard"]), task["episodes"])
+        for key, prefixes in task["pairs"]
+    }
+
+
+# --- 組の実行とキャッシュ ---
+
+def pair_key(settings: Dict[str, Any], digest_h0: str, digest_h1: str) -> str:
+    """設定と2つのテーブルの中身から、組のキャッシュのキーを作る"""
+    payload = {"version": CACHE_VERSION, "settings": settings, "q_tables": [digest_h0, digest_h1]}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _shards(episodes: int, shard_episodes: int) -> List[int]:
+    """シャードごとのエピソード数"""
+    return [min(shard_episodes, episodes - start) for start in range(0, episodes, shard_episodes)]
+
+
+def run_tournament(
+    directory: str,
+    episodes: int = DEFAULT_EPISODES,
+    max_steps: int = DEFAULT_MAX_STEPS,
+    seed: int = 0,
+    prey_move_enabled: bool = True,
+    prey_move_weights: Optional[List[float]] = None,
+    shard_episodes: int = DEFAULT_SHARD_EPISODES,
+    block_tables: int = DEFAULT_BLOCK_TABLES,
+    pattern: str = "*",
+    workers: Optional[int] = None,
+    cache_dir: str = DEFAULT_CACHE_DIR,
+) -> Dict[str, Any]:
+    """
+    トーナメント全体を実行する。キャッシュにある組は読み込むだけ。
+    戻り値: {"tables": [出場したテーブルのパス], "errors": {パス: エラー内容}, "pairs": [組ごとの結果], "settings": 設定}
+    組ごとの結果は {"h0", "h1", "key", "cached", "stats"}。
+    """
+    settings = {
+        "episodes": episodes,
+        "max_steps": max_steps,
+        "seed": seed,
+        "prey_move_enabled": prey_move_enabled,
+        "prey_move_weights": list(prey_move_weights) if prey_move_weights is not None else list(PREY_MOVE_WEIGHTS),
+        # シャードの分け方で乱数シードが変わるので、キーに含める
+        "shard_episodes": shard_episodes,
+    }
+    pairs_dir = os.path.join(cache_dir, "pairs")
+    os.makedirs(pairs_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        digests, errors = prepare_tables(find_q_tables(directory, pattern), cache_dir, pool)
+        tables = [path for path in digests if path not in errors]
+
+        pairs = []
+        todo = []
+        # 中身が同じテーブルを含む組はキーも同じなので、1回だけ計算して結果を共有する
+        same_key = []
+        todo_keys = set()
+        for h0 in tables:
+            for h1 in tables:
+                if h0 == h1:
+                    continue
+                key = pair_key(settings, digests[h0], digests[h1])
+                path = os.path.join(pairs_dir, f"{key}.json")
+                pair = {"h0": h0, "h1": h1, "key": key, "cached": False, "stats": None}
+                if os.path.exists(path):
+                    with open(path, "r", encoding="utf-8") as f:
+                        pair["stats"] = json.load(f)["stats"]
+                    pair["cached"] = True
+                elif key in todo_keys:
+                    same_key.append(pair)
+                else:
+                    todo_keys.add(key)
+                    todo.append(pair)
+                pairs.append(pair)
+
+        # 計算する組を (hunter_0 側のブロック, hunter_1 側のブロック) ごとにまとめる
+        block_of = {path: i // block_tables for i, path in enumerate(tables)}
+        blocks: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+        for pair in todo:
+            blocks.setdefault((block_of[pair["h0"]], block_of[pair["h1"]]), []).append(pair)
+
+        # タスクを全部投げ、組のシャードが揃ったらすぐ保存する（途中で止めても終わった組は残る）。
+        # 同じブロックの組み合わせのシャードは続けて投げるので、近いタスクは同じテーブルを使う
+        counts = _shards(episodes, shard_episodes)
+        by_key = {pair["key"]: pair for pair in todo}
+        remaining = {}
+        futures = []
+        for block_pairs in blocks.values():
+            task_pairs = []
+            for pair in block_pairs:
+                pair["stats"] = dict.fromkeys(STAT_KEYS, 0)
+                remaining[pair["key"]] = len(counts)
+                prefixes = [_table_prefix(cache_dir, digests[pair["h0"]]), _table_prefix(cache_dir, digests[pair["h1"]])]
+                task_pairs.append((pair["key"], prefixes))
+            for shard, count in enumerate(counts):
+                task = {"settings": settings, "pairs": task_pairs, "shard": shard, "episodes": count}
+                futures.append(pool.submit(run_block, task))
+
+        for future in as_completed(futures):
+            for key, stats in future.result().items():
+                pair = by_key[key]
+                for k, v in stats.items():
+                    pair["stats"][k] += v
+                remaining[key] -= 1
+                if remaining[key] > 0:
+                    continue
+                path = os.path.join(pairs_dir, f"{key}.json")
+                tmp = f"{path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"h0": pair["h0"], "h1": pair["h1"], "settings": settings, "stats": pair["stats"]},
+                              f, ensure_ascii=False)
+                os.replace(tmp, path)
+
+    for pair in same_key:
+        pair["stats"] = by_key[pair["key"]]["stats"]
+    return {"tables": tables, "errors": errors, "pairs": pairs, "settings": settings}
+
+
+# --- 集計 ---
+
+def summarize_stats(strata: List[Dict[str, int]], max_steps: int) -> Dict[str, Any]:
+    """
+    組ごとの集計（層）から、平均ステップ数・捕獲率と 95% 信頼区間、打ち切り率を求める。
+    平均の分散は層別（組ごとの分散 × エピソード数 の和 / 全エピソード数^2）。
+    """
+    n = sum(stats["episodes"] for stats in strata)
+    if n == 0:
+        return {"episodes": 0, "mean_steps": None, "steps_ci_low": None, "steps_ci_high": None,
+                "capture_rate": None, "capture_ci_low": None, "capture_ci_high": None, "censored_rate": None}
+
+    mean = sum(stats["steps_sum"] for stats in strata) / n
+    weighted_var = 0.0
+    for stats in strata:
+        k = stats["episodes"]
+        if k > 1:
+            m = stats["steps_sum"] / k
+            weighted_var += max((stats["steps_sq_sum"] - k * m * m) / (k - 1), 0.0) * k
+    half = Z_95 * math.sqrt(weighted_var) / n
+
+    # Wilson の区間（捕獲率が 0 / 1 に近くても区間が [0, 1] に収まる）
+    p = sum(stats["captured_all"] for stats in strata) / n
+    denom = 1.0 + Z_95 ** 2 / n
+    center = (p + Z_95 ** 2 / (2 * n)) / denom
+    spread = Z_95 * math.sqrt(p * (1 - p) / n + Z_95 ** 2 / (4 * n * n)) / denom
+
+    return {
+        "episodes": n,
+        "mean_steps": mean,
+        "steps_ci_low": mean - half,
+        # ステップ数は max_steps で打ち切っているので、それを超える値にはならない
+        "steps_ci_high": min(mean + half, float(max_steps)),
+        "capture_rate": p,
+        "capture_ci_low": max(0.0, center - spread),
+        "capture_ci_high": min(1.0, center + spread),
+        # 2匹とも捕獲できずに max_steps で打ち切ったエピソードの割合
+        "censored_rate": 1.0 - p,
+    }
+
+
+def leaderboard(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    テーブルごとに、出場した全ての組のエピソードをまとめて順位を付ける。
+    平均ステップ数の少ない順（同じなら捕獲率の高い順）。
+    """
+    strata: Dict[str, List[Dict[str, int]]] = {path: [] for path in result["tables"]}
+    for pair in result["pairs"]:
+        for path in (pair["h0"], pair["h1"]):
+            strata[path].append(pair["stats"])
+
+    rows = []
+    for path, pair_stats in strata.items():
+        row = {"table": os.path.basename(path), "matches": len(pair_stats)}
+        row.update(summarize_stats(pair_stats, result["settings"]["max_steps"]))
+        rows.append(row)
+
+    rows.sort(key=lambda r: (
+        math.inf if r["mean_steps"] is None else r["mean_steps"],
+        -(r["capture_rate"] or 0.0),
+        r["table"],
+    ))
+    return [{"rank": rank, **row} for rank, row in enumerate(rows, start=1)]
+
+
+def _pair_row(pair: Dict[str, Any], max_steps: int) -> Dict[str, Any]:
+    row = {"h0": os.path.basename(pair["h0"]), "h1": os.path.basename(pair["h1"]), "cached": pair["cached"]}
+    row.update(summarize_stats([pair["stats"]], max_steps))
+    return row
+
+
+def _write_csv(path: str, rows: List[Dict[str, Any]]) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="ディレクトリ内のQテーブルを総当たりで組ませて順位表を作る")
+    parser.add_argument("directory", help="Qテーブル（pickle）を置いたディレクトリ")
+    parser.add_argument("--pattern", default="*", help="対象にするファイル名のパターン（例: '*.pkl'）")
+    parser.add_argument("--episodes", type=int, default=DEFAULT_EPISODES, help="1組あたりのエピソード数")
+    parser.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS, help="1エピソードの最大ステップ数")
+    parser.add_argument("--shard-episodes", type=int, default=DEFAULT_SHARD_EPISODES, help="1シャードあたりのエピソード数")
+    parser.add_argument("--block-tables", type=int, default=DEFAULT_BLOCK_TABLES,
+                        help="1タスクでまとめて扱うテーブル数（hunter_0 側・hunter_1 側それぞれ）")
+    parser.add_argument("--no-prey-move", action="store_true", help="獲物を動かさない")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="並列プロセス数（省略時は CPU 数）")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="キャッシュの保存先")
+    parser.add_argument("--output", default=None, help="順位表を CSV で保存するパス")
+    parser.add_argument("--pairs-output", default=None, help="組ごとの結果を CSV で保存するパス")
+    args = parser.parse_args(argv)
+
+    result = run_tournament(
+        args.directory,
+        episodes=args.episodes,
+        max_steps=args.max_steps,
+        seed=args.seed,
+        prey_move_enabled=not args.no_prey_move,
+        shard_episodes=args.shard_episodes,
+        block_tables=args.block_tables,
+        pattern=args.pattern,
+        workers=args.workers,
+        cache_dir=args.cache_dir,
+    )
+
+    for path, error in result["errors"].items():
+        print(f"除外: {path}: {error}")
+    if len(result["tables"]) < 2:
+        print("トーナメントには使えるQテーブルが2つ以上必要です")
+        return
+
+    pairs = result["pairs"]
+    computed = sum(1 for pair in pairs if not pair["cached"])
+    print(f"\n--- トーナメント: {len(result['tables'])} テーブル, {len(pairs)} 組"
+          f"（新規計算 {computed} / キャッシュ {len(pairs) - computed}） ---")
+    rows = leaderboard(result)
+    for row in rows:
+        # 打ち切りがあると平均ステップ数は下限になるので、その割合を並べて出す
+        censored = f" 打ち切り {row['censored_rate']:.1%}（mean_steps は下限）" if row["censored_rate"] > 0 else ""
+        print(f"{row['rank']:>3}. {row['table']}: mean_steps={row['mean_steps']:.2f} "
+              f"[{row['steps_ci_low']:.2f}, {row['steps_ci_high']:.2f}] "
+              f"capture_rate={row['capture_rate']:.3f} [{row['capture_ci_low']:.3f}, {row['capture_ci_high']:.3f}]"
+              f"{censored} (組 {row['matches']}, {row['episodes']} エピソード)")
+
+    if args.output:
+        _write_csv(args.output, rows)
+    if args.pairs_output and pairs:
+        _write_csv(args.pairs_output, [_pair_row(pair, args.max_steps) for pair in pairs])
+
+
+if __name__ == "__main__":
+    main()
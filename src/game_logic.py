@@ -7,15 +7,27 @@ import random
 from typing import Dict, Any, Tuple
 
 from src.env.game_env import HunterTaskEnv
+from src.env import state_code
 from src.agents.lv0 import Lv0Agent
+from src.agents.lv1 import Lv1Agent
+from src.agents.q_learning import QLearningAgent
+from src.agents.q_utils import ACTION_ID_TO_LABEL
+from src.agents.q_reload import get_q_table_store
 from src.agents.manual import ManualAgent
+from src.agents.assignment import assign_targets
+from src.session_history import SessionHistory
 from src.config import (
     AGENT_ID_HUNTER_0,
     AGENT_ID_HUNTER_1,
     AGENT_ID_PREY_0,
     AGENT_ID_PREY_1,
     CONTROL_MODE_LV0_Q,
-    CONTROL_MODE_MANUAL
+    CONTROL_MODE_LV1,
+    CONTROL_MODE_MANUAL,
+    PREY_MOVE_ACTIONS,
+    PREY_MOVE_WEIGHTS,
+    HISTORY_MAX_RECORDS,
+    TARGET_ASSIGNMENT_METHOD
 )
 
 def initialize_simulation():
@@ -26,9 +38,13 @@ def initialize_simulation():
     st.session_state.agent_0 = Lv0Agent(agent_id=AGENT_ID_HUNTER_0)
     st.session_state.agent_1 = Lv0Agent(agent_id=AGENT_ID_HUNTER_1)
     st.session_state.manual_agent = ManualAgent(agent_id=AGENT_ID_HUNTER_0)
+    st.session_state.lv1_agents = {
+        AGENT_ID_HUNTER_0: Lv1Agent(agent_id=AGENT_ID_HUNTER_0),
+        AGENT_ID_HUNTER_1: Lv1Agent(agent_id=AGENT_ID_HUNTER_1),
+    }
     st.session_state.step_count = 0
     
-    st.session_state.captured = {AGENT_ID_PREY_0: False, AGENT_ID_PREY_1: False}
+    # 捕獲状況は env.code の捕獲フラグだけが持つ（get_captured で読む）
     st.session_state.q_tables = {AGENT_ID_HUNTER_0: None, AGENT_ID_HUNTER_1: None}
     st.session_state.q_agents = {AGENT_ID_HUNTER_0: None, AGENT_ID_HUNTER_1: None}
     
@@ -47,45 +63,68 @@ def initialize_simulation():
             AGENT_ID_PREY_1: 0
         }
 
-    # ログ保存用リスト
+    # ログ保存用（直近分のみメモリ、古い分は一時ファイル）
     if 'history' not in st.session_state:
-        st.session_state.history = []
+        st.session_state.history = SessionHistory(max_records=HISTORY_MAX_RECORDS, expand=expand_log_record)
 
-def log_step(action_h0, action_h1):
+def log_step(action_h0, action_h1) -> Dict[str, Any]:
     """
     現在の状態とアクションを履歴に保存する。
+    位置と捕獲フラグは状態コード1つで持ち、CSV に書き出すときに expand_log_record で列に展開する。
+    ステップの最後（捕獲判定・獲物の移動の後）に、戻り値のレコードを finish_log_step に渡す。
     """
-    state = st.session_state.env.get_state()
-    
-    # 記録するデータ
     record = {
         "step": st.session_state.step_count,
-        "h0_pos": state[AGENT_ID_HUNTER_0],
-        "h1_pos": state[AGENT_ID_HUNTER_1],
-        "p0_pos": state[AGENT_ID_PREY_0],
-        "p1_pos": state[AGENT_ID_PREY_1],
+        "state": st.session_state.env.code,
         "h0_action": action_h0,
         "h1_action": action_h1,
-        "captured_p0": st.session_state.captured[AGENT_ID_PREY_0],
-        "captured_p1": st.session_state.captured[AGENT_ID_PREY_1]
+        "next_state": None,
     }
     
     st.session_state.history.append(record)
+    return record
+
+def finish_log_step(record: Dict[str, Any]):
+    """
+    log_step のレコードに、ステップ終了時（獲物の移動後）の状態コードを next_state として書き足す。
+    獲物の移動で起きた捕獲（エピソード最後の捕獲を含む）は、この捕獲フラグにだけ残る。
+    """
+    record["next_state"] = st.session_state.env.code
+
+def expand_log_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    log_step のレコードを CSV の1行にする。
+    列は従来と同じ（位置は "(x, y)"、捕獲フラグは捕獲判定の前の値）に、状態コードの列 state と
+    ステップ終了時の状態コードの列 next_state（まだ無いときは空）を加えたもの。
+    """
+    code = record["state"]
+    captured_p0, captured_p1 = state_code.captured_flags(code)
+    return {
+        "step": record["step"],
+        "state": code,
+        "h0_pos": state_code.xy(code, 0),
+        "h1_pos": state_code.xy(code, 1),
+        "p0_pos": state_code.xy(code, 2),
+        "p1_pos": state_code.xy(code, 3),
+        "h0_action": record["h0_action"],
+        "h1_action": record["h1_action"],
+        "captured_p0": captured_p0,
+        "captured_p1": captured_p1,
+        "next_state": record.get("next_state"),
+    }
+
+def get_captured() -> Dict[str, bool]:
+    """
+    捕獲状況を {'prey_0': bool, 'prey_1': bool} で返す（環境の状態コードの捕獲フラグから作る）。
+    """
+    flag_0, flag_1 = state_code.captured_flags(st.session_state.env.code)
+    return {AGENT_ID_PREY_0: flag_0, AGENT_ID_PREY_1: flag_1}
 
 def check_capture():
     """
-    現在の状態に基づいて捕獲判定を行い、st.session_state.captured を更新する。
+    環境の状態コードで捕獲判定を行う（捕獲フラグは env.code に立つ）。
     """
-    state_now = st.session_state.env.get_state()
-    h0 = state_now.get(AGENT_ID_HUNTER_0)
-    h1 = state_now.get(AGENT_ID_HUNTER_1)
-    p0 = state_now.get(AGENT_ID_PREY_0)
-    p1 = state_now.get(AGENT_ID_PREY_1)
-    
-    if p0 in (h0, h1):
-        st.session_state.captured[AGENT_ID_PREY_0] = True
-    if p1 in (h0, h1):
-        st.session_state.captured[AGENT_ID_PREY_1] = True
+    st.session_state.env.check_capture()
 
 def move_prey(enabled: bool):
     """
@@ -100,18 +139,20 @@ def move_prey(enabled: bool):
     
     # 行動の候補と重み
     # 0: STAY, 1: UP, 4: RIGHT
-    actions = [0, 1, 4]
-    weights = [40, 20, 40] # %, 合計100
+    actions = PREY_MOVE_ACTIONS
+    weights = PREY_MOVE_WEIGHTS # %, 合計100
     
+    captured_p0, captured_p1 = state_code.captured_flags(st.session_state.env.code)
+
     # prey_0
-    if not st.session_state.captured[AGENT_ID_PREY_0]:
+    if not captured_p0:
         # random.choices はリストを返すので [0] を取る
         a = random.choices(actions, weights=weights, k=1)[0]
         st.session_state.env.step(agent_id=AGENT_ID_PREY_0, action_id=a)
         st.session_state.last_actions[AGENT_ID_PREY_0] = a
     
     # prey_1
-    if not st.session_state.captured[AGENT_ID_PREY_1]:
+    if not captured_p1:
         a = random.choices(actions, weights=weights, k=1)[0]
         st.session_state.env.step(agent_id=AGENT_ID_PREY_1, action_id=a)
         st.session_state.last_actions[AGENT_ID_PREY_1] = a
@@ -119,24 +160,100 @@ def move_prey(enabled: bool):
     # 移動後の捕獲チェック
     check_capture()
 
+def sync_q_agents():
+    """
+    st.session_state.q_table_paths（ハンターごとのQテーブルのパス）に合わせて q_tables / q_agents を用意する。
+    テーブルはバックグラウンドで読み込まれるので、ここでは待たない（まだ読み込み中ならそのハンターは None のまま）。
+    作ったエージェントはストアに登録し、ファイルが更新されたらテーブルが差し替わるようにする。
+    """
+    store = get_q_table_store()
+    paths = st.session_state.get('q_table_paths', {})
+    agent_paths = st.session_state.setdefault('q_agent_paths', {})
+    for hunter_id in (AGENT_ID_HUNTER_0, AGENT_ID_HUNTER_1):
+        path = paths.get(hunter_id)
+        table = store.get(path) if path else None
+        agent = st.session_state.q_agents.get(hunter_id)
+        if table is None:
+            agent = None
+        elif agent is None or agent_paths.get(hunter_id) != path:
+            agent = QLearningAgent(table, hunter_id)
+            store.register(path, agent)
+        st.session_state.q_agents[hunter_id] = agent
+        agent_paths[hunter_id] = path if agent is not None else None
+        st.session_state.q_tables[hunter_id] = agent.q_table if agent is not None else None
+
+def observe_partner_actions(state_before: Dict[str, Tuple[int, int]], actions: Dict[str, int], controls: Dict[str, str]):
+    """
+    Lv1 エージェントに、パートナーがとった行動を観測させる（信念の更新）。
+    state_before はハンターが移動する前の状態。actions / controls は今回行動したハンターの分だけでよい。
+    パートナーが Lv0 (Q) で Qテーブルがあればその貪欲行動、それ以外は Lv0 ルールを行動モデルにする。
+    """
+    captured = get_captured()
+    for agent in st.session_state.lv1_agents.values():
+        partner_id = agent.partner_id
+        if partner_id not in actions:
+            continue
+        q_agent = st.session_state.q_agents.get(partner_id)
+        partner_q = q_agent.q_table if controls.get(partner_id) == CONTROL_MODE_LV0_Q and q_agent is not None else None
+        agent.observe(state_before, actions[partner_id], captured, partner_q)
+
+def lv0_targets(captured: Dict[str, bool], state: Dict[str, Tuple[int, int]]) -> Dict[str, str]:
+    """
+    Simple (Lv0) エージェントの目標の獲物を、両ハンター分まとめて返す（1ステップに1回解けばよい）。
+    全ハンター × 未捕獲の獲物の距離から割り当てを解き、捕獲が起きるたびに割り当て直す。
+    未捕獲の獲物が無いときは従来どおり hunter_0 → prey_0 / hunter_1 → prey_1 を基準に決める。
+    """
+    targets = assign_targets(state, captured, TARGET_ASSIGNMENT_METHOD)
+    if targets.get(AGENT_ID_HUNTER_0) is None:
+        targets[AGENT_ID_HUNTER_0] = AGENT_ID_PREY_1 if captured.get(AGENT_ID_PREY_0, False) else AGENT_ID_PREY_0
+    if targets.get(AGENT_ID_HUNTER_1) is None:
+        targets[AGENT_ID_HUNTER_1] = AGENT_ID_PREY_0 if captured.get(AGENT_ID_PREY_1, False) else AGENT_ID_PREY_1
+    return targets
+
+def select_lv0_target(agent_id: str, captured: Dict[str, bool], state: Dict[str, Tuple[int, int]]) -> str:
+    """
+    Simple (Lv0) エージェント1体分の目標の獲物（lv0_targets の agent_id の分）。
+    """
+    return lv0_targets(captured, state)[agent_id]
+
+def _shared_lv0_targets(current_state: Dict[str, Tuple[int, int]]) -> Dict[str, str]:
+    """
+    同じ状態（env.code）の間は lv0_targets の結果を session_state に持っておき、2体目のハンターで使い回す。
+    """
+    code = st.session_state.env.code
+    cached = st.session_state.get('lv0_targets_cache')
+    if cached is None or cached[0] != code:
+        cached = (code, lv0_targets(get_captured(), current_state))
+        st.session_state.lv0_targets_cache = cached
+    return cached[1]
+
 def get_agent_action(agent_id: str, control_mode: str, current_state: Dict[str, Tuple[int, int]], debug: bool = False) -> int:
     """
     指定されたエージェントとモードに基づいて行動を決定する。
     """
-    # ターゲット決定 (Lv0用フォールバック)
-    if agent_id == AGENT_ID_HUNTER_0:
-        target_lv0 = AGENT_ID_PREY_1 if st.session_state.captured.get(AGENT_ID_PREY_0, False) else AGENT_ID_PREY_0
-    else:
-        target_lv0 = AGENT_ID_PREY_0 if st.session_state.captured.get(AGENT_ID_PREY_1, False) else AGENT_ID_PREY_1
-
+    captured = get_captured()
     action = 0
     
-    # Q-Learning
+    # Q-Learning（状態コードのまま判定する）
     if control_mode == CONTROL_MODE_LV0_Q and st.session_state.q_agents.get(agent_id) is not None:
-        action, chosen_prey, label = st.session_state.q_agents[agent_id].choose_action(current_state)
+        action, prey_index = st.session_state.q_agents[agent_id].choose_action_code(st.session_state.env.code)
+        if action < 0:
+            action = 0
         if debug:
-            st.info(f"[{agent_id}] mode=Lv0 (Q), chosen={chosen_prey or '-'} action={label or action}")
+            chosen_prey = (AGENT_ID_PREY_0, AGENT_ID_PREY_1)[prey_index] if prey_index >= 0 else '-'
+            st.info(f"[{agent_id}] mode=Lv0 (Q), chosen={chosen_prey} action={ACTION_ID_TO_LABEL.get(action, action)}")
             
+    # Lv1（パートナーの意図を推定して反対の獲物へ）
+    elif control_mode == CONTROL_MODE_LV1:
+        lv1_agent = st.session_state.lv1_agents[agent_id]
+        action, target_lv1 = lv1_agent.choose_action(current_state, captured)
+        if debug:
+            belief = lv1_agent.belief
+            st.info(
+                f"[{agent_id}] mode=Lv1, partner_belief=prey_0:{belief[AGENT_ID_PREY_0]:.2f}/prey_1:{belief[AGENT_ID_PREY_1]:.2f}"
+                f" target={target_lv1} action_id={action}"
+            )
+
     # Manual
     elif control_mode == CONTROL_MODE_MANUAL:
         # ManualAgentは内部状態を持たず、session_stateから取る形だが、
@@ -147,6 +264,8 @@ def get_agent_action(agent_id: str, control_mode: str, current_state: Dict[str,
             
     # Simple (Lv0)
     else:
+        # 目標は両ハンター分を1回で割り当てる（Q テーブル未読み込みの Lv0 (Q) もここに来る）
+        target_lv0 = _shared_lv0_targets(current_state)[agent_id]
         agent = st.session_state.agent_0 if agent_id == AGENT_ID_HUNTER_0 else st.session_state.agent_1
         action = agent.choose_action(current_state, target_lv0)
         if debug:
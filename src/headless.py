@@ -0,0 +1,203 @@
+"""
+Streamlit を使わずにシミュレーションを実行するためのモジュール。
+
+主な機能：
+1. game_logic と同じ手順（ハンター行動 → 捕獲判定 → 獲物移動）で AI vs AI の1ステップを進める。
+2. st.session_state の代わりにインスタンス内で捕獲状況・直前の行動・乱数を保持する。
+3. バッチ実行・ワーカープロセス・ベンチマークなど、UI の外で大量のエピソードを回す用途に使う。
+
+使い方
+- sim = HeadlessSimulation(CONTROL_MODE_SIMPLE, CONTROL_MODE_LV0_Q, q_tables={'hunter_1': q}, seed=0)
+- while not sim.done and sim.step_count < 200: sim.step()
+"""
+
+import pickle
+import random
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from src.env.game_env import HunterTaskEnv
+from src.env import state_code
+from src.agents.lv0 import Lv0Agent
+from src.agents.lv1 import Lv1Agent
+from src.agents.q_learning import QLearningAgent
+from src.game_logic import lv0_targets
+from src.config import (
+    AGENT_ID_HUNTER_0,
+    AGENT_ID_HUNTER_1,
+    AGENT_ID_PREY_0,
+    AGENT_ID_PREY_1,
+    CONTROL_MODE_LV0_Q,
+    CONTROL_MODE_LV1,
+    PREY_MOVE_ACTIONS,
+    PREY_MOVE_WEIGHTS
+)
+
+HUNTER_IDS = (AGENT_ID_HUNTER_0, AGENT_ID_HUNTER_1)
+PREY_IDS = (AGENT_ID_PREY_0, AGENT_ID_PREY_1)
+
+
+def load_q_table_file(path: str) -> Any:
+    """Qテーブル（pickle）を読み込む。UI を使わないので例外はそのまま送出する。"""
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class HeadlessSimulation:
+
+    def __init__(
+        self,
+        control_h0: str,
+        control_h1: str,
+        q_tables: Optional[Dict[str, Any]] = None,
+        prey_move_enabled: bool = True,
+        prey_move_weights: Optional[Sequence[float]] = None,
+        seed: Optional[int] = None,
+        record_log: bool = False,
+        compiled_q_tables: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> None:
+        """
+        control_h0 / control_h1: CONTROL_MODE_SIMPLE / CONTROL_MODE_LV0_Q / CONTROL_MODE_LV1
+        q_tables: {'hunter_0': q, 'hunter_1': q}（Q モードのハンターのみ必要）
+        prey_move_weights: PREY_MOVE_ACTIONS に対応する重み（省略時は config の値）
+        record_log: True なら各ステップで log_step と同じ形式のレコード（状態コード）を last_record に残す
+        compiled_q_tables: {'hunter_0': compiled, ...}（q_compile_table 形式の変換済み配列）。
+          q_tables より優先する。元の dict が無いので、Lv1 のパートナー推定ではQテーブル無しとして扱う
+        """
+        self.controls = {AGENT_ID_HUNTER_0: control_h0, AGENT_ID_HUNTER_1: control_h1}
+        self.prey_move_enabled = prey_move_enabled
+        self.prey_move_weights = list(prey_move_weights) if prey_move_weights is not None else list(PREY_MOVE_WEIGHTS)
+        self.rng = random.Random(seed)
+        self.record_log = record_log
+        self.last_record: Optional[Dict[str, Any]] = None
+
+        self.env = HunterTaskEnv(num_hunters=2, num_prey=2)
+        self.lv0_agents = {hunter_id: Lv0Agent(agent_id=hunter_id) for hunter_id in HUNTER_IDS}
+        self.lv1_agents = {hunter_id: Lv1Agent(agent_id=hunter_id) for hunter_id in HUNTER_IDS}
+        self.q_agents: Dict[str, Optional[QLearningAgent]] = {}
+        for hunter_id in HUNTER_IDS:
+            q = (q_tables or {}).get(hunter_id)
+            compiled = (compiled_q_tables or {}).get(hunter_id)
+            if compiled is not None:
+                self.q_agents[hunter_id] = QLearningAgent(None, hunter_id, compiled=compiled)
+            else:
+                self.q_agents[hunter_id] = QLearningAgent(q, hunter_id) if isinstance(q, dict) else None
+        # Lv1 の信念は、Lv1 で動くハンターがいるときだけ更新する
+        self.uses_lv1 = CONTROL_MODE_LV1 in self.controls.values()
+        # Simple の目標の割り当て（状態コード, {hunter_id: prey_id}）。同じ状態の間は両ハンターで使い回す
+        self._lv0_targets: Tuple[Optional[int], Dict[str, str]] = (None, {})
+
+        self.reset()
+
+    def reset(self) -> Dict[str, Tuple[int, int]]:
+        """エピソードを初期化する（initialize_simulation 相当）"""
+        self.step_count = 0
+        self.captured = {AGENT_ID_PREY_0: False, AGENT_ID_PREY_1: False}
+        self.last_actions = {agent_id: 0 for agent_id in HUNTER_IDS + PREY_IDS}
+        for agent in self.lv1_agents.values():
+            agent.reset()
+        return self.env.reset()
+
+    @property
+    def done(self) -> bool:
+        return self.captured[AGENT_ID_PREY_0] and self.captured[AGENT_ID_PREY_1]
+
+    def get_agent_action(self, agent_id: str, state: Optional[Dict[str, Tuple[int, int]]] = None) -> int:
+        """
+        game_logic.get_agent_action と同じ規則で行動を決める（Manual は対象外）。
+        state を省略すると環境の現在の状態を使う（Q は状態コードのまま判定し、位置の dict を作らない）。
+        """
+        q_agent = self.q_agents.get(agent_id)
+        if self.controls[agent_id] == CONTROL_MODE_LV0_Q and q_agent is not None:
+            code = self.env.code if state is None else state_code.encode_state(state, self.captured)
+            action, _ = q_agent.choose_action_code(code)
+            return action if action >= 0 else 0
+        from_env = state is None
+        if from_env:
+            state = self.env.get_state()
+        if self.controls[agent_id] == CONTROL_MODE_LV1:
+            action, _ = self.lv1_agents[agent_id].choose_action(state, self.captured)
+            return action
+        return self.lv0_agents[agent_id].choose_action(state, self._lv0_target(agent_id, state, from_env))
+
+    def _lv0_target(self, agent_id: str, state: Dict[str, Tuple[int, int]], from_env: bool) -> str:
+        """Simple の目標。環境の現在の状態なら、割り当ては状態コードごとに1回だけ解く"""
+        if not from_env:
+            return lv0_targets(self.captured, state)[agent_id]
+        code, targets = self._lv0_targets
+        if code != self.env.code:
+            targets = lv0_targets(self.captured, state)
+            self._lv0_targets = (self.env.code, targets)
+        return targets[agent_id]
+
+    def observe_partner_actions(self, state: Dict[str, Tuple[int, int]], action_0: int, action_1: int) -> None:
+        """game_logic.observe_partner_actions 相当（state はハンターが移動する前の状態）"""
+        actions = {AGENT_ID_HUNTER_0: action_0, AGENT_ID_HUNTER_1: action_1}
+        for agent in self.lv1_agents.values():
+            partner_id = agent.partner_id
+            q_agent = self.q_agents.get(partner_id)
+            partner_q = q_agent.q_table if self.controls[partner_id] == CONTROL_MODE_LV0_Q and q_agent is not None else None
+            agent.observe(state, actions[partner_id], self.captured, partner_q)
+
+    def check_capture(self) -> None:
+        """捕獲判定は環境の状態コードで行い、captured に反映する"""
+        flag_0, flag_1 = self.env.check_capture()
+        if flag_0:
+            self.captured[AGENT_ID_PREY_0] = True
+        if flag_1:
+            self.captured[AGENT_ID_PREY_1] = True
+
+    def move_prey(self) -> Tuple[int, int]:
+        """獲物を移動させ、各獲物の行動IDを返す（移動しなかった獲物は 0）"""
+        if not self.prey_move_enabled:
+            return 0, 0
+
+        self.check_capture()
+        prey_actions = []
+        for prey_id in PREY_IDS:
+            a = 0
+            if not self.captured[prey_id]:
+                a = self.rng.choices(PREY_MOVE_ACTIONS, weights=self.prey_move_weights, k=1)[0]
+                self.env.step(agent_id=prey_id, action_id=a)
+                self.last_actions[prey_id] = a
+            prey_actions.append(a)
+        self.check_capture()
+        return prey_actions[0], prey_actions[1]
+
+    def step(self) -> Tuple[int, int, int, int]:
+        """
+        run_ai_vs_ai_step と同じ順序で1ステップ進める。
+        戻り値: (hunter_0 の行動, hunter_1 の行動, prey_0 の行動, prey_1 の行動)
+        """
+        self.step_count += 1
+
+        action_0 = self.get_agent_action(AGENT_ID_HUNTER_0)
+        action_1 = self.get_agent_action(AGENT_ID_HUNTER_1)
+        if self.uses_lv1:
+            self.observe_partner_actions(self.env.get_state(), action_0, action_1)
+
+        self.env.step(agent_id=AGENT_ID_HUNTER_0, action_id=action_0)
+        self.last_actions[AGENT_ID_HUNTER_0] = action_0
+        self.env.step(agent_id=AGENT_ID_HUNTER_1, action_id=action_1)
+        self.last_actions[AGENT_ID_HUNTER_1] = action_1
+
+        if self.record_log:
+            self.last_record = {
+                "step": self.step_count,
+                "state": self.env.code,
+                "h0_action": action_0,
+                "h1_action": action_1,
+                "next_state": None,
+            }
+
+        self.check_capture()
+        prey_0, prey_1 = self.move_prey()
+        if self.record_log:
+            self.last_record["next_state"] = self.env.code
+        return action_0, action_1, prey_0, prey_1
+
+    def run_episode(self, max_steps: int) -> int:
+        """リセットして1エピソード実行し、かかったステップ数を返す"""
+        self.reset()
+        while not self.done and self.step_count < max_steps:
+            self.step()
+        return self.step_count
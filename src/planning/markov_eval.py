@@ -0,0 +1,664 @@
+"""
+ハンタータスクを有限マルコフ連鎖として厳密に評価するモジュール。
+
+主な機能：
+1. ハンターの方策が決定論的（Simple = Lv0 + 目標割り当て（TARGET_ASSIGNMENT_METHOD）、または Lv0 (Q) の貪欲方策）なとき、
+   獲物の移動（move_prey の確率）だけが確率的なので、ゲームは有限マルコフ連鎖になる。
+2. 開始状態から到達可能な状態をまとめて（numpy のバッチで）列挙し、遷移を疎行列（COO 形式の配列）として作る。
+3. 次の量を連立方程式として解く（モンテカルロではなく期待値そのもの）。
+   - 全捕獲までの期待ステップ数
+   - 最初の捕獲までの期待ステップ数
+   - 捕獲順序の確率（prey_0 が先 / prey_1 が先 / 同時）
+4. hunter_0 を原点に平行移動した状態にまとめて状態数を減らす。捕獲済みの獲物の位置はその後の動きに
+   影響しないので、常に原点にそろえる。
+   Qテーブルは読み込み時に、判定用の配列（最良行動とスコア）がトーラス上の平行移動で変わらないかを調べる。
+   不変でない方策があれば、列挙を始める前に ValueError にする
+   （平行移動でまとめないと状態数が GRID_SIZE^8 のオーダーになり、現実的に列挙できないため）。
+   Simple（Lv0）は、目標がちょうど半周先（差が GRID_SIZE / 2）の軸で向きを決めるときだけ、向きが絶対座標で決まる
+   （Lv0Agent._calculate_torus_distance）。その状態は hunter_0 を原点にした座標で向きを決めるので、
+   結果はシミュレーションと少しずれる。到達可能な状態のうちその数を結果の tie_states に出す（0 なら厳密）。
+
+1ステップの手順は run_ai_vs_ai_step / HeadlessSimulation と同じ
+- 両ハンターが同じ状態を見て行動を決める → hunter_0, hunter_1 の順に移動 → 捕獲判定
+  → 未捕獲の獲物が PREY_MOVE_ACTIONS の重みで移動 → 捕獲判定
+
+解き方
+- 疎行列 P（遷移元の順に並べた COO 形式の配列）と x の積を np.bincount で計算し、(I - P) x = b を
+  BiCGSTAB で残差 < tol まで解く。scipy は依存関係に無いため、反復法を numpy だけで書いている。
+- 片方捕獲済みの状態は片方捕獲済み / 全捕獲にしか移らないので、全捕獲までの期待ステップ数は
+  片方捕獲済みの状態（小さい）を先に解き、その値を使って両方未捕獲の状態を解く。
+- 捕獲順序の確率は、全ての状態が確率1で最初の捕獲に至るとき prey_0 先 + prey_1 先 + 同時 = 1 なので、
+  同時の確率は連立方程式を解かずに差で求める。
+- 吸収（全捕獲）に確率1で到達しない状態の期待ステップ数は inf とする。
+
+使い方
+- python -m src.planning.markov_eval --control-h0 Simple --control-h1 Simple
+- python -m src.planning.markov_eval --control-h1 "Lv0 (Q)" --q-table-h1 q_table.pkl2 --check-mc 20000
+- コードから:
+  ev = MarkovEvaluator(SimplePolicy(), SimplePolicy())
+  result = ev.evaluate([env.reset()])
+"""
+
+import argparse
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.env.game_env import ACTIONS, GRID_SIZE, HunterTaskEnv
+from src.env.state_code import CAPTURE_BITS, CAPTURE_SHIFT, COORD_BITS, STATE_ORDER, decode_states, encode_states
+from src.agents.assignment import ASSIGNMENT_GREEDY, _TIE_BREAK
+from src.agents.q_utils import q_compile_table, q_choose_actions_batch
+from src.config import (
+    AGENT_ID_HUNTER_0,
+    AGENT_ID_HUNTER_1,
+    AGENT_ID_PREY_0,
+    AGENT_ID_PREY_1,
+    CONTROL_MODE_SIMPLE,
+    CONTROL_MODE_LV0_Q,
+    DEFAULT_Q_TABLE_PATHS,
+    PREY_MOVE_ACTIONS,
+    PREY_MOVE_WEIGHTS,
+    TARGET_ASSIGNMENT_METHOD
+)
+
+_ACTION_DELTA = np.array([ACTIONS[a] for a in range(len(ACTIONS))], dtype=np.int64)
+
+DEFAULT_TOL = 1e-12
+DEFAULT_MAX_ITER = 20_000
+DEFAULT_MAX_STATES = 3_000_000
+
+
+def state_to_arrays(state: Dict[str, Tuple[int, int]], captured: Optional[Dict[str, bool]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """{'hunter_0': (x, y), ...} 形式の状態を (1, 8), (1, 2) の配列にする"""
+    coords = np.array([[c for agent_id in STATE_ORDER for c in state[agent_id]]], dtype=np.int64)
+    captured = captured or {}
+    flags = np.array([[captured.get(AGENT_ID_PREY_0, False), captured.get(AGENT_ID_PREY_1, False)]], dtype=bool)
+    return coords, flags
+
+
+# --- バッチ方策 ---
+
+def _torus_delta(frm: np.ndarray, to: np.ndarray) -> np.ndarray:
+    """Lv0Agent._calculate_torus_distance と同じ規則の差分"""
+    d = to - frm
+    d = np.where(d > GRID_SIZE / 2, d - GRID_SIZE, d)
+    d = np.where(d < -GRID_SIZE / 2, d + GRID_SIZE, d)
+    return d
+
+
+def lv0_actions(my_xy: np.ndarray, target_xy: np.ndarray) -> np.ndarray:
+    """Lv0Agent.choose_action のバッチ版"""
+    d = _torus_delta(my_xy, target_xy)
+    dx, dy = d[:, 0], d[:, 1]
+    act = np.where(np.abs(dy) >= np.abs(dx), np.where(dy > 0, 2, 1), np.where(dx > 0, 4, 3))
+    act[(dx == 0) & (dy == 0)] = 0
+    return act
+
+
+def _manhattan(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    d = np.abs(a - b) % GRID_SIZE
+    return np.minimum(d, GRID_SIZE - d).sum(axis=-1)
+
+
+class SimplePolicy:
+    """Simple 制御（assign_targets で目標を決めて Lv0 で追う）のバッチ版"""
+
+    # Lv0 の目標がちょうど半周先のときを除く（ties）
+    translation_invariant = True
+
+    def __init__(self, method: str = TARGET_ASSIGNMENT_METHOD) -> None:
+        """method: assign_targets と同じ割り当て方法（"greedy" 以外はハンガリアン法）"""
+        self.method = method
+
+    def _target_xy(self, hunter_index: int, coords: np.ndarray, captured: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(ハンターの位置, 目標の獲物の位置)"""
+        h = (coords[:, 0:2], coords[:, 2:4])
+        p = (coords[:, 4:6], coords[:, 6:8])
+        free0 = ~captured[:, 0]
+        free1 = ~captured[:, 1]
+
+        # 両方未捕獲: assign_targets と同じコスト（距離 + 番号が違う組に _TIE_BREAK）で 2 x 2 を解く
+        c00 = _manhattan(h[0], p[0])
+        c01 = _manhattan(h[0], p[1]) + _TIE_BREAK
+        c10 = _manhattan(h[1], p[0]) + _TIE_BREAK
+        c11 = _manhattan(h[1], p[1])
+        if self.method == ASSIGNMENT_GREEDY:
+            # 最小コストの組を先に確定（同点は 00, 01, 10, 11 の順）。残りの組は自動的に決まる
+            first = np.argmin(np.stack([c00, c01, c10, c11], axis=1), axis=1)
+            keep = (first == 0) | (first == 3)
+        else:
+            # 合計が小さい組み合わせ（同点は hunter_i → prey_i）
+            keep = c00 + c11 <= c01 + c10
+        if hunter_index == 0:
+            both = np.where(keep, 0, 1)
+        else:
+            both = np.where(keep, 1, 0)
+
+        # 片方だけ未捕獲: 両ハンターともその獲物へ
+        # どちらも捕獲済み: select_lv0_target の従来規則（吸収状態なので実際には使われない）
+        fallback = 1 if hunter_index == 0 else 0
+        target = np.where(free0 & free1, both, np.where(free0, 0, np.where(free1, 1, fallback)))
+
+        target_xy = np.where(target[:, None] == 0, p[0], p[1])
+        return h[hunter_index], target_xy
+
+    def act(self, hunter_index: int, coords: np.ndarray, captured: np.ndarray) -> np.ndarray:
+        return lv0_actions(*self._target_xy(hunter_index, coords, captured))
+
+    def ties(self, hunter_index: int, coords: np.ndarray, captured: np.ndarray) -> np.ndarray:
+        """
+        Lv0 が向きを決める軸で、目標がちょうど半周先の状態（向きが絶対座標で決まり、平行移動で変わりうる）
+        """
+        d = _torus_delta(*self._target_xy(hunter_index, coords, captured))
+        dx, dy = np.abs(d[:, 0]), np.abs(d[:, 1])
+        half = GRID_SIZE / 2
+        return np.where(dy >= dx, dy == half, dx == half)
+
+
+def is_translation_invariant(compiled: Dict[str, np.ndarray]) -> bool:
+    """
+    q_compile_table の配列（最良行動とスコア）が、ハンターと獲物を同じだけずらしても変わらないか。
+    ハンターを原点に置いた部分 [0, 0] をトーラス上でずらした配列と全体を比べる。
+    """
+    g = GRID_SIZE
+    hx, hy, px, py = np.indices((g, g, g, g), sparse=True)
+    rel_x, rel_y = (px - hx) % g, (py - hy) % g
+    for name in ("action", "score"):
+        table = np.asarray(compiled[name]).reshape(g, g, g, g)
+        if not np.array_equal(table, table[0, 0][rel_x, rel_y]):
+            return False
+    return True
+
+
+class QPolicy:
+    """Lv0 (Q) 制御（Qテーブルの貪欲方策）のバッチ版"""
+
+    def __init__(self, q_table) -> None:
+        self.compiled = q_compile_table(q_table)
+        if self.compiled is None:
+            raise ValueError("Qテーブルが dict ではありません")
+        self.translation_invariant = is_translation_invariant(self.compiled)
+
+    def act(self, hunter_index: int, coords: np.ndarray, captured: np.ndarray) -> np.ndarray:
+        hunter_xy = coords[:, 2 * hunter_index:2 * hunter_index + 2]
+        positions = np.concatenate([hunter_xy, coords[:, 4:8]], axis=1)
+        actions, _ = q_choose_actions_batch(positions, captured, self.compiled)
+        # Qテーブルに無い状態は HeadlessSimulation と同じく停止
+        return np.where(actions < 0, 0, actions)
+
+
+def make_policy(control_mode: str, q_table=None):
+    """制御モードからバッチ方策を作る（Q モードでテーブルが無ければ get_agent_action と同じく Simple）"""
+    if control_mode == CONTROL_MODE_LV0_Q and isinstance(q_table, dict):
+        return QPolicy(q_table)
+    return SimplePolicy()
+
+
+# --- 評価器 ---
+
+class MarkovEvaluator:
+
+    def __init__(
+        self,
+        policy_h0,
+        policy_h1,
+        prey_move_enabled: bool = True,
+        prey_move_weights: Optional[Sequence[float]] = None,
+        use_symmetry: Optional[bool] = None,
+        max_states: int = DEFAULT_MAX_STATES,
+    ) -> None:
+        """
+        use_symmetry: 平行移動でまとめるか（None なら使う。False は確認用で、状態数が大きくなる）
+        max_states: 列挙する状態数の上限（超えたら RuntimeError。メモリを使い切らないため）
+        平行移動でまとめるのに、平行移動に対して不変でない方策があれば ValueError（列挙を始める前に止める）。
+        """
+        self.use_symmetry = True if use_symmetry is None else use_symmetry
+        for agent_id, policy in zip((AGENT_ID_HUNTER_0, AGENT_ID_HUNTER_1), (policy_h0, policy_h1)):
+            if self.use_symmetry and not getattr(policy, "translation_invariant", False):
+                raise ValueError(
+                    f"{agent_id} の方策は平行移動に対して不変ではありません"
+                    f"（Qテーブルの最良行動・スコアがハンターと獲物の相対位置だけで決まっていない）。"
+                    f"平行移動でまとめられないと状態数が GRID_SIZE^8 のオーダーになるため、厳密評価はできません。"
+                )
+        self.max_states = max_states
+        self.policies = (policy_h0, policy_h1)
+        self.prey_move_enabled = prey_move_enabled
+        weights = np.asarray(prey_move_weights if prey_move_weights is not None else PREY_MOVE_WEIGHTS, dtype=np.float64)
+        self.prey_move_probs = weights / weights.sum()
+
+        self.codes: Optional[np.ndarray] = None
+        self.src: Optional[np.ndarray] = None
+        self.dst: Optional[np.ndarray] = None
+        self.prob: Optional[np.ndarray] = None
+        # 遷移先ごとの遷移元（_can_reach の逆向き探索用。build で作る）
+        self.pred_src: Optional[np.ndarray] = None
+        self.pred_indptr: Optional[np.ndarray] = None
+
+    # --- 状態の正規化 ---
+
+    def _shift(self, coords: np.ndarray) -> np.ndarray:
+        """hunter_0 が原点に来るように全体を平行移動する（use_symmetry のときだけ）"""
+        coords = coords.copy()
+        if self.use_symmetry:
+            shift = coords[:, 0:2].copy()
+            for k in range(4):
+                coords[:, 2 * k:2 * k + 2] = (coords[:, 2 * k:2 * k + 2] - shift) % GRID_SIZE
+        return coords
+
+    def canonicalize(self, coords: np.ndarray, captured: np.ndarray) -> np.ndarray:
+        coords = self._shift(coords)
+        # 捕獲済みの獲物の位置は以後の動きに影響しない
+        coords[captured[:, 0], 4:6] = 0
+        coords[captured[:, 1], 6:8] = 0
+        return encode_states(coords, captured)
+
+    @staticmethod
+    def _check_capture(coords: np.ndarray, captured: np.ndarray) -> np.ndarray:
+        captured = captured.copy()
+        for k in range(2):
+            prey = coords[:, 4 + 2 * k:6 + 2 * k]
+            hit = np.all(prey == coords[:, 0:2], axis=1) | np.all(prey == coords[:, 2:4], axis=1)
+            captured[:, k] |= hit
+        return captured
+
+    def _transitions(self, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        状態コードの配列から、(遷移元の添字, 遷移先の状態コード, 確率) を返す。
+        """
+        coords, captured = decode_states(codes)
+        n = len(codes)
+
+        a0 = self.policies[0].act(0, coords, captured)
+        a1 = self.policies[1].act(1, coords, captured)
+        moved = coords.copy()
+        moved[:, 0:2] = (moved[:, 0:2] + _ACTION_DELTA[a0]) % GRID_SIZE
+        moved[:, 2:4] = (moved[:, 2:4] + _ACTION_DELTA[a1]) % GRID_SIZE
+        cap = self._check_capture(moved, captured)
+
+        if not self.prey_move_enabled:
+            return np.arange(n), self.canonicalize(moved, cap), np.ones(n)
+
+        # 平行移動の量は移動後の hunter_0 で決まり、獲物の移動では変わらないので先にずらしておき、
+        # 状態コードを「ハンターの部分 | prey_0 の部分 | prey_1 の部分」の OR で組み立てる
+        moved = self._shift(moved)
+        hunters = np.zeros(n, dtype=np.int64)
+        for i in range(4):
+            hunters |= moved[:, i] << (COORD_BITS * i)
+
+        parts, probs = [], []
+        for k in range(2):
+            xy = moved[:, 4 + 2 * k:6 + 2 * k]
+            free = ~cap[:, k]
+            part = np.empty((n, len(PREY_MOVE_ACTIONS)), dtype=np.int64)
+            prob = np.empty((n, len(PREY_MOVE_ACTIONS)))
+            for i, action in enumerate(PREY_MOVE_ACTIONS):
+                nxt = (xy + _ACTION_DELTA[action]) % GRID_SIZE
+                hit = np.all(nxt == moved[:, 0:2], axis=1) | np.all(nxt == moved[:, 2:4], axis=1)
+                code = (nxt[:, 0] << (COORD_BITS * (4 + 2 * k))) | (nxt[:, 1] << (COORD_BITS * (5 + 2 * k)))
+                # 捕獲済みの獲物は位置を原点にそろえて捕獲フラグだけ立てる（canonicalize と同じ）
+                part[:, i] = np.where(free & ~hit, code, CAPTURE_BITS[k])
+                # 捕獲済みの獲物は動かない（確率1で停止）
+                prob[:, i] = np.where(free, self.prey_move_probs[i], 1.0 if i == 0 else 0.0)
+            parts.append(part)
+            probs.append(prob)
+
+        dst = hunters[:, None, None] | parts[0][:, :, None] | parts[1][:, None, :]
+        pr = probs[0][:, :, None] * probs[1][:, None, :]
+        keep = pr > 0
+        return np.nonzero(keep)[0], dst[keep], pr[keep]
+
+    @staticmethod
+    def _absorbing(codes: np.ndarray) -> np.ndarray:
+        return ((codes >> CAPTURE_SHIFT) & 3) == 3
+
+    def build(self, start_codes: np.ndarray, verbose: bool = False) -> None:
+        """開始状態から到達可能な全状態と遷移を列挙する"""
+        known = np.unique(start_codes)
+        frontier = known
+        src_parts, dst_parts, prob_parts = [], [], []
+        layer = 0
+        while len(frontier):
+            active = frontier[~self._absorbing(frontier)]
+            if len(active):
+                s, d, p = self._transitions(active)
+                src_parts.append(active[s])
+                dst_parts.append(d)
+                prob_parts.append(p)
+                # known はソート済みなので、所属判定と挿入は searchsorted で行う（union1d より速い）
+                d = np.unique(d)
+                pos = np.searchsorted(known, d)
+                seen = pos < len(known)
+                seen[seen] = known[pos[seen]] == d[seen]
+                new = d[~seen]
+                known = np.insert(known, pos[~seen], new)
+            else:
+                new = np.empty(0, dtype=np.int64)
+            frontier = new
+            layer += 1
+            if len(known) > self.max_states:
+                raise RuntimeError(
+                    f"到達可能な状態数が上限 {self.max_states} を超えました（layer {layer}, {len(known)} 状態）"
+                )
+            if verbose:
+                print(f"  layer {layer}: +{len(new)} states (total {len(known)})")
+
+        self.codes = known
+        src_codes = np.concatenate(src_parts) if src_parts else np.empty(0, dtype=np.int64)
+        dst_codes = np.concatenate(dst_parts) if dst_parts else np.empty(0, dtype=np.int64)
+        prob = np.concatenate(prob_parts) if prob_parts else np.empty(0)
+        # 遷移元の順に並べる（P x の np.bincount が連続した書き込みになって速い）
+        src = np.searchsorted(known, src_codes)
+        order = np.argsort(src, kind="stable")
+        self.src = src[order]
+        self.dst = np.searchsorted(known, dst_codes[order])
+        self.prob = prob[order]
+
+        order = np.argsort(self.dst, kind="stable")
+        self.pred_src = self.src[order]
+        self.pred_indptr = np.concatenate([[0], np.cumsum(np.bincount(self.dst, minlength=len(known)))])
+
+    # --- 連立方程式 ---
+
+    def _iterate(self, b: np.ndarray, solve_mask: np.ndarray, edge_mask: np.ndarray,
+                 tol: float, max_iter: int) -> Tuple[np.ndarray, bool]:
+        """
+        (I - P) x = b を solve_mask の状態について解く（それ以外は 0 固定）。
+        BiCGSTAB（P x は np.bincount）で解き、破綻した・収束しなかったら x ← b + P x の反復で解き直す。
+        戻り値: (x, 収束したか)
+        """
+        # solve_mask の外の状態は 0 に固定するので、solve_mask の状態だけの連立方程式に詰めて解く
+        # （片方捕獲済みの状態だけを解くときなどに、全状態の長さのベクトルを扱わない）
+        states = np.flatnonzero(solve_mask)
+        local = np.full(len(self.codes), -1, dtype=np.int64)
+        local[states] = np.arange(len(states))
+        keep = edge_mask & solve_mask[self.src] & solve_mask[self.dst]
+        src, dst, prob = local[self.src[keep]], local[self.dst[keep]], self.prob[keep]
+        n = len(states)
+        b = b[states].astype(np.float64)
+        buf = np.empty(len(dst))
+
+        def step(v: np.ndarray) -> np.ndarray:
+            """P v（辺ごとの値は buf に書いて、呼ぶたびに配列を確保しない）"""
+            np.take(v, dst, out=buf)
+            np.multiply(buf, prob, out=buf)
+            return np.bincount(src, weights=buf, minlength=n)
+
+        def matvec(v: np.ndarray) -> np.ndarray:
+            return v - step(v)
+
+        def small(r: np.ndarray, x: np.ndarray) -> bool:
+            return n == 0 or np.max(np.abs(r)) <= tol * max(1.0, float(np.max(np.abs(x))))
+
+        def full(x: np.ndarray) -> np.ndarray:
+            out = np.zeros(len(self.codes))
+            out[states] = x
+            return out
+
+        x = b.copy()
+        r = b - matvec(x)
+        r_hat = r.copy()
+        rho = alpha = omega = 1.0
+        v = np.zeros(n)
+        p = np.zeros(n)
+        for _ in range(max_iter):
+            if small(r, x):
+                break
+            rho_new = float(r_hat @ r)
+            if rho_new == 0.0 or omega == 0.0:
+                break
+            p = r + (rho_new / rho) * (alpha / omega) * (p - omega * v)
+            v = matvec(p)
+            denom = float(r_hat @ v)
+            if denom == 0.0:
+                break
+            alpha = rho_new / denom
+            s = r - alpha * v
+            if small(s, x):
+                x = x + alpha * p
+                break
+            t = matvec(s)
+            tt = float(t @ t)
+            if tt == 0.0:
+                break
+            omega = float(t @ s) / tt
+            x = x + alpha * p + omega * s
+            r = s - omega * t
+            rho = rho_new
+
+        # 漸化式で更新した残差は、破綻しかけると実際の残差から大きくずれる（決定論的な鎖など）ので、
+        # 実際の残差で確かめる
+        if np.all(np.isfinite(x)) and small(b - matvec(x), x):
+            return full(x), True
+
+        # 収束しなかった・破綻したときは単純な反復で解き直す
+        x = b.copy()
+        for _ in range(max_iter):
+            nxt = b + step(x)
+            done = small(nxt - x, nxt)
+            x = nxt
+            if done:
+                return full(x), True
+        return full(x), False
+
+    def _can_reach(self, targets: np.ndarray, allowed: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        targets に到達できる状態（逆向きの幅優先探索）。
+        allowed を渡すと、その状態からの辺だけを使う（途中の状態も allowed に限る）。
+        """
+        n = len(self.codes)
+        indptr = self.pred_indptr
+        reach = targets.copy()
+        frontier = np.flatnonzero(targets)
+        while len(frontier):
+            lo, counts = indptr[frontier], indptr[frontier + 1] - indptr[frontier]
+            starts = np.repeat(lo - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+            found = np.zeros(n, dtype=bool)
+            found[self.pred_src[starts + np.arange(counts.sum())]] = True
+            found &= ~reach
+            if allowed is not None:
+                found &= allowed
+            reach |= found
+            frontier = np.flatnonzero(found)
+        return reach
+
+    def solve(self, tol: float = DEFAULT_TOL, max_iter: int = DEFAULT_MAX_ITER) -> Dict[str, np.ndarray]:
+        """
+        build 済みの全状態について期待値・確率を解く。
+        戻り値の配列は self.codes と同じ並び。
+        """
+        codes = self.codes
+        n = len(codes)
+        flags = (codes >> CAPTURE_SHIFT) & 3
+        absorbing = flags == 3
+        phase0 = flags == 0
+        all_edges = np.ones(len(self.src), dtype=bool)
+        # 両方未捕獲の状態の中だけで遷移する辺
+        inner = phase0[self.src] & phase0[self.dst]
+        exits = phase0[self.src] & ~phase0[self.dst]
+
+        # 全捕獲に確率1で到達する状態だけ期待値が有限
+        reach_abs = self._can_reach(absorbing)
+        trapped = ~reach_abs
+        risky = self._can_reach(trapped) if trapped.any() else trapped
+        finite = ~risky & ~absorbing
+
+        # 全捕獲まで: 片方捕獲済みの状態を先に解き、両方未捕獲の状態はそこへ抜けたときの値を b に足して解く
+        steps_all, ok_single = self._iterate(np.ones(n), finite & ~phase0, all_edges, tol, max_iter)
+        b = 1.0 + np.bincount(self.src[exits], weights=self.prob[exits] * steps_all[self.dst[exits]], minlength=n)
+        steps_phase0, ok_phase0 = self._iterate(b, finite & phase0, inner, tol, max_iter)
+        steps_all = np.where(phase0, steps_phase0, steps_all)
+        steps_all[risky] = np.inf
+
+        # 最初の捕獲まで
+        reach_first = self._can_reach(~phase0, allowed=phase0)
+        trapped0 = phase0 & ~reach_first
+        risky0 = self._can_reach(trapped0, allowed=phase0) if trapped0.any() else trapped0
+        finite0 = phase0 & ~risky0
+        steps_first, ok_first = self._iterate(np.ones(n), finite0, inner, tol, max_iter)
+        steps_first[phase0 & risky0] = np.inf
+
+        # 捕獲順序の確率: 両方未捕獲 → (1,0) / (0,1) / (1,1) のどれに最初に抜けるか
+        order_probs = {}
+        converged = ok_single and ok_phase0 and ok_first
+        for name, flag in (("prey_0_first", 1), ("prey_1_first", 2), ("simultaneous", 3)):
+            if flag == 3 and not trapped0.any():
+                # どの状態も確率1で最初の捕獲に至るので、3つの確率の和は1
+                order_probs[name] = np.where(
+                    phase0, np.maximum(1.0 - order_probs["prey_0_first"] - order_probs["prey_1_first"], 0.0), 0.0
+                )
+                continue
+            exit_edges = exits & (flags[self.dst] == flag)
+            b = np.bincount(self.src[exit_edges], weights=self.prob[exit_edges], minlength=n)
+            probs, ok = self._iterate(b, phase0, inner, tol, max_iter)
+            order_probs[name] = probs
+            converged = converged and ok
+
+        return {
+            "expected_steps_all": steps_all,
+            "expected_steps_first": steps_first,
+            **order_probs,
+            "converged": converged,
+        }
+
+    # --- まとめ ---
+
+    def count_ties(self) -> int:
+        """
+        build 済みの状態のうち、平行移動でまとめたために Lv0 の向きが実際と変わりうる状態の数
+        （平行移動でまとめていなければ 0）
+        """
+        if not self.use_symmetry:
+            return 0
+        codes = self.codes[~self._absorbing(self.codes)]
+        coords, captured = decode_states(codes)
+        tied = np.zeros(len(codes), dtype=bool)
+        for index, policy in enumerate(self.policies):
+            if hasattr(policy, "ties"):
+                tied |= policy.ties(index, coords, captured)
+        return int(tied.sum())
+
+    def evaluate(self, starts: List[Dict[str, Tuple[int, int]]], tol: float = DEFAULT_TOL,
+                 max_iter: int = DEFAULT_MAX_ITER, verbose: bool = False) -> List[Dict[str, float]]:
+        """
+        開始状態（{'hunter_0': (x, y), ...}、捕獲なし）のリストについて結果を返す。
+        tie_states が 0 でなければ、Lv0 の半周先の向きの分だけシミュレーションとずれうる（count_ties）。
+        """
+        arrays = [state_to_arrays(s) for s in starts]
+        coords = np.concatenate([a[0] for a in arrays])
+        captured = np.concatenate([a[1] for a in arrays])
+        start_codes = self.canonicalize(coords, captured)
+
+        self.build(start_codes, verbose=verbose)
+        solution = self.solve(tol, max_iter)
+        ties = self.count_ties()
+        idx = np.searchsorted(self.codes, start_codes)
+
+        results = []
+        for i in idx:
+            results.append({
+                "expected_steps_all": float(solution["expected_steps_all"][i]),
+                "expected_steps_first": float(solution["expected_steps_first"][i]),
+                "prey_0_first": float(solution["prey_0_first"][i]),
+                "prey_1_first": float(solution["prey_1_first"][i]),
+                "simultaneous": float(solution["simultaneous"][i]),
+                "converged": solution["converged"],
+                "tie_states": ties,
+            })
+        return results
+
+
+def _monte_carlo(control_h0: str, control_h1: str, q_tables: Dict[str, object], prey_move_enabled: bool,
+                 episodes: int, max_steps: int, seed: int) -> Dict[str, float]:
+    """比較用のモンテカルロ推定（HeadlessSimulation）"""
+    from src.headless import HeadlessSimulation
+
+    sim = HeadlessSimulation(control_h0, control_h1, q_tables=q_tables, prey_move_enabled=prey_move_enabled, seed=seed)
+    total = 0
+    first0 = first1 = both = 0
+    for _ in range(episodes):
+        sim.reset()
+        order = None
+        while not sim.done and sim.step_count < max_steps:
+            sim.step()
+            if order is None and (sim.captured[AGENT_ID_PREY_0] or sim.captured[AGENT_ID_PREY_1]):
+                order = (sim.captured[AGENT_ID_PREY_0], sim.captured[AGENT_ID_PREY_1])
+        total += sim.step_count
+        if order == (True, False):
+            first0 += 1
+        elif order == (False, True):
+            first1 += 1
+        elif order == (True, True):
+            both += 1
+    return {
+        "expected_steps_all": total / episodes,
+        "prey_0_first": first0 / episodes,
+        "prey_1_first": first1 / episodes,
+        "simultaneous": both / episodes,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="マルコフ連鎖として期待捕獲時間・捕獲順序の確率を厳密に解く")
+    parser.add_argument("--control-h0", default=CONTROL_MODE_SIMPLE, choices=[CONTROL_MODE_SIMPLE, CONTROL_MODE_LV0_Q])
+    parser.add_argument("--control-h1", default=CONTROL_MODE_SIMPLE, choices=[CONTROL_MODE_SIMPLE, CONTROL_MODE_LV0_Q])
+    parser.add_argument("--q-table-h0", default=DEFAULT_Q_TABLE_PATHS[AGENT_ID_HUNTER_0])
+    parser.add_argument("--q-table-h1", default=DEFAULT_Q_TABLE_PATHS[AGENT_ID_HUNTER_1])
+    parser.add_argument("--start", default=None, help="開始状態 'h0x,h0y,h1x,h1y,p0x,p0y,p1x,p1y'（省略時は環境の初期配置）")
+    parser.add_argument("--no-prey-move", action="store_true", help="獲物を動かさない")
+    parser.add_argument("--tol", type=float, default=DEFAULT_TOL)
+    parser.add_argument("--max-iter", type=int, default=DEFAULT_MAX_ITER, help="反復回数の上限")
+    parser.add_argument("--max-states", type=int, default=DEFAULT_MAX_STATES, help="列挙する状態数の上限")
+    parser.add_argument("--check-mc", type=int, default=0, help="比較用にモンテカルロを N エピソード実行する")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    from src.headless import load_q_table_file
+
+    q_tables = {}
+    if args.control_h0 == CONTROL_MODE_LV0_Q:
+        q_tables[AGENT_ID_HUNTER_0] = load_q_table_file(args.q_table_h0)
+    if args.control_h1 == CONTROL_MODE_LV0_Q:
+        q_tables[AGENT_ID_HUNTER_1] = load_q_table_file(args.q_table_h1)
+
+    if args.start:
+        v = [int(c) for c in args.start.split(",")]
+        start = {agent_id: (v[2 * i], v[2 * i + 1]) for i, agent_id in enumerate(STATE_ORDER)}
+    else:
+        start = dict(HunterTaskEnv().reset())
+
+    evaluator = MarkovEvaluator(
+        make_policy(args.control_h0, q_tables.get(AGENT_ID_HUNTER_0)),
+        make_policy(args.control_h1, q_tables.get(AGENT_ID_HUNTER_1)),
+        prey_move_enabled=not args.no_prey_move,
+        max_states=args.max_states,
+    )
+
+    t0 = time.perf_counter()
+    result = evaluator.evaluate([start], tol=args.tol, max_iter=args.max_iter, verbose=args.verbose)[0]
+    elapsed = time.perf_counter() - t0
+
+    print(f"\n--- 厳密評価 ({args.control_h0} / {args.control_h1}) ---")
+    print(f"start: {start}")
+    print(f"states={len(evaluator.codes)} transitions={len(evaluator.src)} "
+          f"symmetry={'on' if evaluator.use_symmetry else 'off'} ({elapsed:.2f}s)")
+    converged = result.pop("converged")
+    ties = result.pop("tie_states")
+    for key, value in result.items():
+        print(f"{key}: {value:.6f}")
+    if not converged:
+        print("注意: 反復が上限内に収束しませんでした（値は下限の近似です）。--max-iter を増やしてください。")
+    if ties:
+        print(f"注意: Lv0 の目標がちょうど半周先になる状態が {ties} 個あります。その向きは実際には絶対座標で決まりますが、"
+              f"ここでは hunter_0 を原点にした座標で決めているため、値はシミュレーションと少しずれます。")
+
+    if args.check_mc:
+        mc = _monte_carlo(args.control_h0, args.control_h1, q_tables, not args.no_prey_move,
+                          args.check_mc, max_steps=10_000, seed=0)
+        print(f"\n--- モンテカルロ ({args.check_mc} エピソード) ---")
+        for key, value in mc.items():
+            print(f"{key}: {value:.6f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+1体のハンター対1体の獲物について、最適なQ値を価値反復（動的計画法）で求めるモジュール。
+
+主な機能：
+1. 遷移と報酬は q_trainer と同じ（ハンター移動 → 捕獲判定 → 獲物移動(move_prey の確率) → 捕獲判定、
+   捕獲で REWARD_CAPTURE を得て終了、割引率 gamma）。
+2. トーラス上では価値がハンターから見た獲物の相対位置 (px - hx, py - hy) だけで決まるので、
+   (GRID_SIZE, GRID_SIZE) の配列を np.roll でずらしてベルマン更新を一括で行う（状態ごとのループなし）。
+3. 結果を全状態 (hx, hy, px, py) に展開し、QLearningAgent が読む形式
+   {(hx, hy, px, py): {"UP": q, "DOWN": q, "LEFT": q, "RIGHT": q, "STAY": q}} の pickle で出力する。
+4. 学習済みテーブルとの比較（Q値の誤差・貪欲行動の一致率）で、サンプリングによる学習の収束を確認できる。
+
+使い方
+- python -m src.planning.value_iteration --output q_table_vi.pkl
+- python -m src.planning.value_iteration --output q_table_vi.pkl --compare q_table.pkl
+"""
+
+import argparse
+import pickle
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.env.game_env import ACTIONS, GRID_SIZE
+from src.training.q_trainer import ACTION_LABELS, DEFAULT_GAMMA, REWARD_CAPTURE
+from src.agents.q_utils import ACTION_LABEL_TO_ID
+from src.config import PREY_MOVE_ACTIONS, PREY_MOVE_WEIGHTS
+
+DEFAULT_TOL = 1e-10
+DEFAULT_MAX_ITER = 10_000
+
+# ACTION_LABELS の並びに対応する移動量
+_LABEL_DELTAS = [ACTIONS[ACTION_LABEL_TO_ID[label]] for label in ACTION_LABELS]
+
+
+def solve_relative_q(
+    gamma: float = DEFAULT_GAMMA,
+    prey_move_weights: Optional[Sequence[float]] = None,
+    tol: float = DEFAULT_TOL,
+    max_iter: int = DEFAULT_MAX_ITER,
+) -> Tuple[np.ndarray, int]:
+    """
+    相対位置 (dx, dy) = (px - hx, py - hy) mod GRID_SIZE ごとの最適Q値を求める。
+    戻り値: (Q 配列 (GRID_SIZE, GRID_SIZE, len(ACTION_LABELS)), 反復回数)
+    """
+    weights = np.asarray(prey_move_weights if prey_move_weights is not None else PREY_MOVE_WEIGHTS, dtype=np.float64)
+    probs = weights / weights.sum()
+    prey_deltas = [ACTIONS[a] for a in PREY_MOVE_ACTIONS]
+
+    v = np.zeros((GRID_SIZE, GRID_SIZE))
+    q = np.zeros((GRID_SIZE, GRID_SIZE, len(ACTION_LABELS)))
+    for it in range(1, max_iter + 1):
+        # 獲物が動いた後の相対位置 d2 の価値（重なれば捕獲）
+        after_prey = gamma * v
+        after_prey[0, 0] = REWARD_CAPTURE
+
+        # ハンターが動いた後の相対位置 d1 の価値 = 獲物の移動について期待値（d1 = 0 なら移動前に捕獲）
+        after_hunter = np.zeros_like(v)
+        for p, (mx, my) in zip(probs, prey_deltas):
+            # after_hunter[d1] += p * after_prey[d1 + m]
+            after_hunter += p * np.roll(after_prey, shift=(-mx, -my), axis=(0, 1))
+        after_hunter[0, 0] = REWARD_CAPTURE
+
+        # Q(d, a) = after_hunter[d - m_a]
+        for i, (mx, my) in enumerate(_LABEL_DELTAS):
+            q[:, :, i] = np.roll(after_hunter, shift=(mx, my), axis=(0, 1))
+
+        new_v = q.max(axis=2)
+        delta = float(np.max(np.abs(new_v - v)))
+        v = new_v
+        if delta < tol:
+            return q, it
+    return q, max_iter
+
+
+def expand_q(q_rel: np.ndarray) -> np.ndarray:
+    """相対位置のQ値を全状態 (hx, hy, px, py, action) の配列に展開する"""
+    g = np.arange(GRID_SIZE)
+    dx = (g[None, :] - g[:, None]) % GRID_SIZE  # [hx, px]
+    return q_rel[dx[:, None, :, None], dx[None, :, None, :]]
+
+
+def to_q_table(q_full: np.ndarray) -> Dict[Tuple[int, int, int, int], Dict[str, float]]:
+    """全状態の配列を QLearningAgent 形式の dict に変換する"""
+    keys = np.indices((GRID_SIZE,) * 4).reshape(4, -1).T.tolist()
+    values = q_full.reshape(-1, len(ACTION_LABELS)).tolist()
+    return {tuple(key): dict(zip(ACTION_LABELS, row)) for key, row in zip(keys, values)}
+
+
+def compare_tables(reference: np.ndarray, q_table: Dict[Any, Dict[str, float]]) -> Dict[str, float]:
+    """
+    学習済みテーブルを参照解（全状態の配列）と比べる。
+    テーブルにある状態だけを対象に、Q値の誤差と貪欲行動の一致率を返す。
+    """
+    keys = [key for key in q_table if isinstance(key, tuple) and len(key) == 4]
+    if not keys:
+        return {"states": 0, "max_abs_error": float("nan"), "mean_abs_error": float("nan"), "greedy_agreement": float("nan")}
+
+    idx = np.array(keys, dtype=np.int64) % GRID_SIZE
+    learned = np.array([[q_table[key].get(label, -np.inf) for label in ACTION_LABELS] for key in keys])
+    ref = reference[idx[:, 0], idx[:, 1], idx[:, 2], idx[:, 3]]
+
+    finite = np.isfinite(learned)
+    err = np.abs(np.where(finite, learned, 0.0) - ref)[finite]
+    # 最適行動が複数あるときは、そのどれかを選んでいれば一致とみなす
+    best_ref = ref.max(axis=1)
+    chosen = learned.argmax(axis=1)
+    agree = np.isclose(ref[np.arange(len(keys)), chosen], best_ref, rtol=0.0, atol=1e-9)
+    return {
+        "states": len(keys),
+        "max_abs_error": float(err.max()) if err.size else float("nan"),
+        "mean_abs_error": float(err.mean()) if err.size else float("nan"),
+        "greedy_agreement": float(agree.mean()),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="価値反復で1ハンター対1獲物の最適Qテーブルを作る")
+    parser.add_argument("--output", default="q_table_vi.pkl", help="Qテーブルの出力先")
+    parser.add_argument("--gamma", type=float, default=DEFAULT_GAMMA)
+    parser.add_argument("--prey-move-weights", type=float, nargs=len(PREY_MOVE_ACTIONS), default=None,
+                        help="PREY_MOVE_ACTIONS（停止, 上, 右）に対応する重み")
+    parser.add_argument("--tol", type=float, default=DEFAULT_TOL)
+    parser.add_argument("--compare", default=None, help="比較する学習済みQテーブル")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    q_rel, iterations = solve_relative_q(args.gamma, args.prey_move_weights, args.tol)
+    q_full = expand_q(q_rel)
+    solved = time.perf_counter() - t0
+
+    q_table = to_q_table(q_full)
+    with open(args.output, "wb") as f:
+        pickle.dump(q_table, f, protocol=pickle.HIGHEST_PROTOCOL)
+    print(f"価値反復: {iterations} 回で収束 ({solved:.3f}s), states={len(q_table)} -> {args.output}")
+
+    if args.compare:
+        with open(args.compare, "rb") as f:
+            learned = pickle.load(f)
+        stats = compare_tables(q_full, learned)
+        print(f"\n--- {args.compare} との比較 ---")
+        for key, value in stats.items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
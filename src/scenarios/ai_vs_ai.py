@@ -4,7 +4,8 @@ AI vs AI モードの実行ロジック。
 
 import streamlit as st
 from src.config import AGENT_ID_HUNTER_0, AGENT_ID_HUNTER_1
-from src.game_logic import check_capture, move_prey, get_agent_action, log_step
+from src.game_logic import check_capture, move_prey, finish_log_step, get_agent_action, log_step, observe_partner_actions
+from src.ui.fragments import rerun_simulation
 
 def run_ai_vs_ai_step(control_h0: str, control_h1: str, debug_info_h0: bool, debug_info_h1: bool, prey_move_enabled: bool):
     """
@@ -19,6 +20,13 @@ def run_ai_vs_ai_step(control_h0: str, control_h1: str, debug_info_h0: bool, deb
     # Hunter 1 Action
     action_1 = get_agent_action(AGENT_ID_HUNTER_1, control_h1, current_state, debug_info_h1)
 
+    # Lv1 エージェントの信念更新（移動前の状態で観測する）
+    observe_partner_actions(
+        current_state,
+        {AGENT_ID_HUNTER_0: action_0, AGENT_ID_HUNTER_1: action_1},
+        {AGENT_ID_HUNTER_0: control_h0, AGENT_ID_HUNTER_1: control_h1},
+    )
+
     # 実行
     st.session_state.env.step(agent_id=AGENT_ID_HUNTER_0, action_id=action_0)
     st.session_state.last_actions[AGENT_ID_HUNTER_0] = action_0
@@ -27,8 +35,9 @@ def run_ai_vs_ai_step(control_h0: str, control_h1: str, debug_info_h0: bool, deb
     st.session_state.last_actions[AGENT_ID_HUNTER_1] = action_1
     
     # ログ記録
-    log_step(action_0, action_1)
+    record = log_step(action_0, action_1)
     
     check_capture()
     move_prey(prey_move_enabled)
-    st.rerun()
+    finish_log_step(record)
+    rerun_simulation()
@@ -0,0 +1,131 @@
+"""
+AI vs AI モードのライブ再生（バックグラウンド実行 + フレーム再生）のUIロジック。
+
+- シミュレーションは SimulationWorker のスレッドが先に進め、ここでは再生速度に合わせてフレームを取り出して描画するだけ。
+- 一時停止中は1フレーム進む/戻る、保持しているフレームのシークができる。
+- 新しく取り出したフレームのログはセッションのログ（history）に追記する。
+"""
+
+from typing import Optional
+
+import streamlit as st
+from src.ui.components import draw_grid_html
+from src.ui.heatmap_overlay import heatmap_overlay
+from src.simulation_worker import SimulationWorker
+from src.agents.q_reload import get_q_table_store
+from src.game_logic import sync_q_agents
+from src.env import state_code
+
+# 1フレーム進むボタンで、ワーカーのフレームを待つ時間（秒）
+_STEP_WAIT = 1.0
+
+
+def _worker_key(control_h0: str, control_h1: str, prey_move_enabled: bool):
+    # ファイルの更新によるテーブルの差し替えはワーカーのエージェントにも届くので、
+    # 作り直すのは使うファイルが変わったときと、読み込みが終わってQテーブルが使えるようになったときだけ
+    paths = st.session_state.get('q_table_paths', {})
+    loaded = tuple(table is not None for table in st.session_state.q_tables.values())
+    return (control_h0, control_h1, prey_move_enabled, tuple(sorted(paths.items())), loaded)
+
+
+def stop_live_worker():
+    """ライブ再生のワーカーを止めて破棄する"""
+    worker: Optional[SimulationWorker] = st.session_state.get('live_worker')
+    if worker is not None:
+        worker.stop(timeout=0)
+    st.session_state.live_worker = None
+    st.session_state.live_worker_key = None
+
+
+def _get_live_worker(control_h0: str, control_h1: str, prey_move_enabled: bool) -> SimulationWorker:
+    """設定が変わっていなければ既存のワーカーを使い、変わっていれば作り直す"""
+    key = _worker_key(control_h0, control_h1, prey_move_enabled)
+    worker: Optional[SimulationWorker] = st.session_state.get('live_worker')
+    if worker is None or st.session_state.get('live_worker_key') != key:
+        stop_live_worker()
+        worker = SimulationWorker(
+            control_h0,
+            control_h1,
+            q_tables=dict(st.session_state.q_tables),
+            prey_move_enabled=prey_move_enabled,
+        )
+        store = get_q_table_store()
+        paths = st.session_state.get('q_table_paths', {})
+        for hunter_id, agent in worker.q_agents.items():
+            if agent is not None and paths.get(hunter_id):
+                store.register(paths[hunter_id], agent)
+        st.session_state.live_worker = worker
+        st.session_state.live_worker_key = key
+    return worker
+
+
+def _live_view(game_mode: str, control_h0: str, control_h1: str, prey_move_enabled: bool, heatmap_layer):
+    sync_q_agents()
+    worker = _get_live_worker(control_h0, control_h1, prey_move_enabled)
+    paused = st.session_state.live_paused
+
+    # グリッドは操作の結果を反映してから描くので、場所だけ先に確保する
+    grid_area = st.container()
+
+    c_play, c_back, c_next, c_restart = st.columns(4)
+    with c_play:
+        if st.button("▶ 再生" if paused else "⏸ 一時停止"):
+            # 自動再生の間隔（run_every）を変えるため、全体を再実行する
+            st.session_state.live_paused = not paused
+            st.rerun()
+    with c_back:
+        back = st.button("◀ 1フレーム戻る", disabled=not paused)
+    with c_next:
+        step = st.button("1フレーム進む ▶", disabled=not paused)
+    with c_restart:
+        if st.button("最初から"):
+            stop_live_worker()
+            st.rerun()
+
+    new_frames = []
+    if back:
+        worker.back()
+    elif step:
+        new_frames = worker.advance(timeout=_STEP_WAIT)
+    elif not paused:
+        new_frames = worker.advance()
+
+    for frame in new_frames:
+        if frame["record"] is not None:
+            st.session_state.history.append(frame["record"])
+
+    if paused and len(worker.buffer) > 1:
+        index = st.slider("シーク（保持しているフレーム）", 0, len(worker.buffer) - 1, worker.cursor)
+        if index != worker.cursor:
+            worker.seek(index)
+
+    if worker.status["error"] is not None:
+        st.error(f"シミュレーションでエラーが発生しました: {worker.status['error']}")
+
+    frame = worker.current
+    with grid_area:
+        if frame is None:
+            st.info("シミュレーションを準備しています...")
+            return
+        draw_grid_html(state_code.decode_state(frame["state"]), game_mode, frame["last_actions"], heatmap_overlay(heatmap_layer))
+
+    captured_p0, captured_p1 = state_code.captured_flags(frame["state"])
+    st.header(f"エピソード {frame['episode'] + 1} / ステップ: {frame['step']}")
+    st.caption(
+        f"獲物移動: {'ON' if prey_move_enabled else 'OFF'}"
+        f" | 捕獲: prey_0={'済' if captured_p0 else '未'}"
+        f" / prey_1={'済' if captured_p1 else '未'}"
+        f" | 先読み {worker.pending} フレーム / 保持 {len(worker.buffer)} フレーム"
+    )
+
+
+def render_live_view(game_mode: str, control_h0: str, control_h1: str, prey_move_enabled: bool, fps: int, heatmap_layer=None):
+    """
+    ライブ再生の画面を描画する。
+    再生中は 1/fps 秒ごとにこの部分（フラグメント）だけが再実行され、1フレームずつ進む。
+    """
+    if 'live_paused' not in st.session_state:
+        st.session_state.live_paused = False
+
+    run_every = None if st.session_state.live_paused else 1.0 / fps
+    st.fragment(run_every=run_every)(_live_view)(game_mode, control_h0, control_h1, prey_move_enabled, heatmap_layer)
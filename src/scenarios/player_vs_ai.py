@@ -4,8 +4,9 @@ Player vs AI モードの実行ロジック。
 
 import streamlit as st
 import time
-from src.config import AGENT_ID_HUNTER_0, AGENT_ID_HUNTER_1
-from src.game_logic import check_capture, move_prey, get_agent_action, log_step
+from src.config import AGENT_ID_HUNTER_0, AGENT_ID_HUNTER_1, CONTROL_MODE_MANUAL
+from src.game_logic import check_capture, move_prey, finish_log_step, get_agent_action, log_step, observe_partner_actions
+from src.ui.fragments import rerun_simulation
 
 def run_player_turn():
     """
@@ -15,6 +16,7 @@ def run_player_turn():
     
     # プレイヤーの行動を実行
     action_0 = st.session_state.manual_action_hunter_0
+    observe_partner_actions(st.session_state.env.get_state(), {AGENT_ID_HUNTER_0: action_0}, {AGENT_ID_HUNTER_0: CONTROL_MODE_MANUAL})
     st.session_state.env.step(agent_id=AGENT_ID_HUNTER_0, action_id=action_0)
     st.session_state.last_actions[AGENT_ID_HUNTER_0] = action_0
     
@@ -22,7 +24,7 @@ def run_player_turn():
     
     # フェーズをAIに移行してリロード
     st.session_state.turn_phase = 'ai'
-    st.rerun()
+    rerun_simulation()
 
 def run_ai_turn(control_h1: str, debug_info_h1: bool, prey_move_enabled: bool):
     """
@@ -35,6 +37,7 @@ def run_ai_turn(control_h1: str, debug_info_h1: bool, prey_move_enabled: bool):
     
     # Hunter 1 Action
     action_1 = get_agent_action(AGENT_ID_HUNTER_1, control_h1, current_state, debug_info_h1)
+    observe_partner_actions(current_state, {AGENT_ID_HUNTER_1: action_1}, {AGENT_ID_HUNTER_1: control_h1})
         
     st.session_state.env.step(agent_id=AGENT_ID_HUNTER_1, action_id=action_1)
     st.session_state.last_actions[AGENT_ID_HUNTER_1] = action_1
@@ -43,11 +46,12 @@ def run_ai_turn(control_h1: str, debug_info_h1: bool, prey_move_enabled: bool):
     # Player vs AI の場合、1ステップが Playerターン + AIターン で構成されるとみなすか、
     # それぞれで記録するかだが、ここでは「AIが動いた時点」で1ステップ完了として記録する。
     action_0 = st.session_state.manual_action_hunter_0
-    log_step(action_0, action_1)
+    record = log_step(action_0, action_1)
     
     check_capture()
     move_prey(prey_move_enabled)
+    finish_log_step(record)
     
     # フェーズをPlayerに戻してリロード
     st.session_state.turn_phase = 'player'
-    st.rerun()
+    rerun_simulation()
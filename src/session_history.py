@@ -0,0 +1,132 @@
+"""
+セッションごとのステップ履歴（ログ）を保持するモジュール。
+
+主な機能：
+1. 直近 max_records 件だけをメモリ上のリング（deque）に保持する。
+2. あふれた古いレコードは、セッション専用の一時ディレクトリ内のCSVへ追記する（追記のみ）。
+3. ダウンロード時はファイル分とメモリ分をつなげて、従来と同じ形式のCSVを返す。
+4. expand を渡すと、メモリ上は小さいレコードのまま持ち、ファイルに書くときだけCSVの1行に展開する。
+
+使い方
+- history = SessionHistory(max_records=1000)
+- history = SessionHistory(max_records=1000, expand=expand_log_record)  # game_logic のログ
+- history.append({"step": 1, ...})
+- csv_bytes = history.to_csv_bytes()
+"""
+
+import csv
+import io
+import os
+import shutil
+import tempfile
+import weakref
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+# メモリに保持する件数の既定値と、1回にファイルへ書き出す件数
+DEFAULT_MAX_RECORDS = 1000
+DEFAULT_SPILL_BATCH = 500
+
+
+class SessionHistory:
+
+    def __init__(
+        self,
+        max_records: int = DEFAULT_MAX_RECORDS,
+        spill_batch: int = DEFAULT_SPILL_BATCH,
+        expand: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    ) -> None:
+        """
+        max_records: メモリに保持する最大件数
+        spill_batch: あふれたときにまとめてファイルへ移す件数
+        expand: レコードをCSVの1行（列名 -> 値）にする関数（省略時はレコードをそのまま書く）
+        """
+        self.max_records = max_records
+        self.expand = expand
+        self.spill_batch = max(1, min(spill_batch, max_records))
+        self._recent: Deque[Dict[str, Any]] = deque()
+        self._fieldnames: Optional[List[str]] = None
+        self._spill_dir: Optional[str] = None
+        self._spill_path: Optional[str] = None
+        self._spilled = 0
+        self._finalizer = None
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._recent)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    @property
+    def spilled_count(self) -> int:
+        """ファイルに書き出し済みの件数"""
+        return self._spilled
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """メモリ上の直近レコード（古い順）"""
+        return list(self._recent)
+
+    def append(self, record: Dict[str, Any]) -> None:
+        if self._fieldnames is None:
+            self._fieldnames = list(self._row(record).keys())
+        self._recent.append(record)
+        if len(self._recent) > self.max_records:
+            self._spill(self.spill_batch)
+
+    def _row(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return self.expand(record) if self.expand is not None else record
+
+    def _ensure_spill_file(self) -> str:
+        if self._spill_path is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="hunter_task_history_")
+            self._spill_path = os.path.join(self._spill_dir, "history.csv")
+            # セッションが破棄されたら一時ディレクトリも消す
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+            with open(self._spill_path, "w", newline="", encoding="utf-8") as f:
+                csv.DictWriter(f, fieldnames=self._fieldnames, lineterminator="\n").writeheader()
+        return self._spill_path
+
+    def _spill(self, count: int) -> None:
+        """古い順に count 件をファイルへ追記する"""
+        path = self._ensure_spill_file()
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=self._fieldnames, extrasaction="ignore", lineterminator="\n")
+            for _ in range(min(count, len(self._recent))):
+                writer.writerow(self._row(self._recent.popleft()))
+                self._spilled += 1
+
+    def iter_csv_chunks(self) -> Iterator[bytes]:
+        """ファイル分 → メモリ分の順にCSVのバイト列を返す（ヘッダは先頭に1回だけ）"""
+        if self._fieldnames is None:
+            return
+
+        if self._spill_path is not None:
+            with open(self._spill_path, "rb") as f:
+                while True:
+                    block = f.read(1 << 20)
+                    if not block:
+                        break
+                    yield block
+
+        buf = io.StringIO(newline="")
+        writer = csv.DictWriter(buf, fieldnames=self._fieldnames, extrasaction="ignore", lineterminator="\n")
+        if self._spill_path is None:
+            writer.writeheader()
+        for record in self._recent:
+            writer.writerow(self._row(record))
+        yield buf.getvalue().encode("utf-8")
+
+    def to_csv_bytes(self) -> bytes:
+        """ダウンロード用に全件のCSVを返す"""
+        return b"".join(self.iter_csv_chunks())
+
+    def clear(self) -> None:
+        """全レコードと一時ファイルを破棄する"""
+        self._recent.clear()
+        self._spilled = 0
+        self._fieldnames = None
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+        self._spill_dir = None
+        self._spill_path = None
@@ -0,0 +1,160 @@
+"""
+AI vs AI のシミュレーションをバックグラウンドのスレッドで先に進め、フレームを有限長のキューに積むモジュール。
+
+主な機能：
+1. ワーカースレッドが HeadlessSimulation を回し、1ステップごとにフレーム
+   （状態コード（位置・捕獲状況）・直前の行動・ログ用レコード）をキューに入れる。
+   キューが満杯なら空くまで待つので、表示より LIVE_QUEUE_SIZE フレーム以上先には進まない。
+2. 表示側は表示したいときに1フレームずつ取り出す（取り出したフレームは巻き戻し・シーク用に保持する）。
+   描画とシミュレーションが同じ実行の中で互いを待たない。
+3. エピソードが終わる（全捕獲 or LIVE_MAX_STEPS）と、リセットして次のエピソードを続ける。
+4. ワーカーが参照されなくなったら（セッション終了など）スレッドは停止する（weakref.finalize）。
+   st.* はワーカースレッドから呼ばない。
+"""
+
+import queue
+import threading
+import weakref
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from src.headless import HeadlessSimulation
+from src.config import LIVE_BUFFER_FRAMES, LIVE_MAX_STEPS, LIVE_QUEUE_SIZE
+
+_PUT_TIMEOUT = 0.2
+
+
+def _make_frame(sim: HeadlessSimulation, episode: int, record: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "episode": episode,
+        "step": sim.step_count,
+        "state": sim.env.code,
+        "last_actions": dict(sim.last_actions),
+        "record": record,
+        "done": sim.done,
+    }
+
+
+def _run(sim: HeadlessSimulation, frames: "queue.Queue", stop: threading.Event, status: Dict[str, Any], max_steps: int) -> None:
+    """ワーカースレッドの本体（self を参照しないので、ワーカーが回収されればスレッドも止まる）"""
+
+    def put(frame: Dict[str, Any]) -> bool:
+        while not stop.is_set():
+            try:
+                frames.put(frame, timeout=_PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    episode = 0
+    try:
+        while not stop.is_set():
+            sim.reset()
+            if not put(_make_frame(sim, episode, None)):
+                return
+            while not sim.done and sim.step_count < max_steps:
+                sim.step()
+                if not put(_make_frame(sim, episode, sim.last_record)):
+                    return
+                status["steps"] += 1
+            episode += 1
+            status["episodes"] = episode
+    except Exception as e:
+        status["error"] = e
+
+
+class SimulationWorker:
+
+    def __init__(
+        self,
+        control_h0: str,
+        control_h1: str,
+        q_tables: Optional[Dict[str, Any]] = None,
+        prey_move_enabled: bool = True,
+        seed: Optional[int] = None,
+        queue_size: int = LIVE_QUEUE_SIZE,
+        buffer_frames: int = LIVE_BUFFER_FRAMES,
+        max_steps: int = LIVE_MAX_STEPS,
+    ) -> None:
+        """
+        引数は HeadlessSimulation と同じ。
+        queue_size: 先に計算しておくフレーム数の上限
+        buffer_frames: 表示済みフレームを保持する数（シークできる範囲）
+        """
+        sim = HeadlessSimulation(
+            control_h0,
+            control_h1,
+            q_tables=q_tables,
+            prey_move_enabled=prey_move_enabled,
+            seed=seed,
+            record_log=True,
+        )
+        # Qテーブルの差し替え（q_reload）の登録用
+        self.q_agents = sim.q_agents
+        self._frames: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self.status: Dict[str, Any] = {"steps": 0, "episodes": 0, "error": None}
+
+        # 表示済みフレームと、いま表示しているフレームの位置
+        self.buffer: deque = deque(maxlen=buffer_frames)
+        self.cursor = -1
+
+        self._thread = threading.Thread(
+            target=_run,
+            args=(sim, self._frames, self._stop, self.status, max_steps),
+            name="simulation-worker",
+            daemon=True,
+        )
+        self._thread.start()
+        self._finalizer = weakref.finalize(self, self._stop.set)
+
+    # --- 表示側の操作 ---
+
+    @property
+    def current(self) -> Optional[Dict[str, Any]]:
+        """いま表示しているフレーム（まだ無ければ None）"""
+        return self.buffer[self.cursor] if 0 <= self.cursor < len(self.buffer) else None
+
+    @property
+    def pending(self) -> int:
+        """計算済みでまだ表示していないフレーム数（キュー内）"""
+        return self._frames.qsize()
+
+    def advance(self, timeout: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        1フレーム進める。
+        シークで戻っている間は保持済みのフレームを進めるだけで、キューからは取り出さない。
+        戻り値: 新しくキューから取り出したフレーム（ログへの追記用。無ければ空）
+        """
+        if self.cursor < len(self.buffer) - 1:
+            self.cursor += 1
+            return []
+        try:
+            frame = self._frames.get(timeout=timeout) if timeout > 0 else self._frames.get_nowait()
+        except queue.Empty:
+            return []
+        # deque が満杯なら先頭が捨てられ、位置は末尾のまま
+        self.buffer.append(frame)
+        self.cursor = len(self.buffer) - 1
+        return [frame]
+
+    def back(self) -> None:
+        """1フレーム戻る（保持している範囲内）"""
+        if self.cursor > 0:
+            self.cursor -= 1
+
+    def seek(self, index: int) -> None:
+        """保持しているフレームの index 番目に移動する"""
+        if self.buffer:
+            self.cursor = max(0, min(len(self.buffer) - 1, index))
+
+    # --- 後始末 ---
+
+    @property
+    def alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        self._stop.set()
+        self._thread.join(timeout)
@@ -0,0 +1,179 @@
+"""
+Qテーブル学習のチェックポイントを差分（デルタ）で保存・復元するモジュール。
+
+主な機能：
+1. チェックポイントごとに「前回から変更されたQエントリだけ」を delta_XXXXXXXX.pkl に保存する。
+2. 一定回数ごとにベース＋差分をまとめた完全なテーブル（base_XXXXXXXX.pkl）に圧縮（コンパクション）する。
+   圧縮したテーブルは出力パス（例: q_table.pkl）にもコピーし、
+   サイドバーの _load_q_table / 自動ロードでそのまま読み込めるようにする。
+3. 途中で強制終了しても、manifest.json に記録された最後のチェックポイントから再開できる。
+
+ディレクトリ構成（出力パスが q_table.pkl の場合）
+- q_table.pkl.ckpt/manifest.json : 現在のベース、差分の一覧、エピソード数、乱数の状態
+- q_table.pkl.ckpt/base_*.pkl     : 圧縮済みの完全なテーブル
+- q_table.pkl.ckpt/delta_*.pkl    : 差分（{状態キー: {行動ラベル: Q値}}）
+
+書き込みの順序
+- 差分/ベースのファイルを書き終えてから manifest を置き換える（どちらも一時ファイル → os.replace）。
+  manifest に載っていないファイルは再開時に無視されるので、書き込み中に止まっても壊れない。
+"""
+
+import json
+import os
+import pickle
+import shutil
+from typing import Any, Dict, Iterable, List, Optional
+
+MANIFEST_NAME = "manifest.json"
+
+
+def checkpoint_dir_for(output_path: str) -> str:
+    return f"{output_path}.ckpt"
+
+
+def _atomic_pickle(obj: Any, path: str) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _atomic_json(obj: Any, path: str) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class DeltaCheckpointer:
+
+    def __init__(self, output_path: str, compact_every: int = 10) -> None:
+        """
+        output_path: 完全なテーブルの出力先（サイドバーで読み込むファイル）
+        compact_every: 何回の差分チェックポイントごとに圧縮するか
+        """
+        self.output_path = output_path
+        self.dir = checkpoint_dir_for(output_path)
+        self.compact_every = max(1, compact_every)
+        self.manifest: Dict[str, Any] = {"base": None, "deltas": [], "episode": 0, "extra": {}}
+        self._dirty: set = set()
+
+    # --- 変更の記録 ---
+
+    def mark(self, state_key: Any) -> None:
+        """Q値を更新した状態キーを記録する"""
+        self._dirty.add(state_key)
+
+    def mark_many(self, state_keys: Iterable[Any]) -> None:
+        self._dirty.update(state_keys)
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    # --- 保存 ---
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.dir, MANIFEST_NAME)
+
+    def save(self, q_table: Dict[Any, Dict[str, float]], episode: int, extra: Optional[Dict[str, Any]] = None) -> str:
+        """
+        差分チェックポイントを書く。compact_every 回に1回は圧縮する。
+        戻り値: "delta" / "compact" / "skip"（変更なし）
+        """
+        os.makedirs(self.dir, exist_ok=True)
+        if extra is not None:
+            self.manifest["extra"] = extra
+
+        if len(self.manifest["deltas"]) + 1 >= self.compact_every:
+            self.compact(q_table, episode)
+            return "compact"
+
+        if not self._dirty:
+            self.manifest["episode"] = episode
+            _atomic_json(self.manifest, self._manifest_path())
+            return "skip"
+
+        name = f"delta_{episode:08d}.pkl"
+        delta = {key: dict(q_table[key]) for key in self._dirty if key in q_table}
+        _atomic_pickle(delta, os.path.join(self.dir, name))
+
+        self.manifest["deltas"].append(name)
+        self.manifest["episode"] = episode
+        _atomic_json(self.manifest, self._manifest_path())
+        self._dirty.clear()
+        return "delta"
+
+    def compact(self, q_table: Dict[Any, Dict[str, float]], episode: int, extra: Optional[Dict[str, Any]] = None) -> None:
+        """
+        完全なテーブルをベースとして書き出し、それまでの差分を捨てる。
+        出力パスにもコピーする。
+        """
+        os.makedirs(self.dir, exist_ok=True)
+        if extra is not None:
+            self.manifest["extra"] = extra
+        old_files: List[str] = list(self.manifest["deltas"])
+        if self.manifest["base"]:
+            old_files.append(self.manifest["base"])
+
+        name = f"base_{episode:08d}.pkl"
+        base_path = os.path.join(self.dir, name)
+        _atomic_pickle(q_table, base_path)
+
+        self.manifest["base"] = name
+        self.manifest["deltas"] = []
+        self.manifest["episode"] = episode
+        _atomic_json(self.manifest, self._manifest_path())
+        self._dirty.clear()
+
+        for old in old_files:
+            if old != name:
+                try:
+                    os.remove(os.path.join(self.dir, old))
+                except FileNotFoundError:
+                    pass
+
+        tmp = f"{self.output_path}.tmp"
+        shutil.copyfile(base_path, tmp)
+        os.replace(tmp, self.output_path)
+
+    def clear(self) -> None:
+        """チェックポイントをすべて削除する（最初から学習し直すとき）"""
+        shutil.rmtree(self.dir, ignore_errors=True)
+        self.manifest = {"base": None, "deltas": [], "episode": 0, "extra": {}}
+        self._dirty.clear()
+
+    # --- 復元 ---
+
+    def exists(self) -> bool:
+        return os.path.exists(self._manifest_path())
+
+    def load(self) -> Optional[Dict[Any, Dict[str, float]]]:
+        """
+        manifest からベース＋差分を順に適用したテーブルを返す（チェックポイントが無ければ None）。
+        エピソード数などは self.manifest に読み込まれる。
+        """
+        if not self.exists():
+            return None
+
+        with open(self._manifest_path(), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        q_table: Dict[Any, Dict[str, float]] = {}
+        if self.manifest["base"]:
+            with open(os.path.join(self.dir, self.manifest["base"]), "rb") as f:
+                q_table = pickle.load(f)
+        for name in self.manifest["deltas"]:
+            with open(os.path.join(self.dir, name), "rb") as f:
+                q_table.update(pickle.load(f))
+
+        self._dirty.clear()
+        return q_table
+
+    @property
+    def episode(self) -> int:
+        return int(self.manifest.get("episode", 0))
+
+    @property
+    def extra(self) -> Dict[str, Any]:
+        return self.manifest.get("extra", {})
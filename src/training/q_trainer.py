@@ -0,0 +1,191 @@
+"""
+1体のハンター対1体の獲物で、QLearningAgent 用のQテーブルを学習するモジュール。
+
+主な機能：
+1. 状態 (hx, hy, px, py)、行動ラベル UP/DOWN/LEFT/RIGHT/STAY の表形式Q学習（ε-greedy）。
+2. 1ステップの手順はゲームと同じ（ハンター移動 → 捕獲判定 → 獲物移動(move_prey の確率) → 捕獲判定）。
+   捕獲で報酬 REWARD_CAPTURE を得てエピソード終了、それ以外の報酬は 0。
+3. DeltaCheckpointer で定期的に差分チェックポイントを書き、途中で止まっても再開できる。
+   出力は q_utils が読む形式 {(hx, hy, px, py): {"UP": q, ...}} の pickle。
+
+使い方
+- python -m src.training.q_trainer --output q_table.pkl --episodes 200000 --checkpoint-every 5000
+- 同じコマンドを再実行すると、q_table.pkl.ckpt/ の最後のチェックポイントから再開する（--fresh で最初から）。
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.env.game_env import ACTIONS, GRID_SIZE
+from src.agents.q_utils import ACTION_LABEL_TO_ID
+from src.config import PREY_MOVE_ACTIONS, PREY_MOVE_WEIGHTS
+from src.training.checkpoint import DeltaCheckpointer
+
+# 学習の既定値
+REWARD_CAPTURE = 1.0
+DEFAULT_GAMMA = 0.95
+DEFAULT_ALPHA = 0.1
+DEFAULT_EPSILON = 0.1
+DEFAULT_MAX_STEPS = 200
+
+ACTION_LABELS: List[str] = list(ACTION_LABEL_TO_ID.keys())
+
+StateKey = Tuple[int, int, int, int]
+
+
+def _move(pos: Tuple[int, int], action_id: int) -> Tuple[int, int]:
+    dx, dy = ACTIONS[action_id]
+    return ((pos[0] + dx) % GRID_SIZE, (pos[1] + dy) % GRID_SIZE)
+
+
+class QTrainer:
+
+    def __init__(
+        self,
+        alpha: float = DEFAULT_ALPHA,
+        gamma: float = DEFAULT_GAMMA,
+        epsilon: float = DEFAULT_EPSILON,
+        max_steps: int = DEFAULT_MAX_STEPS,
+        prey_move_weights: Optional[List[float]] = None,
+        seed: Optional[int] = None,
+        q_table: Optional[Dict[StateKey, Dict[str, float]]] = None,
+        checkpointer: Optional[DeltaCheckpointer] = None,
+    ) -> None:
+        self.alpha = alpha
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.max_steps = max_steps
+        self.prey_move_weights = list(prey_move_weights) if prey_move_weights is not None else list(PREY_MOVE_WEIGHTS)
+        self.rng = random.Random(seed)
+        self.q_table: Dict[StateKey, Dict[str, float]] = q_table if q_table is not None else {}
+        self.checkpointer = checkpointer
+        self.episode = 0
+
+    def _q(self, key: StateKey) -> Dict[str, float]:
+        q = self.q_table.get(key)
+        if q is None:
+            q = {label: 0.0 for label in ACTION_LABELS}
+            self.q_table[key] = q
+            if self.checkpointer is not None:
+                self.checkpointer.mark(key)
+        return q
+
+    def _choose(self, key: StateKey) -> str:
+        if self.rng.random() < self.epsilon:
+            return self.rng.choice(ACTION_LABELS)
+        q = self._q(key)
+        return max(ACTION_LABELS, key=lambda label: q[label])
+
+    def run_episode(self) -> int:
+        """1エピソード学習し、かかったステップ数を返す"""
+        rng = self.rng
+        hunter = (rng.randrange(GRID_SIZE), rng.randrange(GRID_SIZE))
+        prey = hunter
+        while prey == hunter:
+            prey = (rng.randrange(GRID_SIZE), rng.randrange(GRID_SIZE))
+
+        for step in range(1, self.max_steps + 1):
+            key = (hunter[0], hunter[1], prey[0], prey[1])
+            label = self._choose(key)
+            hunter = _move(hunter, ACTION_LABEL_TO_ID[label])
+
+            done = hunter == prey
+            if not done:
+                a = rng.choices(PREY_MOVE_ACTIONS, weights=self.prey_move_weights, k=1)[0]
+                prey = _move(prey, a)
+                done = hunter == prey
+
+            q = self._q(key)
+            if done:
+                target = REWARD_CAPTURE
+            else:
+                next_q = self._q((hunter[0], hunter[1], prey[0], prey[1]))
+                target = self.gamma * max(next_q.values())
+            q[label] += self.alpha * (target - q[label])
+            if self.checkpointer is not None:
+                self.checkpointer.mark(key)
+
+            if done:
+                return step
+        return self.max_steps
+
+    def _checkpoint_extra(self) -> Dict[str, object]:
+        version, internal, gauss = self.rng.getstate()
+        return {"rng_state": [version, list(internal), gauss]}
+
+    def restore_extra(self, extra: Dict[str, object]) -> None:
+        state = extra.get("rng_state")
+        if state:
+            version, internal, gauss = state
+            self.rng.setstate((version, tuple(internal), gauss))
+
+    def train(self, episodes: int, checkpoint_every: int = 0, log_every: int = 0) -> None:
+        """
+        合計 episodes エピソードになるまで学習する（再開時は続きから）。
+        checkpoint_every エピソードごとに差分チェックポイントを書き、最後に圧縮して出力する。
+        """
+        start = time.perf_counter()
+        recent_steps = 0
+        recent_count = 0
+        while self.episode < episodes:
+            recent_steps += self.run_episode()
+            recent_count += 1
+            self.episode += 1
+
+            if log_every and self.episode % log_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f"[episode {self.episode}] mean_steps={recent_steps / recent_count:.2f} "
+                      f"states={len(self.q_table)} ({elapsed:.1f}s)")
+                recent_steps = 0
+                recent_count = 0
+
+            if self.checkpointer is not None and checkpoint_every and self.episode % checkpoint_every == 0:
+                kind = self.checkpointer.save(self.q_table, self.episode, self._checkpoint_extra())
+                if log_every:
+                    print(f"  checkpoint ({kind}) at episode {self.episode}")
+
+        if self.checkpointer is not None:
+            self.checkpointer.compact(self.q_table, self.episode, self._checkpoint_extra())
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Qテーブルを学習する（差分チェックポイント付き）")
+    parser.add_argument("--output", default="q_table.pkl", help="学習済みQテーブルの出力先")
+    parser.add_argument("--episodes", type=int, default=100_000, help="合計エピソード数")
+    parser.add_argument("--checkpoint-every", type=int, default=5_000, help="差分チェックポイントの間隔（エピソード）")
+    parser.add_argument("--compact-every", type=int, default=10, help="何回のチェックポイントごとに完全なテーブルへ圧縮するか")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA)
+    parser.add_argument("--gamma", type=float, default=DEFAULT_GAMMA)
+    parser.add_argument("--epsilon", type=float, default=DEFAULT_EPSILON)
+    parser.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fresh", action="store_true", help="チェックポイントがあっても最初から学習する")
+    parser.add_argument("--log-every", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    checkpointer = DeltaCheckpointer(args.output, compact_every=args.compact_every)
+    trainer = QTrainer(
+        alpha=args.alpha,
+        gamma=args.gamma,
+        epsilon=args.epsilon,
+        max_steps=args.max_steps,
+        seed=args.seed,
+        checkpointer=checkpointer,
+    )
+
+    if args.fresh:
+        checkpointer.clear()
+    elif checkpointer.exists():
+        trainer.q_table = checkpointer.load()
+        trainer.episode = checkpointer.episode
+        trainer.restore_extra(checkpointer.extra)
+        print(f"チェックポイントから再開します: episode={trainer.episode} states={len(trainer.q_table)}")
+
+    trainer.train(args.episodes, args.checkpoint_every, args.log_every)
+    print(f"学習完了: episode={trainer.episode} states={len(trainer.q_table)} -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,85 +3,130 @@ StreamlitアプリケーションのUIコンポーネントを定義する。
 (Matplotlibによるグリッド描画：1～20の座標で表示)
 """
 
+import functools
+from typing import Tuple
+
 import streamlit as st
 import matplotlib.pyplot as plt
 import numpy as np
 
 from src.env.game_env import GRID_SIZE
 
-def draw_grid_html(state, game_mode="AI and AI", last_actions=None):
+# グリッドの共有スタイルシート（inject_grid_css でページに1回だけ出す）
+# .hg: 表全体、td: マス、.a: エージェント（.h0 / .h0p / .h1 / .p）、.r*: 向き、.k*: ヒートマップの濃さ
+_HEAT_LEVELS = 16
+GRID_CSS = (
+    "<style>"
+    ".hgw{display:flex;justify-content:center}"
+    ".hg{border-collapse:collapse;border:2px solid #333}"
+    ".hg td{width:25px;height:25px;border:1px solid #ddd;text-align:center;vertical-align:middle;padding:0}"
+    ".hg i{font-style:normal}.hg .a{display:inline-block;font-size:20px}"
+    ".hg .h0{color:cyan}.hg .h0p{color:blue}.hg .h1{color:red}"
+    ".hg .p{background-color:green;color:white;border-radius:50%;width:20px;height:20px;line-height:20px;"
+    "font-size:12px;font-weight:bold;margin:auto;display:block}"
+    ".hg .r90{transform:rotate(90deg)}.hg .r180{transform:rotate(180deg)}.hg .rm90{transform:rotate(-90deg)}"
+    + "".join(
+        f".hg .k{level}{{background-color:rgba(255,140,0,{0.1 + 0.8 * level / _HEAT_LEVELS:.2f})}}"
+        for level in range(_HEAT_LEVELS + 1)
+    )
+    + "</style>"
+)
+
+# 行動ID -> 向きのクラス（UP=0度, DOWN=180度, LEFT=-90度, RIGHT=90度, STAY は上向き）
+_ROTATION_CLASS = {1: "", 2: " r180", 3: " rm90", 4: " r90"}
+
+_EMPTY_CELL = "<td></td>"
+
+
+@functools.lru_cache(maxsize=1)
+def _grid_skeleton() -> Tuple[str, str, str]:
     """
-    現在の状態 (state) をHTML/CSSで描画する（軽量版）。
-    Matplotlibの画像生成オーバーヘッドを回避し、ネットワーク転送量を削減する。
+    空のグリッドの部品（表の開始, 空の1行, 表の終わり）。
+    フレームごとには、エージェントやヒートマップのある行だけを作り直す。
+    """
+    empty_row = "<tr>" + _EMPTY_CELL * GRID_SIZE + "</tr>"
+    return '<div class="hgw"><table class="hg">', empty_row, "</table></div>"
+
+
+def inject_grid_css():
+    """
+    グリッドのスタイルシートを出す。
+    フラグメントの外（アプリ全体の実行時）に1回呼べば、ステップ実行でフラグメントだけ再実行されても残る。
+    """
+    st.markdown(GRID_CSS, unsafe_allow_html=True)
+    _record_payload("grid_css_bytes", len(GRID_CSS.encode("utf-8")))
+
+
+def _record_payload(key: str, nbytes: int):
+    """送ったバイト数を session_state に記録する（ベンチマークで集計する）"""
+    stats = st.session_state.setdefault("payload_stats", {"grid_frames": 0, "grid_bytes_total": 0})
+    stats[key] = nbytes
+    if key == "grid_frame_bytes":
+        stats["grid_frames"] += 1
+        stats["grid_bytes_total"] += nbytes
+
+
+def grid_html(state, game_mode="AI and AI", last_actions=None, heatmap=None) -> str:
+    """
+    グリッドのHTML（クラスだけのマークアップ）を返す。見た目は GRID_CSS で決まる。
+    heatmap: (GRID_SIZE, GRID_SIZE) の [y, x] 配列（0～1）。指定するとマスの背景色として重ねる。
     """
-    
-    # グリッドサイズ
-    grid_size = GRID_SIZE # 20
-    
-    # エージェント位置のマップを作成
-    # (x, y) -> list of html_content
-    cell_contents = {}
-    
+    grid_size = GRID_SIZE
+    table_open, empty_row, table_close = _grid_skeleton()
+
+    # マス (y * grid_size + x) -> 中身
+    contents = {}
+    hunter_0_class = "h0p" if game_mode == "Player and AI" else "h0"
     for key, pos in state.items():
         x, y = pos
-        
-        # 向きの取得
-        rot = 0
-        if last_actions and key in last_actions:
-            action_id = last_actions[key]
-            # HTMLのrotationは時計回りが標準的だが、transform: rotate(deg) は時計回り。
-            # Matplotlibのロジック(UP=0)に合わせる。
-            # UP(1): 0deg
-            # DOWN(2): 180deg
-            # LEFT(3): -90deg (or 270deg)
-            # RIGHT(4): 90deg
-            if action_id == 1: rot = 0
-            elif action_id == 2: rot = 180
-            elif action_id == 3: rot = -90
-            elif action_id == 4: rot = 90
-            
+        rot = _ROTATION_CLASS.get(last_actions.get(key, 0), "") if last_actions else ""
+
         if key == 'hunter_0':
-            color = 'blue' if game_mode == "Player and AI" else 'cyan'
-            # 三角形 (CSS border trick or unicode)
-            # Unicode ▲ (U+25B2) を使用し、transformで回転させる
-            content = f'<div style="color:{color}; transform: rotate({rot}deg); display:inline-block; font-size: 20px;">▲</div>'
-            
+            content = f'<i class="a {hunter_0_class}{rot}">▲</i>'
         elif key == 'hunter_1':
-            # Hunter 1 (AI: Red)
-            content = f'<div style="color:red; transform: rotate({rot}deg); display:inline-block; font-size: 20px;">▲</div>'
-            
+            content = f'<i class="a h1{rot}">▲</i>'
         elif 'prey' in key:
             try:
                 pid = int(key.split('_')[1])
-            except:
+            except (IndexError, ValueError):
                 pid = 0
-            # 丸 (CSS border-radius) + 数字
-            content = f'<div style="background-color:green; color:white; border-radius:50%; width:20px; height:20px; text-align:center; line-height:20px; font-size:12px; font-weight:bold; margin:auto;">{pid}</div>'
-            
+            content = f'<i class="p">{pid}</i>'
         else:
             continue
-            
-        if (x, y) not in cell_contents:
-            cell_contents[(x, y)] = []
-        cell_contents[(x, y)].append(content)
-
-    # HTML生成
-    html = '<div style="display: flex; justify-content: center;">'
-    html += '<table style="border-collapse: collapse; border: 2px solid #333;">'
-    
-    for y in range(grid_size):
-        html += '<tr>'
-        for x in range(grid_size):
-            cell_style = 'width: 25px; height: 25px; border: 1px solid #ddd; text-align: center; vertical-align: middle; padding: 0;'
-            
-            # コンテンツの取得
-            contents = cell_contents.get((x, y), [])
-            inner_html = "".join(contents)
-            
-            html += f'<td style="{cell_style}">{inner_html}</td>'
-        html += '</tr>'
-    
-    html += '</table></div>'
-    
+
+        index = (y % grid_size) * grid_size + (x % grid_size)
+        contents[index] = contents.get(index, "") + content
+
+    # マス -> 濃さのクラス（0 のマスは塗らない）
+    heat_classes = {}
+    if heatmap is not None:
+        values = np.asarray(heatmap, dtype=np.float64).ravel()
+        nonzero = np.flatnonzero(values > 0)
+        levels = np.rint(values[nonzero] * _HEAT_LEVELS).astype(np.int64)
+        heat_classes = dict(zip(nonzero.tolist(), (f' class="k{level}"' for level in levels.tolist())))
+
+    rows = [empty_row] * grid_size
+    for y in {index // grid_size for index in contents.keys() | heat_classes.keys()}:
+        cells = []
+        for index in range(y * grid_size, (y + 1) * grid_size):
+            content = contents.get(index, "")
+            heat = heat_classes.get(index, "")
+            cells.append(f"<td{heat}>{content}</td>" if content or heat else _EMPTY_CELL)
+        rows[y] = "<tr>" + "".join(cells) + "</tr>"
+
+    return table_open + "".join(rows) + table_close
+
+
+def draw_grid_html(state, game_mode="AI and AI", last_actions=None, heatmap=None):
+    """
+    現在の状態 (state) をHTML/CSSで描画する（軽量版）。
+    Matplotlibの画像生成オーバーヘッドを回避し、ネットワーク転送量を削減する。
+    スタイルは inject_grid_css で別に出し、ここではクラスだけのマークアップを送る（1フレーム数KB）。
+    送ったバイト数は st.session_state.payload_stats["grid_frame_bytes"] に記録する。
+    heatmap: (GRID_SIZE, GRID_SIZE) の [y, x] 配列（0～1）。指定するとマスの背景色として重ねる。
+    """
+    html = grid_html(state, game_mode, last_actions, heatmap)
+    _record_payload("grid_frame_bytes", len(html.encode("utf-8")))
+
     # Streamlitで表示
-    st.markdown(html, unsafe_allow_html=True)
\ No newline at end of file
+    st.markdown(html, unsafe_allow_html=True)
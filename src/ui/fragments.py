@@ -0,0 +1,24 @@
+"""
+フラグメント（st.fragment）による部分再実行を扱うヘルパー。
+
+主な機能：
+1. シミュレーション部分（グリッド・操作パネル・ステップ実行）だけを再実行する。
+2. フラグメントの再実行中でなければ（サイドバー変更などによる全体の実行中）、通常の st.rerun() にする。
+   st.rerun(scope="fragment") は全体の実行中に呼ぶと例外になるため。
+"""
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+
+def in_fragment_rerun() -> bool:
+    """フラグメントだけの再実行中かどうか"""
+    ctx = get_script_run_ctx()
+    return bool(ctx is not None and ctx.fragment_ids_this_run and ctx.current_fragment_id)
+
+
+def rerun_simulation() -> None:
+    """シミュレーション部分を再実行する（可能ならフラグメントだけ）"""
+    if in_fragment_rerun():
+        st.rerun(scope="fragment")
+    st.rerun()
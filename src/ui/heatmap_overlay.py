@@ -0,0 +1,94 @@
+"""
+グリッドに重ねるヒートマップ（訪問回数・捕獲位置）を用意するモジュール。
+
+- 「このセッション」: セッションのログ（history）から集計する（捕獲位置はレコードの next_state から数える）。
+  前回から増えたレコードだけを足していくので、ステップごとの負担は1レコード分。
+- ファイル: python -m src.analytics.heatmap で作った .npz を読み込む（更新時刻が変わったら読み直す）。
+"""
+
+import io
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.analytics.heatmap import VisitHeatmap
+from src.analytics.log_stream import DEFAULT_CHUNKSIZE, parse_chunk
+
+HEATMAP_SOURCE_SESSION = "このセッション"
+DEFAULT_HEATMAP_PATH = "heatmap.npz"
+
+# 表示名 -> VisitHeatmap.grid のレイヤー名
+HEATMAP_LAYERS = {
+    "ハンターの訪問": "hunters",
+    "Hunter 0 の訪問": "hunter_0",
+    "Hunter 1 の訪問": "hunter_1",
+    "獲物の訪問": "prey",
+    "捕獲位置": "captures",
+}
+
+
+def _rebuild_from_history(history) -> VisitHeatmap:
+    """一時ファイルに退避した分も含めて、ログ全体から集計し直す"""
+    heatmap = VisitHeatmap()
+    data = history.to_csv_bytes()
+    if data:
+        for chunk in pd.read_csv(io.BytesIO(data), chunksize=DEFAULT_CHUNKSIZE):
+            heatmap.add_log_chunk(parse_chunk(chunk))
+    return heatmap
+
+
+def session_heatmap() -> VisitHeatmap:
+    """セッションのログに追いついたヒートマップを返す（増えたレコードだけを加算する）"""
+    history = st.session_state.history
+    heatmap: Optional[VisitHeatmap] = st.session_state.get('session_heatmap')
+    seen = st.session_state.get('session_heatmap_rows', 0)
+    total = len(history)
+
+    recent = history.recent()
+    new = total - seen
+    if heatmap is None or new < 0 or new > len(recent):
+        # 初回、またはメモリ上に無い古いレコードが必要なときだけ作り直す
+        heatmap = _rebuild_from_history(history)
+    elif new > 0:
+        heatmap.add_records(recent[len(recent) - new:])
+
+    st.session_state.session_heatmap = heatmap
+    st.session_state.session_heatmap_rows = total
+    return heatmap
+
+
+@st.cache_data(show_spinner=False)
+def _load_heatmap_file(path: str, mtime: float) -> VisitHeatmap:
+    return VisitHeatmap.load(path)
+
+
+def heatmap_overlay(layer_config: Optional[Tuple[str, str]]) -> Optional[np.ndarray]:
+    """
+    サイドバーの設定 (ソース, レイヤー) から、draw_grid_html に渡す 0～1 の配列を作る。
+    回数の差が大きいので対数で正規化する。
+    """
+    if not layer_config:
+        return None
+    source, layer = layer_config
+
+    if source == HEATMAP_SOURCE_SESSION:
+        heatmap = session_heatmap()
+    else:
+        if not os.path.exists(source):
+            st.caption(f"ヒートマップ: {source} がありません（python -m src.analytics.heatmap で作成できます）")
+            return None
+        heatmap = _load_heatmap_file(source, os.path.getmtime(source))
+
+    counts = heatmap.grid(HEATMAP_LAYERS[layer])
+    if HEATMAP_LAYERS[layer] == "captures":
+        st.caption(
+            f"捕獲位置（{int(counts.sum())} 件）: 各ステップの終了時（獲物の移動後）の捕獲フラグから数えます。"
+            "next_state 列の無い古いログから作った集計には、獲物の移動で起きたエピソード最後の捕獲が含まれません。"
+        )
+    peak = counts.max()
+    if peak == 0:
+        return None
+    return np.log1p(counts) / np.log1p(peak)
@@ -3,8 +3,6 @@
 """
 
 import streamlit as st
-import pickle
-import pandas as pd
 from typing import Dict, Any
 
 from src.config import (
@@ -12,28 +10,45 @@ from src.config import (
     GAME_MODE_PLAYER_AND_AI,
     CONTROL_MODE_SIMPLE,
     CONTROL_MODE_LV0_Q,
+    CONTROL_MODE_LV1,
     CONTROL_MODE_MANUAL,
     DEFAULT_Q_TABLE_PATHS,
     AGENT_ID_HUNTER_0,
     AGENT_ID_HUNTER_1
 )
-from src.agents.q_learning import QLearningAgent
-
-def _load_q_table(path: str) -> Any:
-    """Qテーブルをファイルから読み込むヘルパー関数"""
-    try:
-        with open(path, "rb") as f:
-            q = pickle.load(f)
-        if isinstance(q, dict):
-            n = len(q)
-            sample_keys = list(q.keys())[:3]
-            st.write(f"{path}: dict, keys={n}, sample={sample_keys}")
+from src.agents.q_reload import get_q_table_store
+from src.game_logic import sync_q_agents
+from src.ui.heatmap_overlay import HEATMAP_LAYERS, HEATMAP_SOURCE_SESSION, DEFAULT_HEATMAP_PATH
+
+def _show_q_table_status(path: str) -> None:
+    """Qテーブルの読み込み状況を表示するヘルパー関数（読み込みはバックグラウンドで行い、ここでは待たない）"""
+    status = get_q_table_store().status(path)
+    if status["loaded"]:
+        st.write(f"{path}: dict, keys={status['states']}, 読み込み {status['version']} 回目")
+    elif status["loading"]:
+        st.caption(f"{path}: 読み込み中...（読み込みが終わると次のステップから使われます）")
+    if status["error"] is not None:
+        st.warning(f"{status['error']}" + ("（前に読み込んだテーブルを使い続けます）" if status["loaded"] else ""))
+
+@st.fragment
+def _render_log_download() -> None:
+    """
+    ログのダウンロード。
+    ステップ実行ではサイドバーが再実行されないため、ボタンを押したときにその時点のログから CSV を作る。
+    """
+    if st.button("ログを CSV に書き出す", key="prepare_log_csv"):
+        history = st.session_state.get('history')
+        if history:
+            # 一時ファイルに退避した古いログとメモリ上の直近ログをつなげる
+            csv = history.to_csv_bytes()
+            st.download_button(
+                label=f"ログをダウンロード (CSV, {len(history)} 件)",
+                data=csv,
+                file_name='hunter_task_log.csv',
+                mime='text/csv',
+            )
         else:
-            st.write(f"{path}: type={type(q)}")
-        return q
-    except Exception as e:
-        st.warning(f"{path} の読み込みに失敗: {e}")
-        return None
+            st.caption("ログ: データなし")
 
 def render_sidebar() -> Dict[str, Any]:
     """
@@ -68,14 +83,33 @@ def render_sidebar() -> Dict[str, Any]:
         help="Player and AIモードでは、Hunter 0を操作できます"
     )
 
+    # --- ライブ再生（AI and AI のみ） ---
+    live_mode = False
+    live_fps = 5
+    if game_mode == GAME_MODE_AI_AND_AI:
+        live_mode = st.sidebar.checkbox(
+            "ライブ再生（バックグラウンド実行）",
+            value=False,
+            help="ONでシミュレーションをバックグラウンドで先に進め、指定の速度で再生します。一時停止中はコマ送り・シークができます。"
+        )
+        if live_mode:
+            live_fps = st.sidebar.slider("再生速度（ステップ/秒）", min_value=1, max_value=30, value=5)
+
+    # --- ヒートマップ ---
+    heatmap_layer = None
+    if st.sidebar.checkbox("ヒートマップを重ねる", value=False, help="マスごとの訪問回数・捕獲位置をグリッドの背景色で表示します"):
+        layer = st.sidebar.selectbox("ヒートマップの種類", list(HEATMAP_LAYERS.keys()), index=0)
+        source = st.sidebar.selectbox("集計元", [HEATMAP_SOURCE_SESSION, DEFAULT_HEATMAP_PATH], index=0)
+        heatmap_layer = (source, layer)
+
     # --- ハンター制御モード ---
     if game_mode == GAME_MODE_AI_AND_AI:
-        control_h0 = st.sidebar.selectbox("Hunter 0 制御", [CONTROL_MODE_SIMPLE, CONTROL_MODE_LV0_Q], index=1, key="ctrl_h0")
+        control_h0 = st.sidebar.selectbox("Hunter 0 制御", [CONTROL_MODE_SIMPLE, CONTROL_MODE_LV0_Q, CONTROL_MODE_LV1], index=1, key="ctrl_h0")
     else:
         control_h0 = CONTROL_MODE_MANUAL
         st.sidebar.info("Hunter 0 はプレイヤー操作です")
 
-    control_h1 = st.sidebar.selectbox("Hunter 1 制御", [CONTROL_MODE_SIMPLE, CONTROL_MODE_LV0_Q], index=1, key="ctrl_h1")
+    control_h1 = st.sidebar.selectbox("Hunter 1 制御", [CONTROL_MODE_SIMPLE, CONTROL_MODE_LV0_Q, CONTROL_MODE_LV1], index=1, key="ctrl_h1")
 
     # --- Qテーブル読み込みUI (手動) ---
     with st.sidebar.expander("Qテーブル（読み込みのみ）", expanded=False):
@@ -89,61 +123,34 @@ def render_sidebar() -> Dict[str, Any]:
         if 'q_tables' not in st.session_state:
             st.session_state.q_tables = {AGENT_ID_HUNTER_0: None, AGENT_ID_HUNTER_1: None}
 
-        # 選択されたファイルを読み込む
-        st.session_state.q_tables[AGENT_ID_HUNTER_0] = _load_q_table(sel_h0) if sel_h0 != "(未使用)" else None
-        st.session_state.q_tables[AGENT_ID_HUNTER_1] = _load_q_table(sel_h1) if sel_h1 != "(未使用)" else None
-
-        # エージェントの初期化
-        if st.session_state.q_tables[AGENT_ID_HUNTER_0] is not None:
-            st.session_state.q_agents[AGENT_ID_HUNTER_0] = QLearningAgent(st.session_state.q_tables[AGENT_ID_HUNTER_0], AGENT_ID_HUNTER_0)
-        else:
-            st.session_state.q_agents[AGENT_ID_HUNTER_0] = None
-
-        if st.session_state.q_tables[AGENT_ID_HUNTER_1] is not None:
-            st.session_state.q_agents[AGENT_ID_HUNTER_1] = QLearningAgent(st.session_state.q_tables[AGENT_ID_HUNTER_1], AGENT_ID_HUNTER_1)
-        else:
-            st.session_state.q_agents[AGENT_ID_HUNTER_1] = None
-
-    # --- Qテーブルの自動ロード ---
-    # 制御モードが Q のハンターについて、まだロードされていなければ自動でデフォルトを読み込む
-    for hunter_id in (AGENT_ID_HUNTER_0, AGENT_ID_HUNTER_1):
-        control_mode = control_h0 if hunter_id == AGENT_ID_HUNTER_0 else control_h1
-
-        if control_mode == CONTROL_MODE_LV0_Q:
-            agent_exists = False
-            if hunter_id in st.session_state.q_agents:
-                if st.session_state.q_agents[hunter_id] is not None:
-                    agent_exists = True
-
-            if agent_exists is False:
-                path = DEFAULT_Q_TABLE_PATHS[hunter_id]
-                try:
-                    with open(path, "rb") as f:
-                        q = pickle.load(f)
-
-                    if isinstance(q, dict):
-                        st.session_state.q_tables[hunter_id] = q
-                        st.session_state.q_agents[hunter_id] = QLearningAgent(q, hunter_id)
-                        st.sidebar.caption(f"{hunter_id}: {path} を自動読み込みしました")
-                    else:
-                        st.sidebar.warning(f"{hunter_id}: {path} は想定外の形式です")
-                except Exception as e:
-                    st.sidebar.warning(f"{hunter_id}: {path} の自動読み込みに失敗しました: {e}")
+        # 使うファイルを決める
+        # 選択されていなければ、制御モードが Q のハンターはデフォルトのファイルを自動で使う
+        paths = {}
+        for hunter_id, selected, control_mode in (
+            (AGENT_ID_HUNTER_0, sel_h0, control_h0),
+            (AGENT_ID_HUNTER_1, sel_h1, control_h1),
+        ):
+            if selected != "(未使用)":
+                paths[hunter_id] = selected
+            elif control_mode == CONTROL_MODE_LV0_Q:
+                paths[hunter_id] = DEFAULT_Q_TABLE_PATHS[hunter_id]
+            else:
+                paths[hunter_id] = None
+        st.session_state.q_table_paths = paths
+
+        for path in dict.fromkeys(p for p in paths.values() if p):
+            _show_q_table_status(path)
+
+    # 読み込み済みのテーブルでエージェントを用意する（ファイルが更新されるとバックグラウンドで差し替わる）
+    sync_q_agents()
+    for hunter_id, control_mode in ((AGENT_ID_HUNTER_0, control_h0), (AGENT_ID_HUNTER_1, control_h1)):
+        if control_mode == CONTROL_MODE_LV0_Q and st.session_state.q_agents[hunter_id] is None:
+            st.sidebar.caption(f"{hunter_id}: Qテーブルが読み込まれるまで Simple で動きます")
 
     # --- ログダウンロード ---
     st.sidebar.markdown("---")
-    if 'history' in st.session_state and st.session_state.history:
-        df_log = pd.DataFrame(st.session_state.history)
-        csv = df_log.to_csv(index=False).encode('utf-8')
-        
-        st.sidebar.download_button(
-            label="ログをダウンロード (CSV)",
-            data=csv,
-            file_name='hunter_task_log.csv',
-            mime='text/csv',
-        )
-    else:
-        st.sidebar.caption("ログ: データなし")
+    with st.sidebar:
+        _render_log_download()
 
     return {
         "game_mode": game_mode,
@@ -151,5 +158,8 @@ def render_sidebar() -> Dict[str, Any]:
         "control_h1": control_h1,
         "prey_move_enabled": prey_move_enabled,
         "debug_info_h0": debug_info_h0,
-        "debug_info_h1": debug_info_h1
+        "debug_info_h1": debug_info_h1,
+        "live_mode": live_mode,
+        "live_fps": live_fps,
+        "heatmap_layer": heatmap_layer
     }